@@ -1,8 +1,30 @@
+import os
+import multiprocessing
+import threading
 import streamlit as st
 import pandas as pd
 import datetime
 import plotly.express as px
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Optional
+
+from esquema_dados import ESQUEMA_PENDENTES, aplicar_esquema
+from exportacao import FORMATOS, exportar, nome_arquivo
+from leitor_xlsx import ColunaFiltroAusente, ler_bytes, ler_xlsx_colunas
+from historico_pendentes import (rotulo_semana, semana_iso, semana_anterior, semana_registrada,
+                                 registrar_semana, semanas_registradas, consultar_historico)
+
+# Tamanho total dos arquivos a partir do qual a leitura usa o pool de processos. Medido com
+# 1 núcleo: a leitura processa ~0,27 MB de XLSX por segundo e iniciar o pool (spawn, que
+# importa este módulo nos processos) custa ~3,8 s, então com 2 processos o pool só compensa
+# a partir de ~2 MB na primeira leitura; abaixo disso a leitura é feita no processo atual.
+LIMIAR_PARALELO_MB = int(os.environ.get("PENDENTES_LIMIAR_PARALELO_MB", "4"))
+
+# Pool reaproveitado entre as leituras (o custo de iniciar os processos é pago uma vez)
+_executor = None
+_processos_executor = 0
+_trava_executor = threading.Lock()
 
 def carregar_arquivo_excel(arquivo):
     """
@@ -14,34 +36,101 @@ def carregar_arquivo_excel(arquivo):
         st.error(f"Erro ao carregar o arquivo: {e}")
         return None
 
-def processar_arquivos_pendentes(arquivos: List) -> pd.DataFrame:
+def ler_pendentes(conteudo: bytes) -> pd.DataFrame:
+    """
+    Lê um arquivo de propostas mantendo apenas as linhas com status 'PENDENTE'.
+    
+    O filtro é aplicado durante a leitura em streaming, então as linhas com outros
+    status nunca chegam a ser materializadas em memória. As colunas são convertidas
+    para os tipos de ESQUEMA_PENDENTES (esquema_dados).
+    Lança ColunaFiltroAusente se o arquivo não tiver a coluna 'Status Processo'.
+    """
+    return aplicar_esquema(ler_xlsx_colunas(conteudo, filtro={'Status Processo': 'PENDENTE'}), ESQUEMA_PENDENTES)
+
+def _ler_pendentes_worker(conteudo: bytes):
+    """
+    Executado nos processos do pool: retorna (situação, DataFrame ou mensagem de erro)
+    """
+    try:
+        return "ok", ler_pendentes(conteudo)
+    except ColunaFiltroAusente:
+        return "sem_status", None
+    except Exception as e:
+        return "erro", str(e)
+
+def _obter_executor(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de processos compartilhado, recriado só quando o número de processos muda.
+    
+    Os processos são iniciados com spawn: copiar o processo (fork) é inseguro com as
+    threads do servidor Streamlit em execução.
+    """
+    global _executor, _processos_executor
+    with _trava_executor:
+        if _executor is None or _processos_executor != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=max_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+            _processos_executor = max_workers
+        return _executor
+
+def _descartar_executor(executor: ProcessPoolExecutor):
+    global _executor
+    with _trava_executor:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+def ler_pendentes_em_paralelo(conteudos: List[bytes], max_workers: Optional[int] = None) -> List:
+    """
+    Lê vários arquivos de propostas em um pool de processos (a leitura do XLSX é limitada por CPU).
+    
+    Com um único arquivo, um único núcleo ou arquivos que somam menos de LIMIAR_PARALELO_MB,
+    os arquivos são lidos no processo atual, onde a leitura é mais rápida que o custo do pool.
+    
+    Returns:
+        Lista de (situação, DataFrame ou mensagem de erro), na mesma ordem dos conteúdos
+    """
+    if not conteudos:
+        return []
+    max_workers = max_workers or min(len(conteudos), os.cpu_count() or 1)
+    if max_workers > 1 and sum(len(conteudo) for conteudo in conteudos) >= LIMIAR_PARALELO_MB * 1024 * 1024:
+        executor = _obter_executor(max_workers)
+        try:
+            return list(executor.map(_ler_pendentes_worker, conteudos))
+        except BrokenProcessPool:
+            # Um processo do pool terminou de forma inesperada: descarta o pool e lê aqui
+            _descartar_executor(executor)
+    return [_ler_pendentes_worker(conteudo) for conteudo in conteudos]
+
+def processar_arquivos_pendentes(arquivos: List, max_workers: Optional[int] = None) -> pd.DataFrame:
     """
     Processa múltiplos arquivos Excel e retorna um dataframe consolidado
-    contendo apenas os registros com status 'PENDENTE'
+    contendo apenas os registros com status 'PENDENTE'.
+    
+    Os arquivos são lidos em paralelo em um pool de processos; o rótulo de semana
+    continua sendo definido pela posição do arquivo no upload.
     """
     if not arquivos:
         return None
     
+    conteudos = [ler_bytes(arquivo) for arquivo in arquivos]
+    resultados = ler_pendentes_em_paralelo(conteudos, max_workers)
+    
     # Lista para armazenar os dataframes de cada arquivo
     dfs = []
     
-    # Processar cada arquivo
-    for idx, arquivo in enumerate(arquivos):
-        df = carregar_arquivo_excel(arquivo)
-        
-        if df is not None:
-            # Filtrar apenas os registros pendentes
-            if 'Status Processo' in df.columns:
-                df_pendentes = df[df['Status Processo'] == 'PENDENTE'].copy()
-                
-                # Adicionar informação sobre qual semana este arquivo representa
-                semana_num = idx + 1
-                df_pendentes['Semana'] = f"Semana -{semana_num}" if idx > 0 else "Semana Atual"
-                
-                # Adicionar à lista de dataframes
-                dfs.append(df_pendentes)
-            else:
-                st.warning(f"O arquivo {arquivo.name} não contém a coluna 'Status Processo' e foi ignorado.")
+    for idx, (arquivo, (situacao, resultado)) in enumerate(zip(arquivos, resultados)):
+        nome = getattr(arquivo, 'name', str(arquivo))
+        if situacao == "erro":
+            st.error(f"Erro ao carregar o arquivo: {resultado}")
+        elif situacao == "sem_status":
+            st.warning(f"O arquivo {nome} não contém a coluna 'Status Processo' e foi ignorado.")
+        else:
+            # Adicionar informação sobre qual semana este arquivo representa
+            resultado['Semana'] = rotulo_semana(idx)
+            dfs.append(resultado)
     
     # Consolidar todos os dataframes
     if dfs:
@@ -50,6 +139,40 @@ def processar_arquivos_pendentes(arquivos: List) -> pd.DataFrame:
     else:
         return None
 
+def registrar_arquivos_no_historico(arquivos: List, semana_mais_recente: str) -> Dict[str, int]:
+    """
+    Registra no histórico local os snapshots semanais enviados.
+    
+    O primeiro arquivo corresponde à semana_mais_recente e cada arquivo seguinte a uma
+    semana anterior. Arquivos já registrados (mesmo conteúdo) são ignorados sem leitura,
+    então a cada nova semana apenas o arquivo novo precisa ser processado.
+    
+    Returns:
+        Contagem de arquivos registrados, já existentes e ignorados
+    """
+    contagem = {"registrados": 0, "existentes": 0, "ignorados": 0}
+    novos = []
+    for idx, arquivo in enumerate(arquivos):
+        conteudo = ler_bytes(arquivo)
+        if semana_registrada(conteudo) is not None:
+            contagem["existentes"] += 1
+        else:
+            novos.append((arquivo, conteudo, semana_anterior(semana_mais_recente, idx)))
+    
+    resultados = ler_pendentes_em_paralelo([conteudo for _, conteudo, _ in novos])
+    for (arquivo, conteudo, semana), (situacao, resultado) in zip(novos, resultados):
+        nome = getattr(arquivo, 'name', str(arquivo))
+        if situacao == "erro":
+            st.error(f"Erro ao carregar o arquivo: {resultado}")
+            contagem["ignorados"] += 1
+        elif situacao == "sem_status":
+            st.warning(f"O arquivo {nome} não contém a coluna 'Status Processo' e foi ignorado.")
+            contagem["ignorados"] += 1
+        else:
+            registrar_semana(conteudo, semana, resultado, nome)
+            contagem["registrados"] += 1
+    return contagem
+
 def exibir_analise_pendentes():
     """
     Função principal para renderizar a aba de análise de pendentes
@@ -64,12 +187,30 @@ def exibir_analise_pendentes():
         accept_multiple_files=True
     )
     
-    if not arquivos_propostas:
-        st.info("Por favor, faça o upload de pelo menos um arquivo Excel com as propostas.")
-        return
+    # Histórico local: cada semana enviada é guardada e não precisa ser reenviada
+    usar_historico = st.checkbox("Manter histórico semanal local", value=True,
+                                 help="As semanas já enviadas ficam salvas; basta enviar o arquivo da semana nova.")
     
-    # Processar os arquivos
-    df_pendentes = processar_arquivos_pendentes(arquivos_propostas)
+    if usar_historico:
+        data_recente = st.date_input("Semana do arquivo mais recente", value=datetime.date.today())
+        if arquivos_propostas:
+            contagem = registrar_arquivos_no_historico(arquivos_propostas, semana_iso(data_recente))
+            st.caption(f"Histórico: {contagem['registrados']} semana(s) nova(s), "
+                       f"{contagem['existentes']} já registrada(s), {contagem['ignorados']} ignorada(s)")
+        
+        semanas = semanas_registradas()
+        if not semanas:
+            st.info("Por favor, faça o upload de pelo menos um arquivo Excel com as propostas.")
+            return
+        ate_semana = st.selectbox("Visão até a semana", semanas, key="ate_semana_pendentes")
+        df_pendentes = consultar_historico(ate_semana=ate_semana)
+    else:
+        if not arquivos_propostas:
+            st.info("Por favor, faça o upload de pelo menos um arquivo Excel com as propostas.")
+            return
+        
+        # Processar os arquivos
+        df_pendentes = processar_arquivos_pendentes(arquivos_propostas)
     
     if df_pendentes is not None and not df_pendentes.empty:
         # Mostrar estatísticas básicas
@@ -104,23 +245,17 @@ def exibir_analise_pendentes():
         st.subheader("Tabela de Propostas Pendentes")
         st.dataframe(df_filtrado, use_container_width=True)
         
-        # Opção para exportar
-        if st.button("Exportar Propostas Pendentes para Excel"):
-            # Gerar nome de arquivo com timestamp
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"propostas_pendentes_{timestamp}.xlsx"
-            
-            # Salvar para Excel
-            df_filtrado.to_excel(filename, index=False)
-            
-            # Botão de download
-            with open(filename, "rb") as file:
-                st.download_button(
-                    label="Baixar arquivo Excel",
-                    data=file,
-                    file_name=filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+        # Opção para exportar (o arquivo é gerado em memória apenas quando o download é pedido)
+        formato = st.selectbox("Formato de exportação", list(FORMATOS), key="formato_pendentes")
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        nome, mime = nome_arquivo(df_filtrado, formato, f"propostas_pendentes_{timestamp}")
+        st.download_button(
+            label="Exportar Propostas Pendentes",
+            data=lambda: exportar(df_filtrado, formato),
+            file_name=nome,
+            mime=mime,
+            key="exportar_pendentes"
+        )
     else:
         st.warning("Não foram encontradas propostas pendentes nos arquivos fornecidos.")
 
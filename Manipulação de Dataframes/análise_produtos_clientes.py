@@ -20,6 +20,10 @@ from IPython.display import display
 
 import pandas as pd
 
+from formatacao import formatar_exibicao, juntar_colunas
+from historico_compacto import formatar_listas
+from motor_analise import agregar_clientes, classificar_abc_totais
+
 
 
 def ler_excel_para_dataframe(caminho_arquivo):
@@ -72,43 +76,9 @@ def classificar_clientes_abc(df):
         return pd.DataFrame(columns=["Cliente", "Nome Cliente", "Valor Total Orçado", "ABC", "UF", "Cidade"])
 
     try:
-        # Agrupar por cliente e somar o valor orçado
-        df_clientes = df.groupby(["Nome Cliente", "Cliente"])["Valor Orçado"].sum().reset_index()
-
-        # Ordenar por valor orçado em ordem decrescente
-        df_clientes = df_clientes.sort_values("Valor Orçado", ascending=False)
-
-
-        # Calcular o valor total orçado para todos os clientes
-        valor_total = df_clientes["Valor Orçado"].sum()
-
-        # Calcular o percentual de cada cliente em relação ao total
-        df_clientes["Percentual"] = df_clientes["Valor Orçado"] / valor_total * 100
-
-        # Calcular o percentual acumulado
-        df_clientes["Percentual Acumulado"] = df_clientes["Percentual"].cumsum()
-
-        # Definir a classificação ABC baseada no percentual acumulado
-        df_clientes["ABC"] = df_clientes["Percentual Acumulado"].apply(
-            lambda x: "A" if x <= 80 else ("B" if x <= 95 else "C")
-        )
-
-        # Renomear coluna para maior clareza
-        df_clientes = df_clientes.rename(columns={"Valor Orçado": "Valor Total Orçado"})
-
-        # Converter a coluna "Valor Total Orçado" para numérico
-        df_clientes['Valor Total Orçado'] = pd.to_numeric(df_clientes['Valor Total Orçado'], errors='coerce')
-
-        #Rankeia os clientes com maiores valores orçados para os com menores valores orçados
-        df_clientes['Ranking'] = df_clientes['Valor Total Orçado'].rank(ascending=False, method='min').astype(int)
-
-        # Ordenar o DataFrame pela coluna "Valor Total Orçado" em ordem decrescente
-        df_clientes = df_clientes.sort_values("Valor Total Orçado", ascending=False)
-
-        # Adicionar as colunas UF e Cidade ao df_clientes
-        df_clientes = pd.merge(df_clientes, df[['Cliente', 'UF', 'Cidade']].drop_duplicates(subset=['Cliente']), on='Cliente', how='left')
-
-
+        # Mesmo motor de classificação do dashboard (totais em centavos, limites de motor_abc);
+        # curvas por segmento e por outras medidas: motor_abc.CurvasABC
+        df_clientes = classificar_abc_totais(agregar_clientes(df))
         return df_clientes[["Cliente", "Nome Cliente", "UF", "Cidade", "Valor Total Orçado", "ABC", "Percentual", "Percentual Acumulado", "Ranking"]]
 
     except Exception as e:
@@ -118,15 +88,9 @@ def classificar_clientes_abc(df):
 
 df_classificacao_abc = classificar_clientes_abc(df_analise_comercial)
 
-#Formatar a coluna "Valor Total Orçado" para o formato de moeda brasileira (R$)
-df_classificacao_abc['Valor Total Orçado'] = df_classificacao_abc['Valor Total Orçado'].apply(lambda x: "R$ {:,.2f}".format(x) if not pd.isnull(x) else "")
-
-
-#Formatar as colunas "Percentual" e "Percentual Acumulado" para porcentagem com duas casas decimais
-df_classificacao_abc['Percentual'] = df_classificacao_abc['Percentual'].apply(lambda x: "{:.2f}%".format(x) if not pd.isnull(x) else "")
-df_classificacao_abc['Percentual Acumulado'] = df_classificacao_abc['Percentual Acumulado'].apply(lambda x: "{:.2f}%".format(x) if not pd.isnull(x) else "")
-
-df_classificacao_abc
+# "Valor Total Orçado" (R$), "Percentual" e "Percentual Acumulado" continuam numéricos;
+# só a exibição é formatada no padrão brasileiro
+formatar_exibicao(df_classificacao_abc)
 
 def juntar_categorias_produtos(df, caminho_excel=None):
     """
@@ -206,22 +170,16 @@ df_resultado_final = juntar_categorias_produtos(df_pedidos, caminho_excel=r"Clas
 
 df_resultado_final
 
-# Converter a coluna 'Dt Entrada' para o formato desejado
-df_resultado_final['Dt Entrada'] = pd.to_datetime(df_resultado_final['Dt Entrada']).dt.strftime('%d/%m/%Y')
+# Manter 'Dt Entrada' como data (formatada como dd/mm/aaaa apenas na exibição)
+df_resultado_final['Dt Entrada'] = pd.to_datetime(df_resultado_final['Dt Entrada'], errors='coerce')
 
-# Função para criar a tupla, omitindo 'Motivo Não Venda' se for vazio
-def criar_tupla(linha):
-    motivo = linha['Motivo Não Venda']
-    if pd.isna(motivo) or motivo == "":  # Verifica se o motivo é vazio ou NaN
-        return (linha['Dt Entrada'], linha['Prob.Fech.'], linha['Consultor Interno'])
-    else:
-        return (linha['Dt Entrada'], linha['Prob.Fech.'], linha['Consultor Interno'], motivo)
-
-# Criar a nova coluna 'Tupla_Dados' com as tuplas
-df_resultado_final['Tupla_Dados'] = df_resultado_final.apply(criar_tupla, axis=1)
+# Criar a nova coluna 'Tupla_Dados' com o texto de cada interação (data, probabilidade,
+# consultor e motivo, omitindo o motivo se for vazio), montado para todas as linhas de uma vez
+df_resultado_final['Tupla_Dados'] = juntar_colunas(
+    df_resultado_final, ['Dt Entrada', 'Prob.Fech.', 'Consultor Interno', 'Motivo Não Venda'])
 
 # Exibir o DataFrame resultante
-df_resultado_final
+formatar_exibicao(df_resultado_final)
 
 df_categorias = df_resultado_final.groupby(["Negócio", "Grupo", "Subgrupo"]).agg({"Código Produto": "first"}).reset_index()
 df_categorias = df_categorias.drop(["Código Produto"], axis=1)
@@ -242,11 +200,6 @@ def primeiro_elemento(valor):
     else:
         return valor  # Se não for uma lista ou Series, retorna o valor original
 
-# Função para formatar a tupla com quebras de linha
-def formatar_tupla(tupla):
-    """Formata a tupla como uma string com quebras de linha, incluindo uma linha vazia entre cada elemento."""
-    return '\n\n\n'.join(map(str, tupla))  # Adiciona uma quebra de linha extra
-
 # Função para extrair a última data (mais recente) de uma lista de datas
 def ultima_data(datas):
     if isinstance(datas, list) and len(datas) > 0:
@@ -257,13 +210,10 @@ def ultima_data(datas):
 # Filtrar clientes de categoria "A" em "ABC" e "SSO" em "Negócio"
 df_filtrado = df_resultado_final
 
-# Converter a coluna 'Dt Entrada' para datetime
-df_filtrado['Dt Entrada_temp'] = pd.to_datetime(df_filtrado['Dt Entrada'], format='%d/%m/%Y')
-
-# Filtrar datas entre 03/01/2022 e 28/02/2025
+# Filtrar datas entre 03/01/2022 e 28/02/2025 ('Dt Entrada' já é data)
 df_filtrado = df_filtrado[
-    (df_filtrado["Dt Entrada_temp"] >= pd.to_datetime("2022-01-01")) &
-    (df_filtrado["Dt Entrada_temp"] <= pd.to_datetime("2025-02-28"))
+    (df_filtrado["Dt Entrada"] >= pd.to_datetime("2022-01-01")) &
+    (df_filtrado["Dt Entrada"] <= pd.to_datetime("2025-02-28"))
 ]
 
 # Criar uma lista para armazenar as informações agrupadas
@@ -278,7 +228,7 @@ for (subgrupo, codigo_produto, cliente), grupo in df_filtrado.groupby(["Subgrupo
     }
 
     # Ordenar os dados por data
-    grupo_ordenado = grupo.sort_values("Dt Entrada_temp")  # Ordenar pelo campo temporário de data
+    grupo_ordenado = grupo.sort_values("Dt Entrada")
 
     # Incluir todas as colunas de df_resultado_final
     for col in df_resultado_final.columns:
@@ -291,9 +241,9 @@ for (subgrupo, codigo_produto, cliente), grupo in df_filtrado.groupby(["Subgrupo
                 linha[col] = linha[col][0]
 
     # Calcular a última data e o último consultor para o grupo
-    ultima_data_grupo = max(grupo_ordenado["Dt Entrada_temp"])  # Última data
-    linha["Última Data"] = ultima_data_grupo.strftime("%d/%m/%Y")  # Formatar a última data
-    linha["Último Consultor"] = grupo_ordenado.loc[grupo_ordenado["Dt Entrada_temp"] == ultima_data_grupo, "Consultor Interno"].iloc[0]  # Último consultor
+    ultima_data_grupo = max(grupo_ordenado["Dt Entrada"])  # Última data (formatada só na exibição)
+    linha["Última Data"] = ultima_data_grupo
+    linha["Último Consultor"] = grupo_ordenado.loc[grupo_ordenado["Dt Entrada"] == ultima_data_grupo, "Consultor Interno"].iloc[0]  # Último consultor
 
     resultado.append(linha)
 
@@ -307,11 +257,11 @@ df_final = pd.DataFrame(resultado)
 ultima_data_index = df_final.columns.get_loc("Última Data")  # Obter o índice da coluna "Última Data"
 df_final.insert(ultima_data_index + 1, "Último Consultor", df_final.pop("Último Consultor"))  # Inserir a nova coluna à direita de "Última Data"
 
-# Formatar a coluna "Tupla_Dados"
-df_final['Tupla_Dados'] = df_final['Tupla_Dados'].apply(formatar_tupla)
+# Formatar a coluna "Tupla_Dados" (listas de textos juntadas de uma vez, com linhas em branco entre as interações)
+df_final['Tupla_Dados'] = formatar_listas(df_final[['Tupla_Dados']], separador='\n\n\n')['Tupla_Dados']
 
 # Exibir o DataFrame resultante
-df_final
+formatar_exibicao(df_final)
 
 # Função para criar botões clicáveis
 def criar_botao():
@@ -344,7 +294,7 @@ df_final["FUP"] = [criar_botao() for _ in range(len(df_final))]
 # Função para exibir o DataFrame com os botões
 def exibir_dataframe_interativo(df):
     # Criar uma interface para exibir o DataFrame
-    display(df)
+    display(formatar_exibicao(df))
 
 # Exibir o DataFrame interativo
 exibir_dataframe_interativo(df_final)
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""
+Compara a classificação ABC em janela móvel (motor_abc.abc_janela_movel) com chamadas
+repetidas de classificar_clientes_abc, uma por mês, sobre as linhas de cada janela.
+
+Mostra o tempo de cada abordagem. A igualdade das classes com uma referência calculada
+janela a janela é verificada em tests/test_motor_abc.py.
+
+Uso:
+    python benchmark_abc_temporal.py --linhas 1000000 --janela 12
+"""
+import argparse
+import time
+
+from dados_sinteticos import gerar_analise
+from motor_abc import abc_janela_movel
+from motor_analise import classificar_clientes_abc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--janela", type=int, default=12, help="Tamanho da janela em meses")
+    parser.add_argument("--anos", type=int, default=3, help="Período coberto pelos dados sintéticos")
+    args = parser.parse_args()
+
+    df = gerar_analise(args.linhas, anos=args.anos)
+    meses = df["Dt Entrada"].dt.to_period("M")
+
+    inicio = time.perf_counter()
+    matriz = abc_janela_movel(df, args.janela)
+    t_matriz = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for mes in matriz.columns:
+        classificar_clientes_abc(df[(meses <= mes) & (meses > mes - args.janela)])
+    t_repetido = time.perf_counter() - inicio
+
+    print(f"{len(df)} linhas, {matriz.shape[0]} clientes, {matriz.shape[1]} meses, janela de {args.janela} meses")
+    print(f"{'classificar_clientes_abc por mês (s)':<40} {t_repetido:>8.2f}")
+    print(f"{'abc_janela_movel (s)':<40} {t_matriz:>8.2f}")
+    print(f"{'aceleração':<40} {t_repetido / t_matriz:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compara o processamento em memória (executar_pipeline) com o processamento fora da memória
+(motor_externo) sobre os mesmos dados sintéticos.
+
+Os dados são gravados antes em um Parquet temporário. Cada modo roda em um processo novo,
+para que o pico de memória de um não influencie o do outro: o modo em memória lê o arquivo
+inteiro e o modo fora da memória lê em blocos de --linhas-bloco linhas e grava o resultado em
+partes, sem mantê-lo em memória. Mostra o tempo, o pico de memória acima do processo
+recém-iniciado (que no modo fora da memória inclui o leitor dos blocos, fora do limite) e o
+tamanho do resultado em memória. A igualdade dos resultados é verificada em
+tests/test_motor_externo.py.
+
+Uso:
+    python benchmark_externo.py
+    python benchmark_externo.py --linhas 5000000 --limite-mb 1024 --esquema
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cache_excel import dataframe_arrow, gravar_parquet, ler_parquet, tabela_arrow
+from dados_sinteticos import gerar_analise, gerar_categorias
+from esquema_dados import ESQUEMA_ANALISE, ESQUEMA_CATEGORIAS, aplicar_esquema
+from motor_externo import processar_fora_da_memoria
+from perfil import monitorar_memoria
+from pipeline_comercial import executar_pipeline
+
+
+def ler_blocos(caminho, linhas_bloco):
+    """Lê o Parquet gravado por gravar_parquet em blocos de linhas."""
+    arquivo = pq.ParquetFile(caminho)
+    metadados = arquivo.schema_arrow.metadata
+    for lote in arquivo.iter_batches(batch_size=linhas_bloco):
+        yield dataframe_arrow(pa.Table.from_batches([lote]).replace_schema_metadata(metadados))
+
+
+def executar_modo(modo, caminho_analise, caminho_categorias, caminho_saida, limpar, limite_mb, linhas_bloco):
+    """Executado em um processo novo: processa os dados e grava o resultado. Retorna (segundos, pico em MB)."""
+    df_categorias = ler_parquet(caminho_categorias)
+    # Aquecimento com um bloco: importações e alocações feitas só na primeira execução
+    # ficam fora da medição
+    bloco = next(ler_blocos(caminho_analise, linhas_bloco))
+    if modo == "memoria":
+        executar_pipeline(bloco, df_categorias, limpar=limpar)
+    else:
+        processar_fora_da_memoria([bloco], df_categorias, limpar=limpar, limite_memoria_mb=limite_mb,
+                                  saida=caminho_saida)
+    del bloco
+    df_final = None
+    with monitorar_memoria(intervalo=0.01) as memoria:
+        inicio = time.perf_counter()
+        if modo == "memoria":
+            df_final, _ = executar_pipeline(ler_parquet(caminho_analise), df_categorias, limpar=limpar)
+        else:
+            processar_fora_da_memoria(ler_blocos(caminho_analise, linhas_bloco), df_categorias, limpar=limpar,
+                                      limite_memoria_mb=limite_mb, saida=caminho_saida)
+        segundos = time.perf_counter() - inicio
+    bytes_resultado = 0
+    if df_final is not None:
+        bytes_resultado = int(df_final.memory_usage(index=True, deep=True).sum())
+        gravar_parquet(df_final, caminho_saida)
+    return segundos, memoria["pico_bytes"] / 1024 ** 2, bytes_resultado / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=2_000_000)
+    parser.add_argument("--limite-mb", type=int, default=512, help="Memória de trabalho do modo fora da memória")
+    parser.add_argument("--linhas-bloco", type=int, default=50_000, help="Linhas de cada bloco lido")
+    parser.add_argument("--esquema", action="store_true", help="Aplica os tipos de esquema_dados aos dados")
+    parser.add_argument("--sem-limpeza", action="store_true", help="Não aplica a etapa de limpeza")
+    args = parser.parse_args()
+
+    df_analise = gerar_analise(args.linhas)
+    df_categorias = gerar_categorias(df_analise)
+    if args.esquema:
+        df_analise = aplicar_esquema(df_analise, ESQUEMA_ANALISE)
+        df_categorias = aplicar_esquema(df_categorias, ESQUEMA_CATEGORIAS)
+
+    # Processos novos (spawn), sem herdar a memória do processo que gerou os dados
+    contexto = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_analise = os.path.join(diretorio, "analise.parquet")
+        caminho_categorias = os.path.join(diretorio, "categorias.parquet")
+        # Grupos de linhas do tamanho dos blocos: a leitura em blocos não descompacta o arquivo inteiro
+        pq.write_table(tabela_arrow(df_analise), caminho_analise, row_group_size=args.linhas_bloco)
+        gravar_parquet(df_categorias, caminho_categorias)
+        del df_analise
+
+        print(f"{args.linhas} linhas; limite do modo fora da memória: {args.limite_mb} MB")
+        print(f"{'modo':<18} {'tempo (s)':>10} {'pico (MB)':>10} {'resultado (MB)':>15}")
+        for modo in ("memoria", "fora_da_memoria"):
+            saida = os.path.join(diretorio, "memoria.parquet" if modo == "memoria" else modo)
+            with contexto.Pool(1) as pool:
+                segundos, pico, resultado = pool.apply(executar_modo, (
+                    modo, caminho_analise, caminho_categorias, saida, not args.sem_limpeza,
+                    args.limite_mb, args.linhas_bloco))
+            print(f"{modo:<18} {segundos:>10.2f} {pico:>10.1f} {resultado:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
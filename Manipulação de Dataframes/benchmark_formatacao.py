@@ -0,0 +1,94 @@
+"""
+Compara a formatação vetorizada de formatacao.py (moeda, percentual, data e junção de
+colunas) com o apply linha a linha usado antes no notebook de análise.
+
+Mostra também o custo de formatar só uma página (formatação na exibição) em vez do
+DataFrame inteiro. A igualdade dos textos com os do apply é verificada em
+tests/test_formatacao.py.
+
+Uso:
+    python benchmark_formatacao.py
+    python benchmark_formatacao.py --tamanhos 100000 1000000 --itens-pagina 50
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from dados_sinteticos import gerar_analise
+from formatacao import formatar_data, formatar_exibicao, formatar_moeda, formatar_percentual, juntar_colunas
+
+
+COLUNAS_TUPLA = ["Dt Entrada", "Prob.Fech.", "Consultor Interno", "Motivo Não Venda"]
+
+# Troca os separadores do formato americano ("1,234.50") pelos brasileiros ("1.234,50")
+_SEPARADORES_BR = str.maketrans(",.", ".,")
+
+
+def moeda_por_linha(serie):
+    """Formatação de moeda com apply (como no notebook), com os separadores brasileiros."""
+    return serie.apply(lambda x: ("-" if x < 0 else "") + "R$ " + "{:,.2f}".format(abs(x)).translate(_SEPARADORES_BR)
+                       if not pd.isnull(x) else "")
+
+
+def percentual_por_linha(serie):
+    return serie.apply(lambda x: "{:,.2f}%".format(x).translate(_SEPARADORES_BR) if not pd.isnull(x) else "")
+
+
+def tupla_por_linha(df):
+    """Tupla_Dados como no notebook: datas em texto, uma tupla por linha e a junção de cada tupla."""
+    df = df[COLUNAS_TUPLA].copy()
+    df["Dt Entrada"] = df["Dt Entrada"].dt.strftime("%d/%m/%Y")
+
+    def criar_tupla(linha):
+        motivo = linha["Motivo Não Venda"]
+        if pd.isna(motivo) or motivo == "":
+            return (linha["Dt Entrada"], linha["Prob.Fech."], linha["Consultor Interno"])
+        return (linha["Dt Entrada"], linha["Prob.Fech."], linha["Consultor Interno"], motivo)
+
+    return df.apply(criar_tupla, axis=1).apply(lambda tupla: ", ".join(map(str, tupla)))
+
+
+def medir(funcao, *args):
+    """Executa a função e retorna (resultado, segundos)."""
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--itens-pagina", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'formatação':<22} {'por linha (s)':>14} {'vetorizado (s)':>15} {'ganho':>8}")
+    for n in args.tamanhos:
+        df = gerar_analise(n)
+        df["Percentual"] = df["Valor Orçado"] / df["Valor Orçado"].max() * 100
+
+        casos = [
+            ("moeda", moeda_por_linha, formatar_moeda, df["Valor Orçado"]),
+            ("percentual", percentual_por_linha, formatar_percentual, df["Percentual"]),
+            ("data", lambda serie: serie.dt.strftime("%d/%m/%Y").fillna(""), formatar_data, df["Dt Entrada"]),
+            ("Tupla_Dados", tupla_por_linha, lambda d: juntar_colunas(d, COLUNAS_TUPLA), df),
+        ]
+        for nome, por_linha, vetorizado, dados in casos:
+            _, t_linha = medir(por_linha, dados)
+            _, t_vetor = medir(vetorizado, dados)
+            print(f"{n:>10} {nome:<22} {t_linha:>14.3f} {t_vetor:>15.3f} {t_linha / t_vetor:>7.1f}x")
+
+        # Formatar na exibição: só a página mostrada, em vez de converter todas as linhas antes
+        colunas = ["Dt Entrada", "Valor Orçado", "Percentual"]
+        _, t_tudo = medir(lambda: df[colunas].assign(**{
+            "Dt Entrada": df["Dt Entrada"].dt.strftime("%d/%m/%Y"),
+            "Valor Orçado": moeda_por_linha(df["Valor Orçado"]),
+            "Percentual": percentual_por_linha(df["Percentual"]),
+        }))
+        _, t_pagina = medir(formatar_exibicao, df[colunas].iloc[:args.itens_pagina])
+        print(f"{n:>10} {'página (' + str(args.itens_pagina) + ' linhas)':<22} {t_tudo:>14.3f} {t_pagina:>15.4f} "
+              f"{t_tudo / t_pagina:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark do motor de histórico (motor_historico.agregar_historico) contra o laço
+em lotes de 1000 linhas usado anteriormente em processar_dados.
+
+Também mostra a memória das colunas de histórico na representação compacta (listas Arrow)
+e a estimativa da mesma informação como listas Python.
+
+Uso:
+    python benchmark_historico.py
+    python benchmark_historico.py --tamanhos 100000 1000000 --limite-legado 1000000
+"""
+import argparse
+import gc
+import time
+
+import numpy as np
+import pandas as pd
+
+from historico_compacto import comparar_memoria
+from motor_historico import agregar_historico
+
+
+def gerar_dados(n_linhas, semente=42):
+    """Gera um DataFrame sintético com o esquema da análise comercial."""
+    rng = np.random.default_rng(semente)
+    n_clientes = max(n_linhas // 50, 10)
+    n_produtos = max(n_linhas // 100, 10)
+    clientes = rng.integers(1, n_clientes + 1, n_linhas)
+    inicio = np.datetime64("2022-01-01")
+    return pd.DataFrame({
+        "Cliente": clientes,
+        "Nome Cliente": np.char.add("Cliente ", clientes.astype(str)),
+        "Código Produto": rng.integers(1, n_produtos + 1, n_linhas),
+        "Descrição Produto": "Produto",
+        "Dt Entrada": inicio + rng.integers(0, 3 * 365, n_linhas).astype("timedelta64[D]"),
+        "Valor Orçado": rng.lognormal(8, 1.5, n_linhas).round(2),
+        "Consultor Interno": rng.choice(["Ana", "Bruno", "Carla", "Diego"], n_linhas),
+        "Prob.Fech.": rng.choice([0, 25, 50, 75, 100], n_linhas),
+        "Motivo Não Venda": rng.choice(["", "Preço", "Prazo", "Concorrência"], n_linhas),
+    })
+
+
+def agregar_historico_legado(df_analise):
+    """Reprodução do laço em lotes antigo de processar_dados (somente a parte do histórico)."""
+    resultado = []
+    lote_size = 1000
+    for i in range(0, len(df_analise), lote_size):
+        lote = df_analise.iloc[i:i + lote_size]
+        for (cliente, codigo_produto), grupo in lote.groupby(["Cliente", "Código Produto"]):
+            ultima_idx = grupo["Dt Entrada"].idxmax() if not grupo["Dt Entrada"].isna().all() else grupo.index[0]
+            resultado.append({
+                "Cliente": cliente,
+                "Nome Cliente": grupo["Nome Cliente"].iloc[0],
+                "Código Produto": codigo_produto,
+                "Descrição Produto": grupo["Descrição Produto"].iloc[0],
+                "Dt Entrada": grupo["Dt Entrada"].dt.strftime("%Y-%m-%d").tolist(),
+                "Prob.Fech.": grupo["Prob.Fech."].tolist(),
+                "Motivo Não Venda": grupo["Motivo Não Venda"].tolist(),
+                "Última Data": grupo.loc[ultima_idx, "Dt Entrada"],
+                "Último Consultor": grupo.loc[ultima_idx, "Consultor Interno"],
+            })
+        gc.collect()
+    return pd.DataFrame(resultado)
+
+
+def medir(funcao, *args):
+    """Executa a função e retorna (resultado, segundos)."""
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--limite-legado", type=int, default=None,
+                        help="Não executa o laço legado acima deste número de linhas")
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'grupos':>10} {'legado (s)':>12} {'vetorizado (s)':>15} {'ganho':>8} "
+          f"{'compacto (MB)':>14} {'listas (MB)':>12} {'redução':>8}")
+    for n in args.tamanhos:
+        df = gerar_dados(n)
+        df_novo, t_novo = medir(agregar_historico, df)
+
+        if args.limite_legado is not None and n > args.limite_legado:
+            texto_legado, texto_ganho = "-", "-"
+        else:
+            _, t_legado = medir(agregar_historico_legado, df)
+            texto_legado, texto_ganho = f"{t_legado:.2f}", f"{t_legado / t_novo:.1f}x"
+
+        memoria = comparar_memoria(df_novo)
+        print(f"{n:>10} {len(df_novo):>10} {texto_legado:>12} {t_novo:>15.2f} {texto_ganho:>8} "
+              f"{memoria['bytes_compacto'] / 1024**2:>14.1f} {memoria['bytes_listas'] / 1024**2:>12.1f} "
+              f"{memoria['reducao']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
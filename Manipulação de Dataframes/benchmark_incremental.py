@@ -0,0 +1,71 @@
+"""
+Compara o processamento incremental (motor_incremental) com o processamento completo
+(motor_analise.processar) ao acrescentar meses a uma exportação comercial sintética.
+
+Para cada mês acrescentado, mostra o tempo de cada um. A igualdade dos resultados é
+verificada em tests/test_motor_incremental.py.
+
+Uso:
+    python benchmark_incremental.py --linhas 500000 --meses 3
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmark_historico import gerar_dados
+from motor_analise import processar
+from motor_incremental import ProcessamentoIncremental
+
+
+def gerar_categorias(df_analise):
+    """Gera a planilha de categorias para os produtos do DataFrame sintético."""
+    produtos = np.sort(df_analise["Código Produto"].unique())
+    return pd.DataFrame({
+        "Código Produto": produtos,
+        "Negócio": [f"Negócio {p % 3}" for p in produtos],
+        "Grupo": [f"Grupo {p % 7}" for p in produtos],
+        "Subgrupo": [f"Subgrupo {p % 13}" for p in produtos],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=500_000)
+    parser.add_argument("--meses", type=int, default=3, help="Meses acrescentados incrementalmente")
+    args = parser.parse_args()
+
+    df = gerar_dados(args.linhas)
+    df["UF"] = np.where(df["Cliente"] % 2 == 0, "SP", "MG")
+    df["Cidade"] = "Cidade " + (df["Cliente"] % 10).astype(str)
+    df = df.sort_values("Dt Entrada", kind="mergesort").reset_index(drop=True)
+    df_categorias = gerar_categorias(df)
+
+    # Separar os últimos meses, que serão acrescentados um a um
+    mes = df["Dt Entrada"].dt.to_period("M")
+    ultimos = sorted(mes.unique())[-args.meses:]
+    df_base = df[~mes.isin(ultimos)]
+
+    incremental = ProcessamentoIncremental(df_categorias)
+    incremental.processar_tudo(df_base)
+    df_acumulado = df_base
+
+    print(f"{'mês':>8} {'novas linhas':>13} {'completo (s)':>13} {'incremental (s)':>16}")
+    for periodo in ultimos:
+        df_novas = df[mes == periodo]
+        df_acumulado = pd.concat([df_acumulado, df_novas], ignore_index=True)
+
+        inicio = time.perf_counter()
+        processar(df_acumulado, df_categorias)
+        t_completo = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        incremental.acrescentar(df_novas)
+        t_incremental = time.perf_counter() - inicio
+
+        print(f"{str(periodo):>8} {len(df_novas):>13} {t_completo:>13.2f} {t_incremental:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
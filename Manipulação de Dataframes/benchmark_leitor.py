@@ -0,0 +1,71 @@
+"""
+Benchmark de memória e tempo da leitura em streaming com projeção de colunas
+(leitor_xlsx.ler_xlsx_colunas) contra pd.read_excel da planilha inteira.
+
+Uso:
+    python benchmark_leitor.py --linhas 200000 --colunas-extras 40
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from leitor_xlsx import COLUNAS_ANALISE, ler_xlsx_colunas
+
+
+def gerar_planilha(caminho, n_linhas, colunas_extras, semente=42):
+    """Grava uma planilha sintética com as colunas do pipeline e colunas extras não usadas."""
+    rng = np.random.default_rng(semente)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    extras = [f"Coluna Extra {i}" for i in range(colunas_extras)]
+    ws.append(COLUNAS_ANALISE + extras)
+
+    inicio = pd.Timestamp("2022-01-01")
+    dias = rng.integers(0, 3 * 365, n_linhas)
+    for i in range(n_linhas):
+        cliente = int(rng.integers(1, 5000))
+        ws.append([
+            cliente, int(rng.integers(1, 2000)), "Produto", (inicio + pd.Timedelta(days=int(dias[i]))).to_pydatetime(),
+            float(round(rng.lognormal(8, 1.5), 2)), f"Cliente {cliente}", "Consultor", 50, "", "SP", "São Paulo"
+        ] + [f"valor {i}"] * colunas_extras)
+    wb.save(caminho)
+
+
+def medir(funcao, *args, **kwargs):
+    """Executa a função e retorna (resultado, segundos, pico de memória em MB)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, duracao, pico / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--colunas-extras", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "analise.xlsx")
+        gerar_planilha(caminho, args.linhas, args.colunas_extras)
+
+        df_completo, t_completo, m_completo = medir(pd.read_excel, caminho)
+        df_projetado, t_projetado, m_projetado = medir(ler_xlsx_colunas, caminho, COLUNAS_ANALISE)
+
+    print(f"{'leitura':<28} {'linhas':>10} {'colunas':>8} {'tempo (s)':>10} {'pico (MB)':>10}")
+    print(f"{'pd.read_excel':<28} {len(df_completo):>10} {df_completo.shape[1]:>8} {t_completo:>10.2f} {m_completo:>10.1f}")
+    print(f"{'streaming + projeção':<28} {len(df_projetado):>10} {df_projetado.shape[1]:>8} {t_projetado:>10.2f} {m_projetado:>10.1f}")
+    print(f"Pico de memória: {m_projetado / m_completo:.0%} da leitura completa")
+
+
+if __name__ == "__main__":
+    main()
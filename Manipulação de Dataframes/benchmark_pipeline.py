@@ -0,0 +1,348 @@
+"""
+Benchmark de cada etapa do pipeline sobre dados sintéticos (dados_sinteticos.py).
+
+Para cada tamanho, mede o tempo e o pico de memória de:
+    limpar_dataframe, classificar_clientes_abc, processar_dados, processar_dados_particionado
+    (executar_pipeline em vários processos, por partição de clientes; o dashboard não usa esse
+    modo), processar_dados_produtos_clientes, indice_filtros (construção do índice dos filtros),
+    filtrar_posicoes (só as posições das linhas), filtrar_dataframe (posições + extração das
+    linhas), facetas_filtros (opções e contagens dos filtros dependentes),
+    indice_ordenacao (permutações das colunas de ordenação), pagina_ordenada (ordenar as
+    linhas filtradas e montar uma página para exibição), curvas_abc (curvas ABC por segmento
+    e medida), reclassificar_abc (novos limites A/B sobre as curvas) e processar_arquivos_pendentes.
+
+As funções do dashboard são chamadas diretamente (sem o cache do Streamlit). A etapa
+particionada mostra o ganho sobre a etapa em um processo (o pico de memória medido é só o do
+processo principal); a igualdade dos resultados é verificada em
+tests/test_execucao_particionada.py. Com --esquema, os dados
+sintéticos recebem os tipos de esquema_dados, como na carga do dashboard. Os resultados
+são acrescentados a um arquivo JSON Lines junto com o commit atual, para comparar versões:
+
+Uso:
+    python benchmark_pipeline.py --tamanhos 10000 100000 1000000
+    python benchmark_pipeline.py --tamanhos 10000000 --etapas processar_dados filtrar_dataframe
+    python benchmark_pipeline.py --tamanhos 1000000 --etapas filtrar_posicoes --repeticoes-filtro 50
+    python benchmark_pipeline.py --tamanhos 1000000 --etapas processar_dados_particionado --processos 8 --esquema
+    python benchmark_pipeline.py --comparar a1b2c3d e4f5a6b
+"""
+import argparse
+import datetime
+import gc
+import importlib.util
+import json
+import os
+import subprocess
+import time
+
+import numpy as np
+
+from analise_pendentes import processar_arquivos_pendentes
+from dados_sinteticos import gerar_analise, gerar_arquivos_pendentes, gerar_categorias
+from dimensoes import ProductDimension
+from esquema_dados import ESQUEMA_ANALISE, ESQUEMA_CATEGORIAS, aplicar_esquema
+from indice_filtros import IndiceFiltros
+from motor_abc import MEDIDAS, CurvasABC
+from paginacao import IndiceOrdenacao, paginar, preparar_pagina, total_paginas
+from perfil import monitorar_memoria
+from pipeline_comercial import executar_pipeline
+
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_RESULTADOS = os.path.join(PASTA, "resultados_benchmark.jsonl")
+
+ETAPAS = ["limpar_dataframe", "classificar_clientes_abc", "processar_dados", "processar_dados_particionado",
+          "processar_dados_produtos_clientes", "indice_filtros", "filtrar_posicoes", "filtrar_dataframe",
+          "facetas_filtros", "indice_ordenacao", "pagina_ordenada",
+          "curvas_abc", "reclassificar_abc", "processar_arquivos_pendentes"]
+
+# Etapas em vários processos e a etapa equivalente em um processo (base do ganho)
+ETAPAS_PARTICIONADAS = {
+    "processar_dados_particionado": "processar_dados",
+}
+
+# Colunas ordenadas nas etapas indice_ordenacao e pagina_ordenada
+COLUNAS_ORDENACAO = ["Valor Total Orçado", "Nome Cliente", "Última Data"]
+
+
+def carregar_dashboard():
+    """Importa o script do dashboard (nome com hífen) sem um servidor Streamlit."""
+    from streamlit import config
+    from streamlit.logger import set_log_level
+
+    # Sem servidor, o Streamlit registra um aviso a cada chamada de st.*; a opção de
+    # configuração evita que o nível seja restaurado quando a configuração é lida
+    config.set_option("logger.level", "error")
+    set_log_level("error")
+    spec = importlib.util.spec_from_file_location(
+        "dashboard", os.path.join(PASTA, "manipulacao-analise-comercial.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def sem_cache(funcao):
+    """Função original por trás de @st.cache_data ou memorizar (o benchmark mede o cálculo, não o cache)."""
+    return getattr(funcao, "__wrapped__", funcao)
+
+
+def commit_atual():
+    """Commit atual do repositório (com '+' quando há alterações não commitadas)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PASTA, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        alterado = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PASTA,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("+" if alterado else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def medir_etapa(funcao, *args):
+    """Executa a etapa medindo tempo e pico de memória. Retorna (resultado, segundos, memória)."""
+    gc.collect()
+    with monitorar_memoria() as memoria:
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        segundos = time.perf_counter() - inicio
+    return resultado, segundos, memoria
+
+
+def combinacoes_filtro(df_final):
+    """Combinações típicas de filtros: negócio, negócio + grupo, cliente e consultor + subgrupo."""
+    negocio = df_final["Negócio"].mode().iloc[0]
+    grupo = df_final.loc[df_final["Negócio"] == negocio, "Grupo"].mode().iloc[0]
+    subgrupo = df_final["Subgrupo"].mode().iloc[0]
+    cliente = df_final["Nome Cliente"].mode().iloc[0]
+    consultor = df_final["Último Consultor"].mode().iloc[0]
+    return [
+        (negocio, "Todos", "Todos", "Todos", "Todos"),
+        (negocio, grupo, "Todos", "Todos", "Todos"),
+        ("Todos", "Todos", "Todos", cliente, "Todos"),
+        ("Todos", "Todos", subgrupo, "Todos", consultor),
+    ]
+
+
+def filtrar_varias_vezes(filtrar, df_final, indice, combinacoes, repeticoes):
+    """Aplica cada combinação de filtros repetidas vezes; retorna o último resultado."""
+    resultado = df_final
+    for _ in range(repeticoes):
+        for filtros in combinacoes:
+            resultado = filtrar(df_final, *filtros, indice=indice)
+    return resultado
+
+
+def facetas_varias_vezes(indice, combinacoes, repeticoes):
+    """Calcula as facetas de cada combinação de filtros repetidas vezes; retorna as últimas."""
+    facetas = None
+    for _ in range(repeticoes):
+        for filtros in combinacoes:
+            facetas = indice.facetas(dict(zip(indice.colunas, filtros)))
+    return facetas
+
+
+def calcular_permutacoes(df_final):
+    """Índice de ordenação com as permutações (nas duas direções) das colunas de COLUNAS_ORDENACAO."""
+    indice_ordenacao = IndiceOrdenacao(df_final)
+    for coluna in COLUNAS_ORDENACAO:
+        for ascendente in (True, False):
+            indice_ordenacao.permutacao(coluna, ascendente)
+    return indice_ordenacao
+
+
+def paginas_varias_vezes(df_final, indice, indice_ordenacao, combinacoes, repeticoes, itens_por_pagina=50):
+    """
+    Para cada combinação de filtros, coluna e direção, ordena as linhas filtradas e monta uma
+    página aleatória para exibição; retorna a última página.
+    """
+    rng = np.random.default_rng(0)
+    pagina = None
+    for _ in range(repeticoes):
+        for filtros in combinacoes:
+            posicoes = indice.filtrar(dict(zip(indice.colunas, filtros)))
+            for coluna in COLUNAS_ORDENACAO:
+                for ascendente in (True, False):
+                    ordem = indice_ordenacao.ordenar(posicoes, coluna, ascendente)
+                    numero = int(rng.integers(1, total_paginas(len(ordem), itens_por_pagina) + 1))
+                    pagina = preparar_pagina(df_final, paginar(ordem, numero, itens_por_pagina))
+    return pagina
+
+
+def reclassificar_varias_vezes(curvas):
+    """Resumo ABC de cada segmento e medida para vários limites de A (como um slider); retorna o último."""
+    resumo = None
+    for segmento in curvas.segmentos:
+        for medida in MEDIDAS:
+            for limite_a in range(50, 91, 5):
+                resumo = curvas.resumo(segmento, medida, limite_a, 95)
+    return resumo
+
+
+def executar(tamanhos, etapas, semente, linhas_pendentes, arquivo, repeticoes_filtro=20, processos=None,
+             esquema=False):
+    dash = carregar_dashboard()
+    commit = commit_atual()
+    data = datetime.datetime.now().isoformat(timespec="seconds")
+    processos = processos or os.cpu_count() or 1
+
+    print(f"commit {commit}")
+    print(f"{'etapa':<46} {'linhas':>10} {'saída':>10} {'tempo (s)':>10} {'pico (MB)':>10}")
+    for n in tamanhos:
+        df_analise = gerar_analise(n, semente)
+        df_categorias = gerar_categorias(df_analise, semente)
+        if esquema:
+            df_analise = aplicar_esquema(df_analise, ESQUEMA_ANALISE)
+            df_categorias = aplicar_esquema(df_categorias, ESQUEMA_CATEGORIAS)
+        arquivos_pendentes = (gerar_arquivos_pendentes(df_analise, max_linhas=linhas_pendentes, semente=semente)
+                              if "processar_arquivos_pendentes" in etapas else [])
+
+        # filtrar_dataframe usa o resultado de processar_dados e o índice dos filtros, que rodam
+        # mesmo sem ser registrados
+        necessarias = set(etapas)
+        necessarias.update(ETAPAS_PARTICIONADAS[etapa] for etapa in etapas if etapa in ETAPAS_PARTICIONADAS)
+        if "pagina_ordenada" in necessarias:
+            necessarias.add("indice_ordenacao")
+        if necessarias & {"filtrar_posicoes", "filtrar_dataframe", "facetas_filtros", "pagina_ordenada"}:
+            necessarias.add("indice_filtros")
+        if "reclassificar_abc" in necessarias:
+            necessarias.add("curvas_abc")
+        if "indice_ordenacao" in necessarias:
+            necessarias.add("processar_dados")
+        if "indice_filtros" in necessarias:
+            necessarias.add("processar_dados")
+        df_limpo = df_analise
+        df_final = None
+        indice = None
+        indice_ordenacao = None
+        tempos = {}
+        for etapa in ETAPAS:
+            if etapa not in necessarias:
+                continue
+
+            if etapa == "limpar_dataframe":
+                df_limpo, segundos, memoria = medir_etapa(dash.limpar_dataframe, df_analise)
+                saida = len(df_limpo)
+            elif etapa == "classificar_clientes_abc":
+                resultado, segundos, memoria = medir_etapa(dash.classificar_clientes_abc, df_limpo)
+                saida = len(resultado)
+            elif etapa == "processar_dados":
+                df_final, segundos, memoria = medir_etapa(sem_cache(dash.processar_dados), df_limpo, df_categorias)
+                saida = len(df_final)
+            elif etapa == "processar_dados_particionado":
+                resultado, segundos, memoria = medir_etapa(
+                    lambda: executar_pipeline(df_limpo, df_categorias, processos=processos)[0])
+                saida = len(resultado)
+            elif etapa == "processar_dados_produtos_clientes":
+                resultado, segundos, memoria = medir_etapa(dash.processar_dados_produtos_clientes, df_limpo,
+                                                           df_categorias)
+                saida = len(resultado)
+            elif etapa == "indice_filtros":
+                indice, segundos, memoria = medir_etapa(IndiceFiltros, df_final)
+                saida = indice.n_linhas
+            elif etapa in ("filtrar_posicoes", "filtrar_dataframe"):
+                # Tempo médio por filtro, sobre várias combinações típicas de filtros
+                combinacoes = combinacoes_filtro(df_final)
+                resultado, segundos, memoria = medir_etapa(filtrar_varias_vezes, getattr(dash, etapa),
+                                                           df_final, indice, combinacoes, repeticoes_filtro)
+                segundos /= repeticoes_filtro * len(combinacoes)
+                saida = len(resultado)
+            elif etapa == "facetas_filtros":
+                combinacoes = combinacoes_filtro(df_final)
+                resultado, segundos, memoria = medir_etapa(facetas_varias_vezes, indice, combinacoes,
+                                                           repeticoes_filtro)
+                segundos /= repeticoes_filtro * len(combinacoes)
+                saida = sum(len(contagens) for contagens in resultado.values())
+            elif etapa == "indice_ordenacao":
+                indice_ordenacao, segundos, memoria = medir_etapa(calcular_permutacoes, df_final)
+                saida = indice_ordenacao.n_linhas
+            elif etapa == "pagina_ordenada":
+                # Tempo médio por página (filtro + ordenação + montagem da página exibida)
+                combinacoes = combinacoes_filtro(df_final)
+                resultado, segundos, memoria = medir_etapa(paginas_varias_vezes, df_final, indice,
+                                                           indice_ordenacao, combinacoes, repeticoes_filtro)
+                segundos /= repeticoes_filtro * len(combinacoes) * len(COLUNAS_ORDENACAO) * 2
+                saida = len(resultado)
+            elif etapa == "curvas_abc":
+                curvas, segundos, memoria = medir_etapa(CurvasABC, df_limpo, ProductDimension(df_categorias))
+                saida = sum(len(curva["segmento"]) for curva in curvas.curvas.values())
+            elif etapa == "reclassificar_abc":
+                # Tempo médio de uma mudança de limite (resumo de todos os valores do segmento)
+                resultado, segundos, memoria = medir_etapa(reclassificar_varias_vezes, curvas)
+                segundos /= len(curvas.segmentos) * len(MEDIDAS) * len(range(50, 91, 5))
+                saida = len(resultado)
+            else:
+                resultado, segundos, memoria = medir_etapa(processar_arquivos_pendentes, arquivos_pendentes)
+                saida = 0 if resultado is None else len(resultado)
+
+            tempos[etapa] = segundos
+            base = ETAPAS_PARTICIONADAS.get(etapa)
+
+            if etapa not in etapas:
+                continue
+            linhas = (min(linhas_pendentes, n) * len(arquivos_pendentes)
+                      if etapa == "processar_arquivos_pendentes" else n)
+            registro = {
+                "commit": commit, "data": data, "etapa": etapa, "linhas": linhas, "linhas_saida": saida,
+                "segundos": round(segundos, 6), "pico_mb": round(memoria["pico_bytes"] / 1024 ** 2, 1),
+                "metodo_memoria": memoria["metodo"], "semente": semente, "esquema": esquema,
+            }
+            ganho = ""
+            if base is not None:
+                registro["processos"] = processos
+                registro["ganho"] = round(tempos[base] / segundos, 3)
+                ganho = f" {registro['ganho']:>6.2f}x com {processos} processos"
+            with open(arquivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            print(f"{etapa:<46} {linhas:>10} {saida:>10} {segundos:>10.4f} {registro['pico_mb']:>10.1f}{ganho}")
+
+
+def comparar(base, alvo, arquivo):
+    """Compara os resultados de dois commits (a medição mais recente de cada etapa/tamanho)."""
+    resultados = {}
+    with open(arquivo, encoding="utf-8") as f:
+        for linha in f:
+            registro = json.loads(linha)
+            for commit in (base, alvo):
+                if registro["commit"].startswith(commit):
+                    resultados[(commit, registro["etapa"], registro["linhas"])] = registro
+
+    chaves = sorted({(etapa, linhas) for _, etapa, linhas in resultados},
+                    key=lambda chave: (ETAPAS.index(chave[0]) if chave[0] in ETAPAS else len(ETAPAS), chave[1]))
+    print(f"{'etapa':<46} {'linhas':>10} {base[:9]:>10} {alvo[:9]:>10} {'tempo':>8} {'memória':>8}")
+    for etapa, linhas in chaves:
+        a = resultados.get((base, etapa, linhas))
+        b = resultados.get((alvo, etapa, linhas))
+        if a is None or b is None:
+            continue
+        razao_tempo = b["segundos"] / a["segundos"] if a["segundos"] else float("nan")
+        razao_memoria = b["pico_mb"] / a["pico_mb"] if a["pico_mb"] else float("nan")
+        print(f"{etapa:<46} {linhas:>10} {a['segundos']:>10.2f} {b['segundos']:>10.2f} "
+              f"{razao_tempo:>7.2f}x {razao_memoria:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=ETAPAS)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--linhas-pendentes", type=int, default=20_000,
+                        help="Linhas de cada arquivo semanal de propostas (XLSX limita a ~1M)")
+    parser.add_argument("--repeticoes-filtro", type=int, default=20,
+                        help="Repetições de cada combinação de filtros (as etapas de filtro medem a média)")
+    parser.add_argument("--processos", type=int, default=None,
+                        help="Processos da etapa particionada (padrão: número de CPUs)")
+    parser.add_argument("--esquema", action="store_true",
+                        help="Aplica os tipos de esquema_dados aos dados sintéticos, como na carga do dashboard")
+    parser.add_argument("--resultados", default=ARQUIVO_RESULTADOS, help="Arquivo JSON Lines dos resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "ALVO"),
+                        help="Compara dois commits já medidos em vez de executar o benchmark")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar, args.resultados)
+    else:
+        executar(args.tamanhos, args.etapas, args.semente, args.linhas_pendentes, args.resultados,
+                 args.repeticoes_filtro, args.processos, args.esquema)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Simula várias sessões do dashboard processando os mesmos arquivos ao mesmo tempo.
+
+Compara o processamento independente em cada sessão com o processamento coalescido de
+cache_resultados.memorizar (um único cálculo em andamento por chave, compartilhado pelas
+sessões que chegam enquanto ele roda). Mostra o tempo até todas as sessões terem o
+resultado, o pico de memória e a taxa de coalescência.
+
+Uso:
+    python benchmark_sessoes.py
+    python benchmark_sessoes.py --linhas 500000 --sessoes 8
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from cache_resultados import CacheResultados, memorizar
+from dados_sinteticos import gerar_analise, gerar_categorias
+from esquema_dados import ESQUEMA_ANALISE, ESQUEMA_CATEGORIAS, aplicar_esquema
+from perfil import monitorar_memoria
+from pipeline_comercial import executar_pipeline
+
+
+def processar(df_analise, df_categorias, limpar=False):
+    """Pipeline completo, como em processar_dados do dashboard (sem o Streamlit)."""
+    return executar_pipeline(df_analise, df_categorias, limpar=limpar)[0]
+
+
+def simular_sessoes(funcao, n_sessoes, df_analise, df_categorias):
+    """
+    Chama a função em n_sessoes threads que começam juntas.
+
+    Returns:
+        Tupla (resultados, segundos, pico de memória em MB)
+    """
+    resultados = [None] * n_sessoes
+    largada = threading.Barrier(n_sessoes)
+
+    def sessao(i):
+        largada.wait()
+        resultados[i] = funcao(df_analise, df_categorias, limpar=False)
+
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(n_sessoes)]
+    with monitorar_memoria() as memoria:
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        segundos = time.perf_counter() - inicio
+    return resultados, segundos, memoria["pico_bytes"] / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--sessoes", type=int, default=4)
+    args = parser.parse_args()
+
+    df_analise = aplicar_esquema(gerar_analise(args.linhas), ESQUEMA_ANALISE)
+    df_categorias = aplicar_esquema(gerar_categorias(df_analise), ESQUEMA_CATEGORIAS)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        cache = CacheResultados(diretorio=diretorio)
+        coalescido = memorizar(lambda: cache)(processar)
+        coalescidos, t_coalescido, pico_coalescido = simular_sessoes(
+            coalescido, args.sessoes, df_analise, df_categorias)
+        estatisticas = cache.estatisticas()
+
+    # Depois do coalescido: a memória já liberada pelo processo tende a ser reaproveitada, o que
+    # só subestima o pico das sessões independentes
+    independentes, t_independente, pico_independente = simular_sessoes(
+        processar, args.sessoes, df_analise, df_categorias)
+
+    for resultado in coalescidos:
+        pd.testing.assert_frame_equal(resultado, independentes[0])
+
+    print(f"{args.linhas} linhas, {args.sessoes} sessões simultâneas com os mesmos arquivos")
+    print(f"{'':<16} {'tempo (s)':>10} {'pico (MB)':>10} {'cálculos':>9}")
+    print(f"{'independente':<16} {t_independente:>10.2f} {pico_independente:>10.1f} {args.sessoes:>9}")
+    print(f"{'coalescido':<16} {t_coalescido:>10.2f} {pico_coalescido:>10.1f} {estatisticas['calculos']:>9}")
+    print(f"taxa de coalescência: {estatisticas['taxa_coalescencia']:.0%} "
+          f"({estatisticas['coalescidas']} de {args.sessoes} sessões aproveitaram o cálculo de outra)")
+    print("resultados idênticos em todas as sessões: sim")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import datetime
+import hashlib
+import io
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from esquema_dados import aplicar_esquema
+from leitor_xlsx import ler_bytes, ler_xlsx_colunas
+
+
+# Diretório e tamanho máximo do cache em disco (configuráveis por variável de ambiente)
+DIRETORIO_CACHE = os.environ.get(
+    "CACHE_EXCEL_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "analise_comercial", "excel")
+)
+LIMITE_CACHE_BYTES = int(os.environ.get("CACHE_EXCEL_LIMITE_MB", "512")) * 1024 * 1024
+
+# Contadores do processo atual
+_estatisticas = {"acertos": 0, "falhas": 0, "gravacoes": 0, "remocoes": 0, "erros": 0}
+_trava = threading.Lock()
+
+
+def _contar(evento, quantidade=1):
+    with _trava:
+        _estatisticas[evento] += quantidade
+
+
+def estatisticas_cache():
+    """Retorna uma cópia dos contadores de acertos, falhas e remoções do cache."""
+    with _trava:
+        estatisticas = dict(_estatisticas)
+    consultas = estatisticas["acertos"] + estatisticas["falhas"]
+    estatisticas["taxa_acerto"] = estatisticas["acertos"] / consultas if consultas else 0.0
+    return estatisticas
+
+
+def chave_cache(conteudo, header_row=0, sheet_name=0, colunas=None, esquema=None, max_linhas=None):
+    """
+    Calcula a chave do cache a partir do conteúdo do arquivo e dos parâmetros de leitura.
+
+    Args:
+        conteudo: Bytes do arquivo Excel
+        header_row: Linha do cabeçalho usada na leitura
+        sheet_name: Planilha lida
+        colunas: Colunas projetadas na leitura (None para todas)
+        esquema: Esquema de tipos aplicado após a leitura (None para nenhum)
+        max_linhas: Número máximo de linhas lidas (None para todas)
+
+    Returns:
+        String hexadecimal SHA-256
+    """
+    h = hashlib.sha256(conteudo)
+    h.update(repr((header_row, sheet_name, list(colunas) if colunas is not None else None)).encode("utf-8"))
+    if esquema is not None:
+        h.update(repr(sorted(esquema.items())).encode("utf-8"))
+    if max_linhas is not None:
+        h.update(repr(("max_linhas", max_linhas)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _codificar_valor(valor):
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return json.dumps({"$data": valor.isoformat()})
+    return json.dumps(valor, default=str)
+
+
+def _decodificar_valor(texto):
+    valor = json.loads(texto)
+    if isinstance(valor, dict) and "$data" in valor:
+        return pd.Timestamp(valor["$data"])
+    return valor
+
+
+def tabela_arrow(df):
+    """
+    Converte o DataFrame em uma tabela Arrow preservando colunas de tipo misto.
+
+    Planilhas reais costumam misturar números e textos na mesma coluna (ex.: "Código Produto"),
+    o que o Arrow não aceita diretamente. Essas colunas são gravadas como JSON por valor e
+    restauradas por dataframe_arrow com os tipos originais. Os df.attrs também são guardados.
+    """
+    if not all(isinstance(col, str) for col in df.columns):
+        raise ValueError("O Arrow exige nomes de colunas em texto.")
+
+    df_gravacao = df
+    colunas_mistas = []
+    # Só colunas object podem misturar tipos (as de texto do pandas 3 guardam apenas textos)
+    for col in [col for col in df.columns if pd.api.types.is_object_dtype(df[col].dtype)]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if df_gravacao is df:
+                df_gravacao = df.copy()
+            df_gravacao[col] = [_codificar_valor(v) for v in df[col].tolist()]
+            colunas_mistas.append(col)
+
+    tabela = pa.Table.from_pandas(df_gravacao, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[b"colunas_mistas"] = json.dumps(colunas_mistas).encode("utf-8")
+    metadados[b"attrs"] = json.dumps(df.attrs, default=str).encode("utf-8")
+    return tabela.replace_schema_metadata(metadados)
+
+
+def gravar_parquet(df, caminho):
+    """Grava o DataFrame em Parquet preservando colunas de tipo misto (ver tabela_arrow)."""
+    pq.write_table(tabela_arrow(df), caminho)
+
+
+def _restaurar_categoricos(df, metadados):
+    """
+    Refaz as colunas categóricas de números (esquema_dados), que o Parquet devolve como
+    números simples (float64 quando há ausentes).
+    """
+    descricao = json.loads(metadados.get(b"pandas", b"{}"))
+    for coluna in descricao.get("columns", []):
+        nome = coluna.get("name")
+        if (coluna.get("pandas_type") != "categorical" or nome not in df.columns
+                or isinstance(df[nome].dtype, pd.CategoricalDtype)):
+            continue
+        codigos, categorias = pd.factorize(df[nome], sort=True)
+        if categorias.dtype.kind == "f" and (categorias % 1 == 0).all():
+            categorias = categorias.astype("int64")
+        df[nome] = pd.Categorical.from_codes(codigos, categories=categorias)
+
+
+def dataframe_arrow(tabela):
+    """
+    Converte uma tabela gerada por tabela_arrow (ou uma seleção das suas colunas) de volta em
+    DataFrame, restaurando as colunas de tipo misto.
+    """
+    # Colunas de listas (histórico compacto) e monetárias (esquema_dados) voltam como tipos Arrow
+    df = tabela.to_pandas(types_mapper=lambda tipo: pd.ArrowDtype(tipo)
+                          if pa.types.is_list(tipo) or pa.types.is_decimal(tipo) else None)
+    metadados = tabela.schema.metadata or {}
+    for col in json.loads(metadados.get(b"colunas_mistas", b"[]")):
+        if col not in df.columns:
+            continue
+        df[col] = pd.Series([_decodificar_valor(v) for v in df[col].tolist()], index=df.index, dtype=object)
+    _restaurar_categoricos(df, metadados)
+    df.attrs = json.loads(metadados.get(b"attrs", b"{}"))
+    return df
+
+
+def ler_parquet(caminho):
+    """Lê um Parquet gravado por gravar_parquet, restaurando as colunas de tipo misto."""
+    return dataframe_arrow(pq.read_table(caminho))
+
+
+def _caminho(chave):
+    return os.path.join(DIRETORIO_CACHE, f"{chave}.parquet")
+
+
+def _remover_excedente(limite_bytes):
+    """Remove as entradas menos usadas recentemente até caber no limite de tamanho."""
+    try:
+        entradas = [os.path.join(DIRETORIO_CACHE, nome) for nome in os.listdir(DIRETORIO_CACHE)
+                    if nome.endswith(".parquet")]
+    except FileNotFoundError:
+        return
+
+    entradas = [(os.path.getmtime(c), os.path.getsize(c), c) for c in entradas if os.path.exists(c)]
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        try:
+            os.remove(caminho)
+            total -= tamanho
+            _contar("remocoes")
+        except OSError:
+            pass
+
+
+def ler_excel_com_cache(arquivo, header_row=0, sheet_name=0, colunas=None, leitor=None, limite_bytes=None,
+                        esquema=None, max_linhas=None):
+    """
+    Lê uma planilha Excel usando um cache em disco no formato Parquet.
+
+    O cache é endereçado pelo conteúdo do arquivo (e não pelo nome ou pelo objeto enviado),
+    então reenviar a mesma planilha em outra sessão ou após reiniciar o servidor reaproveita
+    a leitura anterior.
+
+    Args:
+        arquivo: Caminho do arquivo ou objeto de arquivo
+        header_row: Índice da linha que contém os nomes das colunas
+        sheet_name: Planilha a ser lida
+        colunas: Colunas a carregar; quando informado, usa a leitura em streaming com
+                 projeção de colunas (leitor_xlsx) em vez de pd.read_excel
+        leitor: Função que recebe (BytesIO, header_row, sheet_name) e retorna o DataFrame;
+                substitui a leitura padrão
+        limite_bytes: Tamanho máximo do diretório de cache
+        esquema: Esquema de tipos (esquema_dados) aplicado após a leitura; o DataFrame já
+                 convertido é o que fica no cache
+        max_linhas: Número máximo de linhas lidas (None para todas); a leitura para ao
+                    atingi-lo (ex.: amostras no modo desenvolvimento do dashboard)
+
+    Returns:
+        Tupla (DataFrame, acerto) onde acerto indica se veio do cache
+    """
+    conteudo = ler_bytes(arquivo)
+    chave = chave_cache(conteudo, header_row, sheet_name, colunas, esquema, max_linhas)
+    caminho = _caminho(chave)
+
+    if os.path.exists(caminho):
+        try:
+            df = ler_parquet(caminho)
+            df.attrs["conteudo_sha256"] = chave
+            os.utime(caminho)  # Marca como usado recentemente (LRU por data de modificação)
+            _contar("acertos")
+            return df, True
+        except Exception:
+            # Entrada corrompida: descarta e lê novamente
+            _contar("erros")
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    _contar("falhas")
+    if leitor is None and colunas is not None:
+        df = ler_xlsx_colunas(io.BytesIO(conteudo), colunas, header_row=header_row, sheet_name=sheet_name,
+                              max_linhas=max_linhas)
+    elif leitor is None:
+        df = pd.read_excel(io.BytesIO(conteudo), header=header_row, sheet_name=sheet_name, nrows=max_linhas)
+    else:
+        df = leitor(io.BytesIO(conteudo), header_row, sheet_name)
+        if max_linhas is not None:
+            df = df.head(max_linhas)
+    if esquema is not None:
+        df = aplicar_esquema(df, esquema)
+
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+        gravar_parquet(df, temporario)
+        os.replace(temporario, caminho)
+        _contar("gravacoes")
+        _remover_excedente(LIMITE_CACHE_BYTES if limite_bytes is None else limite_bytes)
+    except Exception:
+        # Colunas com nomes que o Parquet não aceita: segue sem cache
+        _contar("erros")
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    # Identifica o conteúdo de origem para as impressões digitais de cache_resultados
+    df.attrs["conteudo_sha256"] = chave
+    return df, False
+
+
+def limpar_cache():
+    """Remove todas as entradas do cache em disco."""
+    if not os.path.isdir(DIRETORIO_CACHE):
+        return
+    for nome in os.listdir(DIRETORIO_CACHE):
+        if nome.endswith(".parquet"):
+            os.remove(os.path.join(DIRETORIO_CACHE, nome))
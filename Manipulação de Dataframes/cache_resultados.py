@@ -0,0 +1,352 @@
+import functools
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from cache_excel import gravar_parquet, ler_parquet
+
+
+# Orçamento de memória e diretório de despejo (configuráveis por variável de ambiente)
+LIMITE_MEMORIA_BYTES = int(os.environ.get("CACHE_RESULTADOS_LIMITE_MB", "1024")) * 1024 * 1024
+DIRETORIO_DESPEJO = os.environ.get(
+    "CACHE_RESULTADOS_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "analise_comercial", "resultados")
+)
+LIMITE_DISCO_BYTES = int(os.environ.get("CACHE_RESULTADOS_DISCO_MB", "4096")) * 1024 * 1024
+
+# Intervalo (s) entre as verificações de cancelamento de quem aguarda o cálculo de outra chamada
+INTERVALO_AGUARDAR = 0.25
+
+def impressao_digital(df):
+    """
+    Impressão digital de um DataFrame, usada como parte da chave do cache.
+
+    Combina o formato, os nomes e tipos das colunas, o hash do conteúdo do arquivo de
+    origem (df.attrs["conteudo_sha256"], preenchido por cache_excel) e o hash de todos os
+    valores de cada coluna: qualquer alteração nos dados muda a impressão digital, mesmo
+    em um DataFrame derivado que mantém os attrs do original (ex.: head ou uma cópia editada).
+
+    Returns:
+        String hexadecimal SHA-256
+    """
+    h = hashlib.sha256()
+    h.update(repr((df.shape, [str(col) for col in df.columns], [str(tipo) for tipo in df.dtypes],
+                   df.attrs.get("conteudo_sha256"))).encode("utf-8"))
+    for col in range(len(df.columns)):
+        h.update(_bytes_coluna(df.iloc[:, col]))
+    return h.hexdigest()
+
+
+def _bytes_coluna(coluna):
+    """Bytes que identificam os valores da coluna (impressao_digital)."""
+    if isinstance(coluna.dtype, pd.ArrowDtype) and pa.types.is_decimal(coluna.dtype.pyarrow_dtype):
+        # Decimais (valores monetários de esquema_dados): os bytes dos valores e dos nulos,
+        # sem converter cada valor em objeto Python como hash_pandas_object faria
+        valores = pa.array(coluna.array)
+        largura = valores.type.byte_width
+        inicio = valores.offset * largura
+        dados = memoryview(valores.buffers()[1])[inicio:inicio + len(valores) * largura]
+        return bytes(dados) + valores.is_null().to_numpy(zero_copy_only=False).tobytes()
+    try:
+        valores = pd.util.hash_pandas_object(coluna, index=False)
+    except TypeError:
+        # Valores não hasheáveis (ex.: listas): usa a representação em texto
+        valores = pd.util.hash_pandas_object(coluna.astype(str), index=False)
+    return valores.to_numpy().tobytes()
+
+
+class _Calculo:
+    """Cálculo em andamento de uma chave, aguardado pelas chamadas idênticas."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.concluido = False  # False se o cálculo terminou com exceção
+        self.aguardando = 0
+
+
+def _bytes_dataframe(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class CacheResultados:
+    """
+    Cache LRU de DataFrames com orçamento de memória e despejo em Parquet.
+
+    Quando os resultados guardados excedem o orçamento, os menos usados recentemente são
+    gravados no diretório de despejo e liberados da memória; uma consulta posterior os
+    relê do disco de forma transparente (e volta a colocá-los na memória). Os arquivos de
+    despejo também respeitam um limite de tamanho, removendo os mais antigos.
+
+    Também coordena os cálculos em andamento (iniciar_calculo/concluir_calculo): chamadas
+    idênticas feitas enquanto a mesma chave está sendo calculada (ex.: sessões diferentes
+    processando os mesmos arquivos) aguardam esse cálculo em vez de repeti-lo.
+
+    Args:
+        limite_memoria_bytes: Orçamento de memória dos resultados guardados
+        diretorio: Diretório dos arquivos de despejo
+        limite_disco_bytes: Tamanho máximo do diretório de despejo
+    """
+
+    def __init__(self, limite_memoria_bytes=LIMITE_MEMORIA_BYTES, diretorio=DIRETORIO_DESPEJO,
+                 limite_disco_bytes=LIMITE_DISCO_BYTES):
+        self.limite_memoria_bytes = limite_memoria_bytes
+        self.diretorio = diretorio
+        self.limite_disco_bytes = limite_disco_bytes
+        self._entradas = OrderedDict()  # chave -> {"df", "bytes", "caminho", "bytes_disco"}
+        self._calculos = {}  # chave -> _Calculo em andamento
+        self._trava = threading.RLock()
+        self._estatisticas = {"acertos": 0, "acertos_disco": 0, "falhas": 0, "despejos": 0,
+                              "remocoes_disco": 0, "erros": 0, "calculos": 0, "coalescidas": 0}
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.parquet")
+
+    def obter(self, chave):
+        """Retorna o DataFrame guardado para a chave (da memória ou do disco) ou None."""
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self._estatisticas["falhas"] += 1
+                return None
+            self._entradas.move_to_end(chave)
+            if entrada["df"] is not None:
+                self._estatisticas["acertos"] += 1
+                return entrada["df"]
+
+            try:
+                df = ler_parquet(entrada["caminho"])
+            except Exception:
+                # Arquivo de despejo ausente ou corrompido: a entrada é descartada
+                self._estatisticas["erros"] += 1
+                self._estatisticas["falhas"] += 1
+                self._descartar(chave)
+                return None
+            entrada["df"] = df
+            entrada["bytes"] = _bytes_dataframe(df)
+            self._estatisticas["acertos_disco"] += 1
+            self._respeitar_orcamento(manter=chave)
+            return df
+
+    def guardar(self, chave, df):
+        """Guarda o DataFrame na memória, despejando os menos usados se o orçamento for excedido."""
+        with self._trava:
+            if chave in self._entradas:
+                self._descartar(chave)
+            self._entradas[chave] = {"df": df, "bytes": _bytes_dataframe(df), "caminho": None, "bytes_disco": 0}
+            self._respeitar_orcamento(manter=chave)
+
+    def _respeitar_orcamento(self, manter):
+        """Despeja em disco as entradas menos usadas até caber no orçamento (exceto manter)."""
+        for chave in list(self._entradas):
+            if self._bytes_memoria() <= self.limite_memoria_bytes:
+                break
+            entrada = self._entradas[chave]
+            if chave == manter or entrada["df"] is None:
+                continue
+            if entrada["caminho"] is None:
+                caminho = self._caminho(chave)
+                temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    os.makedirs(self.diretorio, exist_ok=True)
+                    gravar_parquet(entrada["df"].reset_index(drop=True), temporario)
+                    os.replace(temporario, caminho)
+                except Exception:
+                    # Sem como despejar (ex.: colunas que o Parquet não aceita): a entrada é descartada
+                    self._estatisticas["erros"] += 1
+                    if os.path.exists(temporario):
+                        os.remove(temporario)
+                    self._descartar(chave)
+                    continue
+                entrada["caminho"] = caminho
+                entrada["bytes_disco"] = os.path.getsize(caminho)
+            entrada["df"] = None
+            entrada["bytes"] = 0
+            self._estatisticas["despejos"] += 1
+        self._respeitar_limite_disco()
+
+    def _respeitar_limite_disco(self):
+        """Remove os arquivos de despejo menos usados até caber no limite de disco."""
+        total = sum(entrada["bytes_disco"] for entrada in self._entradas.values())
+        for chave in list(self._entradas):
+            if total <= self.limite_disco_bytes:
+                break
+            entrada = self._entradas[chave]
+            if entrada["caminho"] is None:
+                continue
+            total -= entrada["bytes_disco"]
+            self._estatisticas["remocoes_disco"] += 1
+            if entrada["df"] is None:
+                self._descartar(chave)
+            else:
+                self._remover_arquivo(entrada)
+
+    def _remover_arquivo(self, entrada):
+        if entrada["caminho"] is not None:
+            try:
+                os.remove(entrada["caminho"])
+            except OSError:
+                pass
+        entrada["caminho"] = None
+        entrada["bytes_disco"] = 0
+
+    def _descartar(self, chave):
+        self._remover_arquivo(self._entradas.pop(chave))
+
+    def _bytes_memoria(self):
+        return sum(entrada["bytes"] for entrada in self._entradas.values())
+
+    def iniciar_calculo(self, chave):
+        """
+        Registra o cálculo da chave, ou se junta ao que já está em andamento.
+
+        Returns:
+            Tupla (_Calculo, lider): lider é True se quem chamou deve calcular e depois chamar
+            concluir_calculo; caso contrário, deve aguardar com aguardar_calculo
+        """
+        with self._trava:
+            calculo = self._calculos.get(chave)
+            if calculo is not None:
+                calculo.aguardando += 1
+                return calculo, False
+            calculo = self._calculos[chave] = _Calculo()
+            self._estatisticas["calculos"] += 1
+            return calculo, True
+
+    def concluir_calculo(self, chave, calculo, resultado=None, concluido=True):
+        """Publica o resultado (ou a falha) do cálculo para as chamadas que o aguardam."""
+        with self._trava:
+            if self._calculos.get(chave) is calculo:
+                del self._calculos[chave]
+        calculo.resultado = resultado
+        calculo.concluido = concluido
+        calculo.evento.set()
+
+    def aguardar_calculo(self, calculo, verificar=None, intervalo=INTERVALO_AGUARDAR):
+        """
+        Aguarda o cálculo de outra chamada.
+
+        Args:
+            calculo: _Calculo retornado por iniciar_calculo
+            verificar: Função chamada a cada intervalo segundos durante a espera; pode
+                       interrompê-la levantando uma exceção (ex.: StatusTarefa.verificar_cancelamento)
+            intervalo: Intervalo (s) entre as chamadas de verificar
+
+        Returns:
+            Tupla (concluido, resultado); concluido é False se o cálculo terminou com exceção
+            (ex.: a tarefa que calculava foi cancelada), e quem aguardava deve tentar de novo
+        """
+        while not calculo.evento.wait(intervalo):
+            if verificar is not None:
+                try:
+                    verificar()
+                except BaseException:
+                    with self._trava:
+                        calculo.aguardando -= 1
+                    raise
+        if calculo.concluido:
+            with self._trava:
+                self._estatisticas["coalescidas"] += 1
+        return calculo.concluido, calculo.resultado
+
+    def limpar(self):
+        """Remove todas as entradas (e os arquivos de despejo)."""
+        with self._trava:
+            for chave in list(self._entradas):
+                self._descartar(chave)
+
+    def estatisticas(self):
+        """
+        Contadores de acertos (memória e disco), falhas, despejos, cálculos executados e
+        chamadas coalescidas (atendidas pelo cálculo em andamento de outra chamada), e a
+        ocupação atual.
+        """
+        with self._trava:
+            estatisticas = dict(self._estatisticas)
+            estatisticas["calculos_em_andamento"] = len(self._calculos)
+            estatisticas["entradas_memoria"] = sum(1 for e in self._entradas.values() if e["df"] is not None)
+            estatisticas["entradas_disco"] = sum(1 for e in self._entradas.values() if e["df"] is None)
+            estatisticas["bytes_memoria"] = self._bytes_memoria()
+            estatisticas["bytes_disco"] = sum(e["bytes_disco"] for e in self._entradas.values())
+            estatisticas["limite_memoria_bytes"] = self.limite_memoria_bytes
+        consultas = estatisticas["acertos"] + estatisticas["acertos_disco"] + estatisticas["falhas"]
+        estatisticas["taxa_acerto"] = (estatisticas["acertos"] + estatisticas["acertos_disco"]) / consultas \
+            if consultas else 0.0
+        # Fração das chamadas sem resultado guardado que aproveitaram um cálculo já em andamento
+        calculadas = estatisticas["calculos"] + estatisticas["coalescidas"]
+        estatisticas["taxa_coalescencia"] = estatisticas["coalescidas"] / calculadas if calculadas else 0.0
+        return estatisticas
+
+
+def chave_resultado(funcao, argumentos):
+    """
+    Chave do cache para uma chamada: nome da função, impressões digitais dos DataFrames
+    e representação dos demais argumentos.
+    """
+    partes = [funcao]
+    for nome, valor in argumentos.items():
+        if isinstance(valor, pd.DataFrame):
+            partes.append((nome, impressao_digital(valor)))
+        else:
+            partes.append((nome, repr(valor)))
+    return hashlib.sha256(repr(partes).encode("utf-8")).hexdigest()
+
+
+def memorizar(obter_cache):
+    """
+    Decorador que guarda o resultado (DataFrame) da função em um CacheResultados.
+
+    Como em st.cache_data, os parâmetros cujo nome começa com "_" não fazem parte da chave.
+    Resultados vazios (ex.: falhas de processamento) não são guardados. A função original
+    fica disponível em __wrapped__.
+
+    Chamadas idênticas simultâneas (mesma chave, ex.: várias sessões com os mesmos arquivos)
+    são coalescidas: só a primeira executa a função e as demais aguardam o seu resultado.
+    Se a primeira falhar, as que aguardavam tentam de novo. Se a função tem o parâmetro
+    _verificar_cancelamento, ele é chamado periodicamente durante essa espera e pode
+    interrompê-la levantando uma exceção (ex.: TarefaCancelada). Cada chamada recebe uma cópia
+    rasa do resultado: os dados são compartilhados (e, com o Copy-on-Write do pandas,
+    copiados só se alguém os alterar), mas colunas acrescentadas por uma sessão não
+    aparecem nas outras.
+
+    Args:
+        obter_cache: Função sem argumentos que retorna o CacheResultados a usar
+    """
+    def decorador(funcao):
+        assinatura = inspect.signature(funcao)
+        nome_funcao = f"{funcao.__module__}.{funcao.__qualname__}"
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            argumentos = assinatura.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            chave = chave_resultado(nome_funcao, {nome: valor for nome, valor in argumentos.arguments.items()
+                                                  if not nome.startswith("_")})
+            cache = obter_cache()
+            while True:
+                resultado = cache.obter(chave)
+                if resultado is not None:
+                    return resultado.copy(deep=False)
+                calculo, lider = cache.iniciar_calculo(chave)
+                if not lider:
+                    concluido, resultado = cache.aguardar_calculo(
+                        calculo, argumentos.arguments.get("_verificar_cancelamento"))
+                    if concluido:
+                        return resultado.copy(deep=False) if isinstance(resultado, pd.DataFrame) else resultado
+                    continue
+                try:
+                    resultado = funcao(*args, **kwargs)
+                except BaseException:
+                    cache.concluir_calculo(chave, calculo, concluido=False)
+                    raise
+                if isinstance(resultado, pd.DataFrame) and len(resultado) > 0:
+                    cache.guardar(chave, resultado)
+                cache.concluir_calculo(chave, calculo, resultado)
+                return resultado.copy(deep=False) if isinstance(resultado, pd.DataFrame) else resultado
+        return envoltorio
+    return decorador
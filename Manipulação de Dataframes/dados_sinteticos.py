@@ -0,0 +1,161 @@
+"""
+Gerador de dados sintéticos com o esquema das planilhas reais (análise comercial,
+classificação de produtos e propostas pendentes), usado pelos benchmarks.
+
+Os dados são determinísticos para uma mesma semente e reproduzem as características que
+pesam no desempenho do pipeline:
+  - clientes com distribuição de frequência concentrada (poucos clientes com muitas linhas);
+  - códigos de produto majoritariamente alfanuméricos, com alguns inteiros misturados
+    (como na planilha de classificação real);
+  - "Valor Orçado" assimétrico (lognormal), com alguns valores ausentes;
+  - "Dt Entrada" espalhada por vários anos;
+  - mistura de valores de "Status Processo".
+"""
+import io
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+
+# Proporção de cada situação em "Status Processo"
+STATUS_PROCESSO = {"PENDENTE": 0.35, "GANHO": 0.20, "PERDIDO": 0.35, "CANCELADO": 0.10}
+
+UFS = ["SP", "MG", "RJ", "PR", "SC", "RS", "BA", "GO", "PE", "ES"]
+CONSULTORES = ["Ana", "Bruno", "Carla", "Diego", "Elaine", "Fábio", "Gabriela", "Hugo"]
+MOTIVOS_NAO_VENDA = ["", "Preço", "Prazo", "Concorrência", "Sem orçamento", "Projeto cancelado"]
+PROBABILIDADES = [0, 10, 25, 50, 75, 90, 100]
+
+# Quantidade de categorias da planilha de classificação real
+N_NEGOCIOS, N_GRUPOS, N_SUBGRUPOS = 7, 70, 227
+
+
+def _pesos_concentrados(n, expoente=1.1):
+    """Pesos de uma distribuição de Zipf truncada (o primeiro item é o mais frequente)."""
+    pesos = 1.0 / np.arange(1, n + 1) ** expoente
+    return pesos / pesos.sum()
+
+
+def gerar_codigos_produto(n_produtos, semente=42, fracao_inteiros=0.001):
+    """
+    Gera códigos de produto únicos no formato da planilha real (ex.: 'YSI480075Y', 'CEBD01035-00'),
+    com uma pequena fração de códigos inteiros.
+    """
+    rng = np.random.default_rng(semente)
+    prefixos = np.array(["CEBD", "YSI", "ISC", "SONT", "HAC", "MET", "WTW", "THR"])
+    codigos = np.char.add(
+        np.char.add(prefixos[rng.integers(0, len(prefixos), n_produtos)],
+                    np.char.zfill(np.arange(n_produtos).astype(str), 6)),
+        np.array(["", "-00", "Y", "K"])[rng.integers(0, 4, n_produtos)],
+    ).astype(object)
+    inteiros = rng.random(n_produtos) < fracao_inteiros
+    codigos[inteiros] = (100_000 + np.flatnonzero(inteiros)).tolist()
+    return codigos
+
+
+def gerar_analise(n_linhas, semente=42, n_clientes=None, n_produtos=None, anos=3, inicio="2022-01-01",
+                  fracao_nulos=0.005):
+    """
+    Gera a planilha de análise comercial com o esquema real.
+
+    Args:
+        n_linhas: Número de linhas
+        semente: Semente do gerador (mesma semente, mesmos dados)
+        n_clientes: Número de clientes distintos (proporcional a n_linhas por padrão)
+        n_produtos: Número de produtos distintos (proporcional a n_linhas por padrão)
+        anos: Período coberto por "Dt Entrada", em anos a partir de inicio
+        inicio: Data inicial de "Dt Entrada"
+        fracao_nulos: Fração de valores ausentes em "Valor Orçado", "Prob.Fech." e "Dt Entrada"
+
+    Returns:
+        DataFrame com as colunas de leitor_xlsx.COLUNAS_ANALISE e "Status Processo"
+    """
+    rng = np.random.default_rng(semente)
+    n_clientes = n_clientes or max(n_linhas // 40, 20)
+    n_produtos = n_produtos or min(max(n_linhas // 20, 20), 50_000)
+
+    clientes = rng.choice(n_clientes, n_linhas, p=_pesos_concentrados(n_clientes)) + 1
+    produtos = rng.choice(n_produtos, n_linhas, p=_pesos_concentrados(n_produtos, expoente=0.8))
+    codigos = gerar_codigos_produto(n_produtos, semente)
+
+    dias = rng.integers(0, int(anos * 365), n_linhas).astype("timedelta64[D]")
+    datas = (np.datetime64(inicio, "ns") + dias).astype("datetime64[ns]")
+    valores = rng.lognormal(8, 1.6, n_linhas).round(2)
+    probabilidades = rng.choice(PROBABILIDADES, n_linhas).astype("float64")
+    for coluna in (valores, probabilidades, datas):
+        nulos = rng.random(n_linhas) < fracao_nulos
+        coluna[nulos] = np.datetime64("NaT") if coluna.dtype.kind == "M" else np.nan
+
+    status = rng.choice(list(STATUS_PROCESSO), n_linhas, p=list(STATUS_PROCESSO.values()))
+    ufs_clientes = np.array(UFS)[rng.integers(0, len(UFS), n_clientes + 1)]
+    cidades_clientes = np.char.add("Cidade ", rng.integers(1, 500, n_clientes + 1).astype(str))
+
+    return pd.DataFrame({
+        "Cliente": clientes,
+        "Código Produto": codigos[produtos],
+        "Descrição Produto": np.char.add("Produto ", produtos.astype(str)),
+        "Dt Entrada": datas,
+        "Valor Orçado": valores,
+        "Nome Cliente": np.char.add("Cliente ", clientes.astype(str)),
+        "Consultor Interno": rng.choice(CONSULTORES, n_linhas),
+        "Prob.Fech.": probabilidades,
+        "Motivo Não Venda": rng.choice(MOTIVOS_NAO_VENDA, n_linhas),
+        "UF": ufs_clientes[clientes],
+        "Cidade": cidades_clientes[clientes],
+        "Status Processo": status,
+    })
+
+
+def gerar_categorias(df_analise, semente=42):
+    """
+    Gera a planilha de classificação de produtos para os códigos de df_analise.
+
+    A hierarquia Negócio → Grupo → Subgrupo tem as mesmas cardinalidades da planilha real.
+    """
+    rng = np.random.default_rng(semente)
+    produtos = pd.unique(df_analise["Código Produto"])
+    subgrupos = rng.integers(0, N_SUBGRUPOS, len(produtos))
+    grupos = subgrupos % N_GRUPOS
+    return pd.DataFrame({
+        "Código Produto": produtos,
+        "Descrição": [f"Produto {i}" for i in range(len(produtos))],
+        "Negócio": [f"Negócio {g % N_NEGOCIOS}" for g in grupos],
+        "Grupo": [f"Grupo {g}" for g in grupos],
+        "Subgrupo": [f"Subgrupo {s}" for s in subgrupos],
+    })
+
+
+def gravar_xlsx(df):
+    """Grava o DataFrame em XLSX (modo de escrita em streaming do openpyxl) e retorna os bytes."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([str(col) for col in df.columns])
+    for linha in df.itertuples(index=False, name=None):
+        ws.append([None if pd.isna(valor) else valor for valor in linha])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def gerar_arquivos_pendentes(df_analise, n_semanas=4, max_linhas=100_000, semente=42):
+    """
+    Gera os snapshots semanais de propostas (XLSX em bytes), do mais recente para o mais antigo.
+
+    Cada snapshot é uma amostra das linhas de df_analise, com todos os status; a leitura
+    das propostas pendentes filtra "Status Processo" = 'PENDENTE'.
+
+    Args:
+        df_analise: Saída de gerar_analise
+        n_semanas: Número de arquivos semanais
+        max_linhas: Linhas por arquivo (limitado ao tamanho de df_analise)
+        semente: Semente da amostragem
+
+    Returns:
+        Lista com os bytes de cada arquivo
+    """
+    rng = np.random.default_rng(semente)
+    n = min(max_linhas, len(df_analise))
+    colunas = ["Cliente", "Nome Cliente", "Código Produto", "Descrição Produto", "Dt Entrada",
+               "Valor Orçado", "Consultor Interno", "Prob.Fech.", "Status Processo"]
+    return [gravar_xlsx(df_analise[colunas].iloc[np.sort(rng.choice(len(df_analise), n, replace=False))])
+            for _ in range(n_semanas)]
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+
+def normalizar_codigos(serie):
+    """
+    Normaliza uma coluna de códigos (Cliente, Código Produto) para chaves de junção.
+
+    Códigos numéricos inteiros viram Int64, de modo que 123, 123.0 e "123" apontem para
+    a mesma chave. Se a coluna tiver códigos não numéricos, todos viram texto, com os
+    inteiros escritos sem casas decimais.
+
+    Args:
+        serie: Series com os códigos
+
+    Returns:
+        Series com os códigos normalizados (Int64 ou object)
+    """
+    serie = pd.Series(serie)
+    numerico = pd.to_numeric(serie, errors="coerce")
+    inteiro = numerico.notna() & (numerico % 1 == 0)
+    if (inteiro | serie.isna()).all():
+        return numerico.astype("Int64")
+
+    texto = serie.astype(str).str.strip().astype(object)
+    texto[inteiro] = numerico[inteiro].astype("int64").astype(str)
+    texto[serie.isna()] = None
+    return texto
+
+
+def _chaves_compativeis(indice, chaves):
+    """Garante que as chaves consultadas tenham o mesmo tipo do índice da dimensão."""
+    if str(indice.dtype) == str(chaves.dtype):
+        return indice, chaves
+    return indice.astype(str), chaves.astype(str)
+
+
+class _Dimensao:
+    """Base das dimensões: tabela de atributos indexada por um código normalizado."""
+
+    coluna_chave = None
+
+    def __init__(self, df, colunas):
+        if self.coluna_chave not in df.columns:
+            raise KeyError(f"Coluna '{self.coluna_chave}' não encontrada para construir a dimensão.")
+
+        chaves = normalizar_codigos(df[self.coluna_chave])
+        # Cada código aparece uma única vez: mantém a primeira ocorrência, como nos antigos
+        # .iloc[0] por grupo
+        unicos = chaves.notna().to_numpy() & ~chaves.duplicated().to_numpy()
+
+        self.indice = pd.Index(chaves[unicos].to_numpy(), dtype=chaves.dtype)
+        self.colunas = [col for col in colunas if col in df.columns]
+        self.valores = {col: df[col].to_numpy()[unicos] for col in self.colunas}
+
+    def __len__(self):
+        return len(self.indice)
+
+    def posicoes(self, chaves):
+        """Retorna a posição de cada chave na dimensão (-1 quando não encontrada)."""
+        indice, chaves = _chaves_compativeis(self.indice, normalizar_codigos(chaves))
+        return indice.get_indexer(chaves)
+
+    def buscar(self, chaves, colunas=None, padroes=None):
+        """
+        Busca vetorizada dos atributos de cada chave.
+
+        Args:
+            chaves: Series ou array com os códigos a consultar
+            colunas: Atributos desejados (todos os disponíveis por padrão)
+            padroes: Dicionário {coluna: valor} usado quando a chave não é encontrada
+                     ou a coluna não existe na dimensão (NaN por padrão)
+
+        Returns:
+            DataFrame alinhado posicionalmente com as chaves consultadas
+        """
+        colunas = self.colunas if colunas is None else colunas
+        padroes = padroes or {}
+        posicoes = self.posicoes(chaves)
+        encontrado = posicoes >= 0
+
+        resultado = {}
+        for col in colunas:
+            padrao = padroes.get(col, np.nan)
+            if col not in self.valores:
+                resultado[col] = np.full(len(posicoes), padrao, dtype=object)
+                continue
+            valores = self.valores[col]
+            if len(valores) == 0:
+                resultado[col] = np.full(len(posicoes), padrao, dtype=object)
+                continue
+            coluna = pd.Series(valores[np.where(encontrado, posicoes, 0)])
+            resultado[col] = coluna.where(encontrado, padrao).to_numpy()
+
+        return pd.DataFrame(resultado, columns=list(colunas))
+
+
+class ClientDimension(_Dimensao):
+    """
+    Dimensão de clientes construída a partir da classificação ABC.
+
+    Substitui a varredura df_clientes_abc[df_clientes_abc["Cliente"] == cliente] feita
+    para cada grupo por uma única busca vetorizada por código de cliente.
+    """
+
+    coluna_chave = "Cliente"
+
+    def __init__(self, df_clientes_abc,
+                 colunas=("Nome Cliente", "ABC", "UF", "Cidade", "Valor Total Orçado",
+                          "Percentual", "Percentual Acumulado", "Ranking")):
+        super().__init__(df_clientes_abc, colunas)
+
+
+class ProductDimension(_Dimensao):
+    """
+    Dimensão de produtos construída a partir da planilha de classificação de produtos.
+
+    Substitui o dicionário de categorias montado com iterrows() e chaves str().
+    """
+
+    coluna_chave = "Código Produto"
+
+    def __init__(self, df_categorias, colunas=("Negócio", "Grupo", "Subgrupo")):
+        super().__init__(df_categorias, colunas)
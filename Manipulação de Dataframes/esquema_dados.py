@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from dimensoes import normalizar_codigos
+
+
+# Tipos do esquema:
+#   "codigo"     - códigos (Cliente, Código Produto): categóricos; colunas que misturam números
+#                  e textos são normalizadas como em dimensoes.normalizar_codigos
+#   "categoria"  - textos repetidos: categóricos
+#   "moeda"      - valores monetários em centavos inteiros exatos (decimal Arrow com 2 casas)
+#   "data"       - datetime64
+#   "percentual" - inteiros pequenos de 0 a 100 (UInt8), mantidos em float64 se houver frações
+ESQUEMA_ANALISE = {
+    "Cliente": "codigo",
+    "Código Produto": "codigo",
+    "UF": "categoria",
+    "Cidade": "categoria",
+    "Consultor Interno": "categoria",
+    "Motivo Não Venda": "categoria",
+    "Dt Entrada": "data",
+    "Valor Orçado": "moeda",
+    "Prob.Fech.": "percentual",
+}
+
+ESQUEMA_CATEGORIAS = {
+    "Código Produto": "codigo",
+    "Negócio": "categoria",
+    "Grupo": "categoria",
+    "Subgrupo": "categoria",
+}
+
+ESQUEMA_PENDENTES = {
+    **ESQUEMA_ANALISE,
+    "Status Processo": "categoria",
+    "Valor Proposta": "moeda",
+}
+
+# Tipo Arrow das colunas monetárias: inteiro de 128 bits com escala de 2 casas (centavos)
+TIPO_MOEDA = pa.decimal128(18, 2)
+
+
+def eh_moeda(serie):
+    """Indica se a coluna está no tipo monetário do esquema (decimal Arrow)."""
+    return isinstance(serie.dtype, pd.ArrowDtype) and pa.types.is_decimal(serie.dtype.pyarrow_dtype)
+
+
+def moeda_de_centavos(centavos, nulos=None, index=None):
+    """
+    Monta uma coluna monetária a partir dos centavos inteiros, sem passar por objetos Decimal.
+
+    Args:
+        centavos: Array de centavos (int64)
+        nulos: Máscara dos valores ausentes (None se não houver)
+        index: Índice da Series resultante
+    """
+    centavos = np.ascontiguousarray(centavos, dtype=np.int64)
+    n = len(centavos)
+    # Cada decimal128 é um inteiro de 128 bits little-endian: centavos + extensão do sinal
+    palavras = np.empty((n, 2), dtype=np.int64)
+    palavras[:, 0] = centavos
+    palavras[:, 1] = centavos >> 63
+    validade = None
+    n_nulos = 0
+    if nulos is not None and nulos.any():
+        validade = pa.py_buffer(np.packbits(~nulos, bitorder="little"))
+        n_nulos = int(nulos.sum())
+    arranjo = pa.Array.from_buffers(TIPO_MOEDA, n, [validade, pa.py_buffer(palavras)], null_count=n_nulos)
+    return pd.Series(pd.arrays.ArrowExtensionArray(arranjo), index=index)
+
+
+def centavos_da_moeda(serie):
+    """
+    Centavos inteiros de uma coluna monetária do esquema (ausentes viram 0).
+
+    Lê diretamente a palavra baixa de cada decimal, que é exata enquanto o valor couber
+    em 64 bits (mais de 90 quatrilhões de reais).
+    """
+    arranjo = pa.array(serie.array)
+    partes = []
+    for bloco in (arranjo.chunks if isinstance(arranjo, pa.ChunkedArray) else [arranjo]):
+        escala = bloco.type.scale
+        if escala != 2:
+            bloco = bloco.cast(TIPO_MOEDA)
+        palavras = np.frombuffer(bloco.buffers()[1], dtype=np.int64)
+        baixas = palavras[2 * bloco.offset:2 * (bloco.offset + len(bloco)):2].copy()
+        if bloco.null_count:
+            baixas[bloco.is_null().to_numpy(zero_copy_only=False)] = 0
+        partes.append(baixas)
+    return np.concatenate(partes) if partes else np.empty(0, dtype=np.int64)
+
+
+def _categorico(serie, codigos, valores):
+    """
+    Monta a coluna categórica a partir dos códigos de pd.factorize e dos valores distintos já
+    convertidos (valores que ficaram iguais na conversão passam a ter a mesma categoria).
+    """
+    try:
+        recodigos, categorias = pd.factorize(pd.Index(valores, dtype=object), sort=True)
+    except TypeError:
+        recodigos, categorias = pd.factorize(pd.Index(valores, dtype=object))
+    if len(recodigos) > 0:
+        codigos = np.where(codigos >= 0, recodigos[np.maximum(codigos, 0)], -1)
+    categorias = pd.Index(list(categorias))  # Tipo das categorias inferido dos valores (int64, str...)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=serie.index,
+                     name=serie.name)
+
+
+def _tipos_misturados(valores):
+    """Indica se os valores distintos misturam números e textos."""
+    numeros = sum(isinstance(valor, (int, float, np.number)) for valor in valores)
+    return 0 < numeros < len(valores)
+
+
+def _converter_codigo(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    # Só os valores distintos são convertidos; as linhas mantêm os códigos do factorize
+    codigos, unicos = pd.factorize(serie)
+    valores = pd.Series(unicos, dtype=object)
+    if _tipos_misturados(valores):
+        # Números e textos misturados (o Parquet não aceita categorias de tipos diferentes)
+        valores = normalizar_codigos(valores).astype(object)
+    elif len(valores) > 0 and isinstance(valores.iloc[0], (float, np.floating)) and (valores % 1 == 0).all():
+        valores = valores.astype("int64")
+    return _categorico(serie, codigos, valores)
+
+
+def _converter_categoria(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    codigos, unicos = pd.factorize(serie)
+    valores = pd.Series(unicos, dtype=object)
+    if _tipos_misturados(valores):
+        # Textos e números misturados viram texto (as categorias precisam de um único tipo)
+        valores = valores.astype(str)
+    return _categorico(serie, codigos, valores)
+
+
+def _converter_moeda(serie):
+    if eh_moeda(serie):
+        return serie
+    valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    nulos = np.isnan(valores)
+    centavos = np.round(np.where(nulos, 0, valores) * 100).astype(np.int64)
+    return moeda_de_centavos(centavos, nulos, index=serie.index)
+
+
+def _converter_data(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie, errors="coerce")
+
+
+def _converter_percentual(serie):
+    valores = pd.to_numeric(serie, errors="coerce")
+    presentes = valores.dropna()
+    if ((presentes % 1 == 0) & (presentes >= 0) & (presentes <= 100)).all():
+        return valores.astype("UInt8")
+    return valores.astype("float64")
+
+
+CONVERSORES = {
+    "codigo": _converter_codigo,
+    "categoria": _converter_categoria,
+    "moeda": _converter_moeda,
+    "data": _converter_data,
+    "percentual": _converter_percentual,
+}
+
+
+def aplicar_esquema(df, esquema):
+    """
+    Converte as colunas do DataFrame para os tipos declarados no esquema.
+
+    Colunas ausentes em df são ignoradas e as demais colunas não são alteradas. O tipo e a
+    memória de cada coluna antes da conversão ficam em attrs["memoria_original"], para o
+    relatório de memória (que continua disponível quando o DataFrame vem do cache em disco).
+
+    Args:
+        df: DataFrame lido da planilha
+        esquema: Dicionário {coluna: tipo} (ver ESQUEMA_ANALISE)
+
+    Returns:
+        Novo DataFrame com as colunas convertidas (o original não é alterado)
+    """
+    memoria = df.memory_usage(index=False, deep=True)
+    convertidas = {col: CONVERSORES[tipo](df[col]) for col, tipo in esquema.items() if col in df.columns}
+    resultado = df.assign(**convertidas) if convertidas else df.copy()
+    resultado.attrs = {
+        **df.attrs,
+        "memoria_original": {str(col): {"tipo": str(df[col].dtype), "bytes": int(memoria[col])} for col in df.columns},
+    }
+    return resultado
+
+
+def relatorio_memoria(df):
+    """
+    Compara a memória de cada coluna antes e depois da aplicação do esquema.
+
+    Args:
+        df: DataFrame retornado por aplicar_esquema
+
+    Returns:
+        DataFrame com "Coluna", "Tipo (antes)", "Tipo (depois)", "Antes (MB)", "Depois (MB)"
+        e "Redução (%)", com uma linha de total (vazio se o esquema não foi aplicado)
+    """
+    original = df.attrs.get("memoria_original", {})
+    memoria = df.memory_usage(index=False, deep=True)
+    linhas = [{
+        "Coluna": str(col),
+        "Tipo (antes)": original[str(col)]["tipo"],
+        "Tipo (depois)": str(df[col].dtype),
+        "Antes (MB)": original[str(col)]["bytes"] / 1024 ** 2,
+        "Depois (MB)": memoria[col] / 1024 ** 2,
+    } for col in df.columns if str(col) in original]
+    relatorio = pd.DataFrame(linhas, columns=["Coluna", "Tipo (antes)", "Tipo (depois)", "Antes (MB)", "Depois (MB)"])
+    if len(relatorio) > 0:
+        total = {"Coluna": "total", "Tipo (antes)": "", "Tipo (depois)": "",
+                 "Antes (MB)": relatorio["Antes (MB)"].sum(), "Depois (MB)": relatorio["Depois (MB)"].sum()}
+        relatorio = pd.concat([relatorio, pd.DataFrame([total])], ignore_index=True)
+    relatorio["Redução (%)"] = np.where(relatorio["Antes (MB)"] > 0,
+                                        (1 - relatorio["Depois (MB)"] / relatorio["Antes (MB)"].where(
+                                            relatorio["Antes (MB)"] > 0, 1)) * 100, 0.0)
+    return relatorio
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cache_excel import dataframe_arrow, tabela_arrow
+
+
+# Processos usados por padrão no processamento particionado (1 executa tudo no processo atual).
+# O ganho com vários processos só aparece com vários núcleos livres e ainda não foi medido
+# em uma máquina com mais de um núcleo. Com 1 núcleo, 1M de linhas tipadas em 2 processos
+# rodaram a 0,52x da velocidade em um processo (cerca de 1,9x o tempo, ou seja, mais lento:
+# só o custo dos processos). Medir com benchmark_pipeline.py --processos N antes de mudar
+# o padrão. O dashboard não usa o processamento particionado.
+PROCESSOS_PADRAO = int(os.environ.get("PROCESSOS_PARTICIONADOS", "1"))
+
+
+def particoes_por_chave(chaves, n_particoes):
+    """
+    Partição de cada linha pelo hash da chave: linhas com a mesma chave (ex.: o mesmo
+    cliente) sempre caem na mesma partição.
+
+    Args:
+        chaves: Series com a chave de cada linha
+        n_particoes: Número de partições
+
+    Returns:
+        Array com o número da partição (0 a n_particoes - 1) de cada linha
+    """
+    hashes = pd.util.hash_pandas_object(chaves, index=False).to_numpy()
+    return (hashes % np.uint64(n_particoes)).astype(np.int64)
+
+
+def _escrever(tabela, destino):
+    """Escreve a tabela Arrow no formato IPC (stream) no destino."""
+    with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+
+
+def _serializar(tabela):
+    destino = pa.BufferOutputStream()
+    _escrever(tabela, destino)
+    return destino.getvalue()
+
+
+def _publicar(tabela):
+    """
+    Escreve a tabela (formato IPC) diretamente em um segmento de memória compartilhada.
+
+    Returns:
+        Tupla (segmento, tamanho em bytes)
+    """
+    medida = pa.MockOutputStream()
+    _escrever(tabela, medida)
+    tamanho = medida.size()
+    segmento = shared_memory.SharedMemory(create=True, size=max(tamanho, 1))
+    try:
+        _escrever(tabela, pa.FixedSizeBufferWriter(pa.py_buffer(segmento.buf)))
+    except BaseException:
+        segmento.close()
+        segmento.unlink()
+        raise
+    return segmento, tamanho
+
+
+def _executar_particao(nome, tamanho, posicoes, funcao, argumentos):
+    """
+    Executado nos processos do pool: lê as linhas da partição direto da memória
+    compartilhada, aplica funcao(df, *argumentos) e devolve o resultado no formato IPC.
+    """
+    # Os processos do pool usam o mesmo resource_tracker do processo principal, que é
+    # quem apaga o segmento no fim
+    segmento = shared_memory.SharedMemory(name=nome)
+    try:
+        tabela = pa.ipc.open_stream(pa.py_buffer(segmento.buf[:tamanho])).read_all()
+        # take copia só as linhas da partição para fora do segmento
+        df = dataframe_arrow(tabela.take(posicoes))
+        del tabela
+    finally:
+        segmento.close()
+    return _serializar(tabela_arrow(funcao(df, *argumentos))).to_pybytes()
+
+
+def _ler_resultado(dados):
+    return dataframe_arrow(pa.ipc.open_stream(pa.py_buffer(dados)).read_all())
+
+
+def executar_particionado(df, funcao, argumentos=(), chave="Cliente", processos=None):
+    """
+    Executa funcao(particao, *argumentos) em cada partição do DataFrame, em um pool de
+    processos, e junta os resultados.
+
+    As linhas são divididas pelo hash de chave (particoes_por_chave), então cada valor da
+    chave é processado inteiro por um único processo e agregações por essa chave dão o
+    mesmo resultado que sobre o DataFrame inteiro. O DataFrame é publicado uma única vez
+    em memória compartilhada, em formato colunar (Arrow IPC); cada processo recebe apenas
+    o nome do segmento e as posições das suas linhas, em vez de uma cópia serializada
+    (pickle) do DataFrame. Os argumentos (ex.: dimensões já construídas) são enviados a cada
+    processo como de costume e devem ser pequenos.
+
+    Os processos do pool são iniciados com spawn (um interpretador novo), e não com fork:
+    copiar o processo atual é inseguro quando há outras threads em execução (ex.: as
+    tarefas em segundo plano do Streamlit). Por isso funcao e os argumentos precisam poder
+    ser importados pelos processos do pool (funções definidas no nível de um módulo
+    importável). Dentro de cada partição as linhas ficam na ordem
+    original; o resultado junta as partições uma após a outra e cabe a quem chama
+    reordená-lo, se necessário.
+
+    Args:
+        df: DataFrame com a coluna chave (nomes de colunas em texto)
+        funcao: Função aplicada a cada partição; deve retornar um DataFrame
+        argumentos: Argumentos adicionais de funcao
+        chave: Coluna usada na divisão em partições
+        processos: Número de processos (padrão: PROCESSOS_PADRAO); com 1, funcao é aplicada
+                   ao DataFrame inteiro no processo atual
+
+    Returns:
+        DataFrame com os resultados das partições concatenados (índice reiniciado)
+    """
+    processos = min(processos or PROCESSOS_PADRAO, max(len(df), 1))
+    if processos <= 1:
+        return funcao(df, *argumentos)
+
+    particoes = particoes_por_chave(df[chave], processos)
+    ordem = np.argsort(particoes, kind="stable")
+    limites = np.searchsorted(particoes[ordem], np.arange(processos + 1))
+    posicoes = [ordem[inicio:fim] for inicio, fim in zip(limites[:-1], limites[1:]) if fim > inicio]
+
+    segmento, tamanho = _publicar(tabela_arrow(df.reset_index(drop=True)))
+    try:
+        with ProcessPoolExecutor(max_workers=len(posicoes),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futuros = [executor.submit(_executar_particao, segmento.name, tamanho, linhas, funcao, argumentos)
+                       for linhas in posicoes]
+            resultados = [_ler_resultado(futuro.result()) for futuro in futuros]
+    finally:
+        segmento.close()
+        segmento.unlink()
+
+    return pd.concat(resultados, ignore_index=True)
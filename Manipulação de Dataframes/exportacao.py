@@ -0,0 +1,278 @@
+import io
+import itertools
+import zipfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from esquema_dados import centavos_da_moeda, eh_moeda
+from historico_compacto import eh_lista_arrow
+
+try:
+    import xlsxwriter
+except ImportError:  # xlsxwriter é opcional: sem ele, usa o modo de escrita em streaming do openpyxl
+    xlsxwriter = None
+
+
+# Formatos de exportação: extensão e tipo MIME
+FORMATOS = {
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".csv", "text/csv"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+MIME_ZIP = "application/zip"
+
+# Colunas que identificam cada linha na planilha de histórico
+CHAVES_HISTORICO = ["Cliente", "Código Produto"]
+
+# Nomes das planilhas (xlsx) e dos arquivos (csv compactado)
+PLANILHA_DADOS = "Dados"
+PLANILHA_HISTORICO = "Histórico"
+
+# Linhas convertidas para objetos Python de cada vez: a memória da escrita não cresce com o DataFrame
+LINHAS_POR_BLOCO = 50_000
+
+# Limite de linhas de uma planilha do Excel (sem contar o cabeçalho)
+LINHAS_POR_PLANILHA = 1_048_575
+
+FORMATO_DATA_EXCEL = "dd/mm/yyyy"
+
+# Padrão do Excel em português: ";" separa as colunas e "," as casas decimais
+SEPARADOR_CSV = ";"
+DECIMAL_CSV = ","
+
+
+def _eh_lista_python(serie):
+    validos = serie.dropna()
+    return len(validos) > 0 and isinstance(validos.iloc[0], list)
+
+
+def colunas_lista(df):
+    """Colunas de listas (histórico compacto ou listas Python)."""
+    return [col for col in df.columns if eh_lista_arrow(df[col]) or _eh_lista_python(df[col])]
+
+
+def _achatar(serie):
+    """Comprimento da lista de cada linha e os elementos de todas as listas, em sequência."""
+    if eh_lista_arrow(serie):
+        lista = pa.array(serie.array)
+        if isinstance(lista, pa.ChunkedArray):
+            lista = lista.combine_chunks()
+        comprimentos = pc.list_value_length(lista).fill_null(0).to_numpy(zero_copy_only=False)
+        valores = lista.flatten()
+        if pa.types.is_dictionary(valores.type):
+            valores = valores.dictionary_decode()
+        return comprimentos.astype(np.int64), valores.to_pandas()
+
+    listas = [valor if isinstance(valor, list) else [] for valor in serie.tolist()]
+    comprimentos = np.fromiter((len(valor) for valor in listas), dtype=np.int64, count=len(listas))
+    return comprimentos, pd.Series(list(itertools.chain.from_iterable(listas)), dtype=object)
+
+
+def separar_historico(df, chaves=CHAVES_HISTORICO):
+    """
+    Separa as colunas de listas (histórico) em uma tabela à parte, com um elemento por linha.
+
+    A tabela de histórico repete as colunas-chave de cada linha de origem (ou o número da
+    linha, sem as chaves) e numera os elementos de cada lista em "Ordem". As listas de uma
+    mesma linha precisam ter o mesmo comprimento, como as produzidas por agregar_historico.
+
+    Args:
+        df: DataFrame com colunas de listas (ex.: df_final)
+        chaves: Colunas que identificam cada linha na tabela de histórico
+
+    Returns:
+        Tupla (DataFrame sem as colunas de listas, DataFrame do histórico ou None sem listas)
+    """
+    listas = colunas_lista(df)
+    if not listas:
+        return df, None
+
+    principal = df.drop(columns=listas)
+    achatadas = {col: _achatar(df[col]) for col in listas}
+    comprimentos = achatadas[listas[0]][0]
+    for col in listas[1:]:
+        if not np.array_equal(achatadas[col][0], comprimentos):
+            raise ValueError(f"As listas de '{col}' e '{listas[0]}' têm comprimentos diferentes.")
+
+    linhas = np.repeat(np.arange(len(df)), comprimentos)
+    inicios = np.cumsum(comprimentos) - comprimentos
+    presentes = [col for col in chaves if col in principal.columns]
+    if presentes:
+        historico = principal[presentes].iloc[linhas].reset_index(drop=True)
+    else:
+        historico = pd.DataFrame({"Linha": linhas + 1})
+    historico["Ordem"] = np.arange(len(linhas)) - np.repeat(inicios, comprimentos) + 1
+    for col in listas:
+        historico[col] = achatadas[col][1].to_numpy()
+    return principal, historico
+
+
+def _valores_celulas(serie):
+    """Valores de uma coluna como objetos Python aceitos pelas bibliotecas de Excel (None para ausentes)."""
+    if eh_moeda(serie):
+        valores = (centavos_da_moeda(serie) / 100).astype(object)
+        valores[serie.isna().to_numpy()] = None
+        return valores.tolist()
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        serie = serie.dt.tz_localize(None)
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def _linhas(df):
+    """Linhas do DataFrame como tuplas, convertidas em blocos de LINHAS_POR_BLOCO."""
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO]
+        yield from zip(*[_valores_celulas(bloco[col]) for col in bloco.columns])
+
+
+def _partes(nome, df):
+    """Divide o DataFrame em planilhas que cabem no limite de linhas do Excel."""
+    if len(df) <= LINHAS_POR_PLANILHA:
+        return [(nome, df)]
+    return [(nome if i == 0 else f"{nome} ({i + 1})", df.iloc[inicio:inicio + LINHAS_POR_PLANILHA])
+            for i, inicio in enumerate(range(0, len(df), LINHAS_POR_PLANILHA))]
+
+
+def exportar_xlsx(planilhas):
+    """
+    Grava as planilhas em um arquivo XLSX na memória, linha a linha.
+
+    Com xlsxwriter, usa o modo constant_memory (cada linha é descarregada assim que escrita);
+    sem ele, o modo write_only do openpyxl. Em ambos, as linhas são convertidas em blocos,
+    então a memória usada não cresce com o tamanho do DataFrame além do próprio arquivo.
+
+    Args:
+        planilhas: Dicionário {nome da planilha: DataFrame}
+
+    Returns:
+        Bytes do arquivo
+    """
+    buffer = io.BytesIO()
+    if xlsxwriter is not None:
+        livro = xlsxwriter.Workbook(buffer, {
+            "constant_memory": True,
+            "default_date_format": FORMATO_DATA_EXCEL,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        })
+        for nome, df in planilhas.items():
+            for titulo, parte in _partes(nome, df):
+                folha = livro.add_worksheet(titulo)
+                folha.write_row(0, 0, [str(col) for col in parte.columns])
+                for i, linha in enumerate(_linhas(parte), start=1):
+                    folha.write_row(i, 0, linha)
+        livro.close()
+    else:
+        livro = openpyxl.Workbook(write_only=True)
+        for nome, df in planilhas.items():
+            for titulo, parte in _partes(nome, df):
+                folha = livro.create_sheet(titulo)
+                folha.append([str(col) for col in parte.columns])
+                for linha in _linhas(parte):
+                    folha.append(linha)
+        livro.save(buffer)
+    return buffer.getvalue()
+
+
+def _gravar_csv(df, destino):
+    # Valores monetários (decimal Arrow) como números, para usar o separador decimal do CSV
+    convertidas = {col: centavos_da_moeda(df[col]) / 100 for col in df.columns if eh_moeda(df[col])}
+    if convertidas:
+        df = df.assign(**{col: pd.Series(valores, index=df.index).where(df[col].notna())
+                          for col, valores in convertidas.items()})
+    df.to_csv(destino, sep=SEPARADOR_CSV, decimal=DECIMAL_CSV, index=False, encoding="utf-8-sig",
+              chunksize=LINHAS_POR_BLOCO)
+
+
+def exportar_csv(tabelas):
+    """
+    Grava as tabelas em CSV na memória.
+
+    Uma única tabela gera um CSV; várias (ex.: dados e histórico) geram um ZIP com um CSV
+    por tabela, escrito diretamente no arquivo compactado.
+
+    Args:
+        tabelas: Dicionário {nome: DataFrame}
+
+    Returns:
+        Bytes do CSV ou do ZIP
+    """
+    buffer = io.BytesIO()
+    if len(tabelas) == 1:
+        _gravar_csv(next(iter(tabelas.values())), buffer)
+        return buffer.getvalue()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as arquivo_zip:
+        for nome, df in tabelas.items():
+            with arquivo_zip.open(f"{nome}.csv", "w") as destino:
+                _gravar_csv(df, destino)
+    return buffer.getvalue()
+
+
+def exportar_parquet(df):
+    """
+    Grava o DataFrame em Parquet na memória (as colunas de listas são mantidas como listas).
+
+    Diferente de cache_excel.gravar_parquet, o arquivo é feito para outras ferramentas: colunas
+    que misturam números e textos são gravadas como texto e os metadados do pandas são
+    omitidos (o pandas não consegue ler de volta o tipo das listas Arrow a partir deles).
+    """
+    mistas = {}
+    # Só colunas object podem misturar tipos (as de texto do pandas 3 guardam apenas textos)
+    for col in [col for col in df.columns if pd.api.types.is_object_dtype(df[col].dtype)]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            mistas[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    if mistas:
+        df = df.assign(**mistas)
+    tabela = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    buffer = io.BytesIO()
+    pq.write_table(tabela, buffer)
+    return buffer.getvalue()
+
+
+def nome_arquivo(df, formato, nome_base):
+    """
+    Nome e tipo MIME do arquivo exportado (calculados sem gerar o arquivo).
+
+    Returns:
+        Tupla (nome do arquivo, MIME)
+    """
+    extensao, mime = FORMATOS[formato]
+    if formato == "csv" and colunas_lista(df):
+        return f"{nome_base}.zip", MIME_ZIP
+    return f"{nome_base}{extensao}", mime
+
+
+def exportar(df, formato):
+    """
+    Exporta o DataFrame para um arquivo em memória, sem gravar nada no diretório do servidor.
+
+    No XLSX e no CSV, as colunas de listas do histórico vão para uma tabela à parte
+    (planilha "Histórico" ou historico.csv no ZIP), com um elemento por linha. No Parquet
+    as listas são gravadas como listas.
+
+    Args:
+        df: DataFrame a exportar
+        formato: "xlsx", "csv" ou "parquet"
+
+    Returns:
+        Bytes do arquivo (ver nome_arquivo para o nome e o MIME)
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    if formato == "parquet":
+        return exportar_parquet(df)
+
+    principal, historico = separar_historico(df)
+    tabelas = {PLANILHA_DADOS: principal}
+    if historico is not None:
+        tabelas[PLANILHA_HISTORICO] = historico
+    if formato == "xlsx":
+        return exportar_xlsx(tabelas)
+    return exportar_csv({nome.lower().replace("ó", "o"): tabela for nome, tabela in tabelas.items()})
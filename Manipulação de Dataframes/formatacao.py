@@ -0,0 +1,216 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from esquema_dados import centavos_da_moeda, eh_moeda
+from historico_compacto import eh_lista_arrow, formatar_listas
+
+
+# Formatos brasileiros: "." separa os milhares e "," as casas decimais
+SEPARADOR_MILHAR = "."
+SEPARADOR_DECIMAL = ","
+SIMBOLO_MOEDA = "R$ "
+FORMATO_DATA_BR = "%d/%m/%Y"
+
+# Formato de exibição das colunas conhecidas (as demais são exibidas como estão)
+FORMATOS_COLUNAS = {
+    "Valor Orçado": "moeda",
+    "Valor Total Orçado": "moeda",
+    "Valor Proposta": "moeda",
+    "Percentual": "percentual",
+    "Percentual Acumulado": "percentual",
+    "Dt Entrada": "data",
+    "Última Data": "data",
+}
+
+# Grupos de 3 dígitos necessários para o maior int64 (9.223.372.036.854.775.807)
+GRUPOS_MILHAR = 7
+
+# A partir deste módulo (2**52) o produto valor * 10**casas em float64 pode arredondar para
+# o inteiro errado
+LIMITE_PRODUTO_EXATO = 2.0 ** 52
+
+
+def _agrupar_milhares(absolutos):
+    """
+    Texto de inteiros não negativos com separador de milhares, sem laço por linha.
+
+    Cada grupo de 3 dígitos é calculado para todas as linhas de uma vez; o grupo mais
+    alto de cada número não tem zeros à esquerda e os grupos acima dele são omitidos.
+    """
+    absolutos = np.asarray(absolutos, dtype=np.int64)
+    divisores = [1000 ** grupo for grupo in range(GRUPOS_MILHAR)]
+    n_grupos = 1 + sum((absolutos >= divisor).astype(np.int64) for divisor in divisores[1:])
+    partes = []
+    # Só os grupos usados pelo maior número (ex.: um só para percentuais)
+    for grupo, divisor in enumerate(divisores[:int(n_grupos.max(initial=1))]):
+        texto = pc.cast(pa.array((absolutos // divisor) % 1000), pa.string())
+        texto = pc.if_else(pa.array(n_grupos - 1 == grupo), texto, pc.utf8_lpad(texto, 3, "0"))
+        partes.append(pc.if_else(pa.array(n_grupos > grupo), texto, pa.scalar(None, pa.string())))
+    # Do grupo mais alto para o mais baixo; os grupos nulos (acima do número) são pulados
+    return pc.binary_join_element_wise(*reversed(partes), SEPARADOR_MILHAR, null_handling="skip")
+
+
+def _formatar_fixo(unidades, casas, nulos, prefixo="", sufixo=""):
+    """
+    Texto de números em ponto fixo a partir de inteiros em unidades da última casa
+    (ex.: centavos para 2 casas), com os separadores brasileiros.
+    """
+    unidades = np.asarray(unidades, dtype=np.int64)
+    negativos = unidades < 0
+    absolutos = np.abs(unidades)
+    escala = 10 ** casas
+    texto = _agrupar_milhares(absolutos // escala)
+    if casas > 0:
+        fracao = pc.utf8_lpad(pc.cast(pa.array(absolutos % escala), pa.string()), casas, "0")
+        texto = pc.binary_join_element_wise(texto, fracao, SEPARADOR_DECIMAL)
+    sinal = pc.if_else(pa.array(negativos), "-", "")
+    texto = pc.binary_join_element_wise(sinal, prefixo, texto, sufixo, "")
+    if nulos is not None and nulos.any():
+        texto = pc.if_else(pa.array(nulos), "", texto)
+    return texto
+
+
+def _serie_texto(texto, serie):
+    return pd.Series(texto.to_numpy(zero_copy_only=False), index=serie.index, name=serie.name, dtype=object)
+
+
+def _unidades(serie, casas):
+    """
+    Valores numéricos arredondados em unidades da última casa decimal e a máscara de ausentes.
+
+    O arredondamento é o mesmo do format do Python (o valor binário exato, com empates para
+    o par). A multiplicação em float64 pode gerar um empate que o valor exato não tem
+    (0.005 * 100 == 0.5) ou perder precisão em valores muito grandes; só esses valores são
+    refeitos com Decimal.
+    """
+    valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    nulos = ~np.isfinite(valores)
+    valores = np.where(nulos, 0, valores)
+    escalados = valores * 10 ** casas
+    unidades = np.round(escalados).astype(np.int64)
+    revisar = (np.abs(escalados - np.trunc(escalados)) == 0.5) | (np.abs(escalados) >= LIMITE_PRODUTO_EXATO)
+    for posicao in np.flatnonzero(revisar):
+        unidades[posicao] = round(Decimal(float(valores[posicao])).scaleb(casas))
+    return unidades, nulos
+
+
+def formatar_numero(serie, casas=2, sufixo=""):
+    """
+    Formata números no padrão brasileiro (ex.: 1234.5 -> "1.234,50"); ausentes viram "".
+
+    Args:
+        serie: Series numérica
+        casas: Casas decimais
+        sufixo: Texto acrescentado a cada valor (ex.: "%")
+
+    Returns:
+        Series de textos com o mesmo índice
+    """
+    unidades, nulos = _unidades(serie, casas)
+    return _serie_texto(_formatar_fixo(unidades, casas, nulos, sufixo=sufixo), serie)
+
+
+def formatar_moeda(serie):
+    """
+    Formata valores em reais (ex.: 1234.5 -> "R$ 1.234,50"); ausentes viram "".
+
+    Colunas monetárias do esquema (decimal Arrow) são lidas como centavos exatos, sem
+    passar por float.
+    """
+    if eh_moeda(serie):
+        unidades, nulos = centavos_da_moeda(serie), serie.isna().to_numpy()
+    else:
+        unidades, nulos = _unidades(serie, 2)
+    return _serie_texto(_formatar_fixo(unidades, 2, nulos, prefixo=SIMBOLO_MOEDA), serie)
+
+
+def formatar_percentual(serie, casas=2):
+    """Formata percentuais já em escala 0-100 (ex.: 27.7382 -> "27,74%"); ausentes viram ""."""
+    return formatar_numero(serie, casas, sufixo="%")
+
+
+def formatar_data(serie, formato=FORMATO_DATA_BR):
+    """Formata datas (ex.: 2024-12-22 -> "22/12/2024"); datas ausentes ou inválidas viram ""."""
+    if not pd.api.types.is_datetime64_any_dtype(serie):
+        serie = pd.to_datetime(serie, errors="coerce")
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        serie = serie.dt.tz_localize(None)
+    datas = pa.array(serie.to_numpy(dtype="datetime64[ns]"), from_pandas=True)
+    return _serie_texto(pc.strftime(datas, format=formato).fill_null(""), serie)
+
+
+def _eh_lista(serie):
+    return eh_lista_arrow(serie) or (len(serie) > 0 and isinstance(serie.iloc[0], list))
+
+
+FORMATADORES = {
+    "moeda": formatar_moeda,
+    "percentual": formatar_percentual,
+    "data": formatar_data,
+}
+
+
+def formatar_exibicao(df, formatos=FORMATOS_COLUNAS, max_itens=None):
+    """
+    Formata para exibição as linhas recebidas: valores, percentuais e datas no padrão
+    brasileiro e listas do histórico como texto.
+
+    Deve ser chamada na hora de mostrar e apenas sobre o recorte exibido (ex.: a página
+    atual): os dados guardados continuam numéricos e tipados, podendo ser ordenados,
+    filtrados e somados normalmente.
+
+    Args:
+        df: DataFrame (ou recorte) a exibir
+        formatos: Dicionário {coluna: "moeda" | "percentual" | "data"}
+        max_itens: Número máximo de elementos mostrados por lista (None mostra todos)
+
+    Returns:
+        Cópia do recorte com as colunas formatadas como texto
+    """
+    df_viz = formatar_listas(df, max_itens=max_itens, formato_data=FORMATO_DATA_BR, decimal=SEPARADOR_DECIMAL)
+    for col, formato in formatos.items():
+        if col not in df.columns or _eh_lista(df[col]):
+            continue
+        if formato != "data" and not (eh_moeda(df[col]) or pd.api.types.is_numeric_dtype(df[col])):
+            continue  # Já é texto (ex.: valores formatados antes): exibe como está
+        df_viz[col] = FORMATADORES[formato](df[col])
+    return df_viz
+
+
+def _textos_coluna(serie, formato):
+    """Texto de cada valor da coluna como Arrow (vazios e ausentes viram nulos)."""
+    if formato is not None:
+        textos = pa.array(FORMATADORES[formato](serie).to_numpy(), type=pa.string())
+    else:
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        try:
+            textos = pc.cast(pa.array(serie, from_pandas=True), pa.string())
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            textos = pa.array(serie.astype(str).where(serie.notna()), from_pandas=True, type=pa.string())
+        if pd.api.types.is_float_dtype(serie.dtype):
+            textos = pc.replace_substring(textos, ".", SEPARADOR_DECIMAL)
+    return pc.if_else(pc.equal(textos, ""), pa.scalar(None, pa.string()), textos)
+
+
+def juntar_colunas(df, colunas, separador=", ", formatos=FORMATOS_COLUNAS):
+    """
+    Junta os valores de várias colunas em um texto por linha, omitindo os vazios
+    (ex.: "03/01/2022, 50, Ana, Preço"), sem percorrer as linhas uma a uma.
+
+    Args:
+        df: DataFrame (ou recorte) com as colunas
+        colunas: Colunas a juntar, na ordem
+        separador: Separador entre os valores
+        formatos: Formatos de exibição das colunas (ver FORMATOS_COLUNAS)
+
+    Returns:
+        Series de textos com o mesmo índice de df
+    """
+    textos = [_textos_coluna(df[col], formatos.get(col)) for col in colunas]
+    juntos = pc.binary_join_element_wise(*textos, separador, null_handling="skip")
+    return pd.Series(juntos.to_numpy(zero_copy_only=False), index=df.index, dtype=object)
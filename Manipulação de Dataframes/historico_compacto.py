@@ -0,0 +1,177 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Colunas de histórico guardadas como listas Arrow (offsets + valores)
+COLUNAS_LISTA = ["Dt Entrada", "Prob.Fech.", "Motivo Não Venda"]
+
+FORMATO_DATA = "%Y-%m-%d"
+
+
+def _lista_arrow(offsets, valores):
+    """Monta uma coluna do pandas a partir dos offsets de cada grupo e dos valores concatenados."""
+    lista = pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), valores)
+    return pd.Series(pd.arrays.ArrowExtensionArray(lista))
+
+
+def lista_datas(offsets, datas):
+    """Lista de datas (filho timestamp[ns]); datas ausentes viram nulos."""
+    return _lista_arrow(offsets, pa.array(np.asarray(datas, dtype="datetime64[ns]"), from_pandas=True))
+
+
+def lista_numeros(offsets, valores):
+    """Lista de números (filho float64); valores não numéricos viram nulos."""
+    numeros = pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy(dtype="float64")
+    return _lista_arrow(offsets, pa.array(numeros, from_pandas=True))
+
+
+def lista_categorias(offsets, valores):
+    """Lista de textos codificados como dicionário (filho categórico com índices int32)."""
+    serie = pd.Series(valores, dtype=object)
+    serie = serie.where(serie.isna(), serie.astype(str))
+    categorico = pd.Categorical(serie)
+    dicionario = pa.DictionaryArray.from_arrays(
+        pa.array(categorico.codes.astype("int32"), mask=categorico.codes < 0),
+        pa.array(categorico.categories.astype(str).tolist(), type=pa.string()),
+    )
+    return _lista_arrow(offsets, dicionario)
+
+
+def eh_lista_arrow(serie):
+    """Indica se a coluna é uma lista Arrow (representação compacta do histórico)."""
+    return isinstance(serie.dtype, pd.ArrowDtype) and pa.types.is_list(serie.dtype.pyarrow_dtype)
+
+
+def _formatar_lista_arrow(serie, separador, max_itens=None, formato_data=FORMATO_DATA, decimal="."):
+    lista = pa.array(serie.array)
+    if isinstance(lista, pa.ChunkedArray):
+        lista = lista.combine_chunks()
+    if max_itens is not None:
+        excedentes = pc.subtract(pc.list_value_length(lista), max_itens)
+        lista = pc.list_slice(lista, 0, max_itens)
+    valores = lista.flatten()
+    if pa.types.is_dictionary(valores.type):
+        valores = valores.dictionary_decode()
+
+    if pa.types.is_timestamp(valores.type):
+        textos = pc.strftime(valores, format=formato_data)
+    elif pa.types.is_floating(valores.type):
+        # Números inteiros sem casas decimais (ex.: probabilidade 50 e não 50.0)
+        inteiro = pc.equal(valores, pc.round(valores))
+        fracionarios = pc.cast(valores, pa.string())
+        if decimal != ".":
+            fracionarios = pc.replace_substring(fracionarios, ".", decimal)
+        textos = pc.if_else(inteiro, pc.cast(pc.cast(valores, pa.int64(), safe=False), pa.string()), fracionarios)
+    else:
+        textos = pc.cast(valores, pa.string())
+    textos = textos.fill_null("")
+
+    # Reaproveita os offsets da lista original (considerando o deslocamento de fatias)
+    offsets = pc.subtract(lista.offsets, lista.offsets[0])
+    juntas = pc.binary_join(pa.ListArray.from_arrays(offsets, textos), separador)
+    if max_itens is not None:
+        # Indica quantos itens foram omitidos (ex.: "2023-01-05, 2023-02-10, … (+12)")
+        sufixo = pc.binary_join_element_wise(f"{separador}… (+", pc.cast(excedentes, pa.string()), ")", "")
+        juntas = pc.if_else(pc.greater(excedentes, 0), pc.binary_join_element_wise(juntas, sufixo, ""), juntas)
+    return pd.Series(juntas.to_numpy(zero_copy_only=False), index=serie.index, dtype=object)
+
+
+def _juntar_lista(lista, separador, max_itens):
+    texto = separador.join(map(str, lista[:max_itens]))
+    if max_itens is not None and len(lista) > max_itens:
+        texto += f"{separador}… (+{len(lista) - max_itens})"
+    return texto
+
+
+def _lista_python_como_arrow(serie):
+    """Converte uma coluna de listas Python em lista Arrow (None se os elementos não tiverem um tipo único)."""
+    try:
+        lista = pa.array(serie.tolist(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        return None
+    if not pa.types.is_list(lista.type):
+        return None
+    return pd.Series(pd.arrays.ArrowExtensionArray(lista), index=serie.index)
+
+
+def formatar_listas(df, separador=", ", max_itens=None, formato_data=FORMATO_DATA, decimal="."):
+    """
+    Formata as colunas de histórico como texto, apenas para as linhas recebidas.
+
+    Deve ser chamada sobre o recorte exibido (ex.: a página atual), e não sobre o DataFrame
+    inteiro: os dados continuam tipados e compactos, e só o que é mostrado vira texto.
+    Listas Python de um único tipo são convertidas para Arrow e formatadas da mesma forma,
+    sem juntar lista por lista.
+
+    Args:
+        df: DataFrame (ou recorte) com colunas de histórico
+        separador: Separador entre os elementos de cada lista
+        max_itens: Número máximo de elementos mostrados por lista (None mostra todos)
+        formato_data: Formato (strftime) das datas
+        decimal: Separador decimal dos números fracionários
+
+    Returns:
+        Cópia do recorte com as listas convertidas para texto
+    """
+    df_viz = df.copy()
+    for col in df.columns:
+        if eh_lista_arrow(df[col]):
+            df_viz[col] = _formatar_lista_arrow(df[col], separador, max_itens, formato_data, decimal)
+        elif len(df) > 0 and isinstance(df[col].iloc[0], list):
+            lista = _lista_python_como_arrow(df[col])
+            if lista is not None:
+                df_viz[col] = _formatar_lista_arrow(lista, separador, max_itens, formato_data, decimal)
+            else:
+                df_viz[col] = df_viz[col].apply(lambda x: _juntar_lista(x, separador, max_itens) if isinstance(x, list) else x)
+    return df_viz
+
+
+def _tamanho_listas_python(serie):
+    """Tamanho em bytes de uma coluna de listas Python (a lista e cada elemento)."""
+    total = 0
+    for valor in serie:
+        if isinstance(valor, list):
+            total += sys.getsizeof(valor) + sum(sys.getsizeof(item) for item in valor)
+        else:
+            total += sys.getsizeof(valor)
+    return total
+
+
+def comparar_memoria(df, amostra=20_000, semente=0):
+    """
+    Compara a memória das colunas de histórico compactas com a representação em listas Python.
+
+    A representação antiga (listas com datas em texto) é medida em uma amostra de linhas e
+    extrapolada para o DataFrame inteiro.
+
+    Returns:
+        Dicionário com bytes_compacto, bytes_listas (estimado) e reducao (fração economizada)
+    """
+    colunas = [col for col in COLUNAS_LISTA if col in df.columns and eh_lista_arrow(df[col])]
+    if not colunas or len(df) == 0:
+        return {"bytes_compacto": 0, "bytes_listas": 0, "reducao": 0.0}
+
+    bytes_compacto = int(sum(pa.chunked_array(df[col].array).nbytes for col in colunas))
+
+    n_amostra = min(amostra, len(df))
+    posicoes = np.random.default_rng(semente).choice(len(df), n_amostra, replace=False)
+    df_amostra = df.iloc[np.sort(posicoes)]
+    bytes_amostra = 0
+    for col in colunas:
+        listas = df_amostra[col].tolist()
+        if col == "Dt Entrada":
+            listas = [[d.strftime(FORMATO_DATA) if d is not None else np.nan for d in lista] for lista in listas]
+        bytes_amostra += _tamanho_listas_python(listas)
+    # Ponteiros das colunas object que guardariam as listas
+    bytes_amostra += 8 * n_amostra * len(colunas)
+    bytes_listas = int(bytes_amostra * len(df) / n_amostra)
+
+    return {
+        "bytes_compacto": bytes_compacto,
+        "bytes_listas": bytes_listas,
+        "reducao": 1 - bytes_compacto / bytes_listas if bytes_listas else 0.0,
+    }
@@ -0,0 +1,189 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+
+import pandas as pd
+
+from cache_excel import gravar_parquet, ler_parquet
+
+
+# Diretório do histórico local de propostas pendentes (configurável por variável de ambiente)
+DIRETORIO_HISTORICO = os.environ.get(
+    "PENDENTES_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "analise_comercial", "pendentes")
+)
+
+_trava = threading.Lock()
+
+
+def rotulo_semana(idx):
+    """
+    Retorna o rótulo da semana a partir da posição do arquivo no upload
+    (o primeiro arquivo é a semana atual)
+    """
+    return f"Semana -{idx + 1}" if idx > 0 else "Semana Atual"
+
+
+def semana_iso(data):
+    """Converte uma data para o identificador da semana ISO (ex.: '2025-W09')."""
+    ano, semana, _ = data.isocalendar()
+    return f"{ano}-W{semana:02d}"
+
+
+def _segunda_feira(semana):
+    return datetime.datetime.strptime(f"{semana}-1", "%G-W%V-%u").date()
+
+
+def semana_anterior(semana, n=1):
+    """Retorna a semana ISO n semanas antes da semana informada."""
+    return semana_iso(_segunda_feira(semana) - datetime.timedelta(weeks=n))
+
+
+def hash_conteudo(conteudo):
+    """Hash SHA-256 do conteúdo do arquivo, usado para detectar semanas já registradas."""
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _caminho_manifesto(diretorio):
+    return os.path.join(diretorio, "manifesto.json")
+
+
+def _ler_manifesto(diretorio):
+    try:
+        with open(_caminho_manifesto(diretorio), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _ordem_registro(entrada):
+    """
+    Chave de ordenação das entradas do manifesto pela ordem de registro: o número de
+    sequência (entradas gravadas antes dele ficam primeiro, pela data de registro).
+    """
+    return entrada.get("sequencia", 0), entrada["registrado_em"]
+
+
+def _gravar_manifesto(diretorio, manifesto):
+    caminho = _caminho_manifesto(diretorio)
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+@lru_cache(maxsize=256)
+def _ler_particao(caminho):
+    # As partições nunca são alteradas depois de gravadas, então podem ficar em memória
+    return ler_parquet(caminho)
+
+
+def semana_registrada(conteudo, diretorio=None):
+    """
+    Verifica se um arquivo já foi registrado no histórico.
+
+    Returns:
+        A semana ISO em que o arquivo foi registrado, ou None
+    """
+    manifesto = _ler_manifesto(diretorio or DIRETORIO_HISTORICO)
+    entrada = manifesto.get(hash_conteudo(conteudo))
+    return entrada["semana"] if entrada else None
+
+
+def registrar_semana(conteudo, semana, df_pendentes, nome_arquivo="", diretorio=None):
+    """
+    Acrescenta ao histórico as propostas pendentes de um snapshot semanal.
+
+    O histórico é somente de acréscimo: cada snapshot é gravado uma única vez na partição
+    da sua semana (semana=AAAA-Wss/<hash>.parquet). Arquivos cujo conteúdo já foi
+    registrado são ignorados.
+
+    Args:
+        conteudo: Bytes do arquivo original (usados para o hash)
+        semana: Semana ISO do snapshot (ex.: '2025-W09')
+        df_pendentes: DataFrame já filtrado com as propostas pendentes
+        nome_arquivo: Nome do arquivo enviado (apenas informativo)
+        diretorio: Diretório do histórico
+
+    Returns:
+        True se o snapshot foi gravado, False se já existia
+    """
+    diretorio = diretorio or DIRETORIO_HISTORICO
+    chave = hash_conteudo(conteudo)
+
+    with _trava:
+        manifesto = _ler_manifesto(diretorio)
+        if chave in manifesto:
+            return False
+
+        pasta = os.path.join(diretorio, f"semana={semana}")
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f"{chave}.parquet")
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        gravar_parquet(df_pendentes.reset_index(drop=True), temporario)
+        os.replace(temporario, caminho)
+
+        manifesto[chave] = {
+            "semana": semana,
+            "arquivo": nome_arquivo,
+            "linhas": int(len(df_pendentes)),
+            "registrado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+            # Ordem de registro: registrado_em tem resolução de segundos
+            "sequencia": max((entrada.get("sequencia", 0) for entrada in manifesto.values()), default=0) + 1,
+        }
+        _gravar_manifesto(diretorio, manifesto)
+    return True
+
+
+def semanas_registradas(diretorio=None):
+    """Lista as semanas presentes no histórico, da mais recente para a mais antiga."""
+    manifesto = _ler_manifesto(diretorio or DIRETORIO_HISTORICO)
+    return sorted({entrada["semana"] for entrada in manifesto.values()}, reverse=True)
+
+
+def consultar_historico(ate_semana=None, n_semanas=None, diretorio=None):
+    """
+    Monta a visão das propostas pendentes "até a semana N".
+
+    Para cada semana usa o snapshot registrado mais recentemente. As semanas são rotuladas
+    a partir da semana de referência, como no upload manual ("Semana Atual", "Semana -2"...).
+
+    Args:
+        ate_semana: Semana ISO de referência (a mais recente do histórico por padrão)
+        n_semanas: Número máximo de semanas retornadas (todas por padrão)
+        diretorio: Diretório do histórico
+
+    Returns:
+        DataFrame consolidado com as colunas 'Semana' e 'Semana Referência', ou None
+    """
+    diretorio = diretorio or DIRETORIO_HISTORICO
+    manifesto = _ler_manifesto(diretorio)
+
+    # Snapshot mais recente de cada semana
+    snapshots = {}
+    for chave, entrada in sorted(manifesto.items(), key=lambda item: _ordem_registro(item[1])):
+        snapshots[entrada["semana"]] = chave
+
+    semanas = sorted(snapshots, reverse=True)
+    if ate_semana is not None:
+        semanas = [s for s in semanas if s <= ate_semana]
+    if n_semanas is not None:
+        semanas = semanas[:n_semanas]
+    if not semanas:
+        return None
+
+    referencia = ate_semana or semanas[0]
+    dfs = []
+    for semana in semanas:
+        caminho = os.path.join(diretorio, f"semana={semana}", f"{snapshots[semana]}.parquet")
+        df = _ler_particao(caminho).copy()
+        # Posição da semana contada a partir da referência (semanas sem arquivo mantêm a contagem)
+        distancia = (_segunda_feira(referencia) - _segunda_feira(semana)).days // 7
+        df['Semana'] = rotulo_semana(distancia)
+        df['Semana Referência'] = semana
+        dfs.append(df)
+
+    return pd.concat(dfs, ignore_index=True)
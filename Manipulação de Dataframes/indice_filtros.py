@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+
+# Colunas filtráveis do DataFrame final, na ordem dos filtros do dashboard
+COLUNAS_FILTRO = ["Negócio", "Grupo", "Subgrupo", "Nome Cliente", "Último Consultor"]
+
+# Valor do filtro que não restringe a coluna
+TODOS = "Todos"
+
+# Um valor presente em mais de 1/LIMIAR_DENSO das linhas ganha um bitmap denso
+# (n/8 bytes), que passa a ser menor que a sua lista de posições (4 bytes por linha)
+LIMIAR_DENSO = 32
+
+
+def _contem(bitmap, posicoes):
+    """Indica, para cada posição, se o bit correspondente está ligado no bitmap (np.packbits)."""
+    return ((bitmap[posicoes >> 3] >> (7 - (posicoes & 7))) & 1).astype(bool)
+
+
+def _intersecao_ordenada(a, b):
+    """Interseção de dois arrays de posições ordenados e sem repetição (busca binária em b)."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return a
+    indices = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[indices] == a]
+
+
+class _IndiceColuna:
+    """Índice invertido de uma coluna: posições ordenadas por valor e bitmaps dos valores frequentes."""
+
+    def __init__(self, valores):
+        try:
+            codigos, unicos = pd.factorize(valores, sort=True)
+        except TypeError:
+            # Tipos misturados não podem ser ordenados: mantém a ordem de aparição
+            codigos, unicos = pd.factorize(valores)
+        n = len(codigos)
+        self.codigos = codigos.astype(np.int32)
+        self.valores = list(unicos)
+        self.indice_valores = pd.Index(unicos)
+        self.codigo = {valor: i for i, valor in enumerate(self.valores)}
+
+        # Ordenação estável pelos códigos: as posições de cada valor ficam contíguas e
+        # ordenadas (os nulos, com código -1, ficam no início e são ignorados)
+        self.contagens = np.bincount(self.codigos[self.codigos >= 0], minlength=len(self.valores))
+        self.ordem = np.argsort(self.codigos, kind="stable").astype(np.int32)
+        self.ordem.flags.writeable = False
+        self.limites = (n - self.contagens.sum()) + np.concatenate([[0], np.cumsum(self.contagens)])
+
+        self.bitmaps = {}
+        for codigo in np.flatnonzero(self.contagens * LIMIAR_DENSO > n):
+            mascara = np.zeros(n, dtype=bool)
+            mascara[self.posicoes(codigo)] = True
+            self.bitmaps[int(codigo)] = np.packbits(mascara)
+
+    def posicoes(self, codigo):
+        return self.ordem[self.limites[codigo]:self.limites[codigo + 1]]
+
+    @property
+    def nbytes(self):
+        return (self.codigos.nbytes + self.ordem.nbytes + self.limites.nbytes
+                + sum(bitmap.nbytes for bitmap in self.bitmaps.values()))
+
+
+class IndiceFiltros:
+    """
+    Índice invertido das colunas filtráveis de um DataFrame, construído uma única vez.
+
+    Para cada valor distinto de cada coluna são guardadas as posições das linhas com
+    esse valor; os valores frequentes também ganham um bitmap. Uma combinação de filtros
+    é resolvida com AND entre bitmaps e interseções de listas de posições, sem percorrer
+    nem copiar o DataFrame.
+
+    Args:
+        df: DataFrame a indexar (normalmente o df_final de processar_dados)
+        colunas: Colunas filtráveis (as ausentes em df são ignoradas)
+    """
+
+    def __init__(self, df, colunas=COLUNAS_FILTRO):
+        self.n_linhas = len(df)
+        self.colunas = {col: _IndiceColuna(df[col].to_numpy()) for col in colunas if col in df.columns}
+
+    def valores(self, coluna):
+        """Valores distintos da coluna (ordenados quando possível)."""
+        return self.colunas[coluna].valores
+
+    def _condicoes(self, filtros):
+        """Filtros ativos como (coluna, índice da coluna, código do valor ou None se ausente)."""
+        condicoes = []
+        for coluna, valor in filtros.items():
+            if valor is None or (isinstance(valor, str) and valor == TODOS):
+                continue
+            indice = self.colunas[coluna]
+            condicoes.append((coluna, indice, indice.codigo.get(valor)))
+        return condicoes
+
+    def filtrar(self, filtros):
+        """
+        Resolve uma combinação de filtros de igualdade.
+
+        Args:
+            filtros: Dicionário {coluna: valor}; valores None ou TODOS não restringem a coluna
+
+        Returns:
+            Array ordenado (somente leitura) com as posições (iloc) das linhas que atendem
+            a todos os filtros
+        """
+        condicoes = [(indice, codigo) for _, indice, codigo in self._condicoes(filtros)]
+        if any(codigo is None for _, codigo in condicoes):
+            return np.empty(0, dtype=np.int32)
+
+        if not condicoes:
+            return np.arange(self.n_linhas, dtype=np.int32)
+
+        # Um único filtro: a lista de posições do valor já é o resultado
+        if len(condicoes) == 1:
+            indice, codigo = condicoes[0]
+            return indice.posicoes(codigo)
+
+        densas = [indice.bitmaps[codigo] for indice, codigo in condicoes if codigo in indice.bitmaps]
+        esparsas = [indice.posicoes(codigo) for indice, codigo in condicoes if codigo not in indice.bitmaps]
+
+        # Só valores frequentes: AND dos bitmaps
+        if not esparsas:
+            bits = densas[0]
+            for bitmap in densas[1:]:
+                bits = bits & bitmap
+            return np.flatnonzero(np.unpackbits(bits, count=self.n_linhas)).astype(np.int32)
+
+        # Parte da lista de posições mais curta, cruza com as demais e testa os bitmaps
+        esparsas.sort(key=len)
+        resultado = esparsas[0]
+        for posicoes in esparsas[1:]:
+            resultado = _intersecao_ordenada(resultado, posicoes)
+        for bitmap in densas:
+            resultado = resultado[_contem(bitmap, resultado)]
+        return resultado
+
+    def facetas(self, filtros):
+        """
+        Valores restantes de cada coluna filtrável, com o número de linhas, para o estado
+        atual dos filtros.
+
+        A contagem de uma coluna considera todos os filtros exceto o da própria coluna, de
+        modo que as opções mostram o que o usuário obteria trocando o valor selecionado.
+        Tudo sai de uma única passada: cada linha registra quantos filtros reprova e, quando
+        reprova apenas um, qual deles; as contagens são bincounts sobre os códigos inteiros.
+
+        Args:
+            filtros: Dicionário {coluna: valor}, como em filtrar
+
+        Returns:
+            Dicionário {coluna: Series valor -> linhas}, só com os valores presentes (> 0 linhas)
+        """
+        condicoes = self._condicoes(filtros)
+        if not condicoes:
+            contagens = {coluna: indice.contagens for coluna, indice in self.colunas.items()}
+        elif len(condicoes) == 1 and condicoes[0][2] is not None:
+            # Um único filtro: a própria coluna fica sem restrição e as demais contam
+            # apenas as linhas do valor selecionado
+            coluna_filtro, indice_filtro, codigo = condicoes[0]
+            posicoes = indice_filtro.posicoes(codigo)
+            contagens = {coluna: (indice.contagens if coluna == coluna_filtro else
+                                  np.bincount(indice.codigos[posicoes] + 1, minlength=len(indice.valores) + 1)[1:])
+                         for coluna, indice in self.colunas.items()}
+        else:
+            reprovados = np.zeros(self.n_linhas, dtype=np.int8)
+            soma_reprovados = np.zeros(self.n_linhas, dtype=np.int8)
+            for i, (_, indice, codigo) in enumerate(condicoes):
+                reprova = (indice.codigos != codigo) if codigo is not None else np.ones(self.n_linhas, dtype=bool)
+                reprovados += reprova
+                # Para as linhas que reprovam um único filtro, a soma é o número desse filtro
+                soma_reprovados += reprova * np.int8(i)
+
+            aprovadas = np.flatnonzero(reprovados == 0)
+            reprovadas_uma = np.flatnonzero(reprovados == 1)
+            filtro_reprovado = soma_reprovados[reprovadas_uma]
+            filtro_coluna = {coluna: i for i, (coluna, _, _) in enumerate(condicoes)}
+            contagens = {}
+            for coluna, indice in self.colunas.items():
+                codigos = indice.codigos[aprovadas]
+                if coluna in filtro_coluna:
+                    relaxadas = reprovadas_uma[filtro_reprovado == filtro_coluna[coluna]]
+                    codigos = np.concatenate([codigos, indice.codigos[relaxadas]])
+                # Desloca os códigos em 1 para descartar os nulos (código -1) no índice 0
+                contagens[coluna] = np.bincount(codigos + 1, minlength=len(indice.valores) + 1)[1:]
+
+        facetas = {}
+        for coluna, indice in self.colunas.items():
+            presentes = np.flatnonzero(contagens[coluna])
+            facetas[coluna] = pd.Series(contagens[coluna][presentes], index=indice.indice_valores[presentes],
+                                        name=coluna)
+        return facetas
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelo índice."""
+        return sum(indice.nbytes for indice in self.colunas.values())
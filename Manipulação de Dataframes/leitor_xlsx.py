@@ -0,0 +1,231 @@
+import hashlib
+import io
+from collections import OrderedDict
+
+import openpyxl
+import pandas as pd
+
+
+# Colunas da planilha de análise comercial efetivamente usadas pelo pipeline
+COLUNAS_ANALISE = [
+    "Cliente", "Código Produto", "Descrição Produto", "Dt Entrada", "Valor Orçado",
+    "Nome Cliente", "Consultor Interno", "Prob.Fech.", "Motivo Não Venda", "UF", "Cidade"
+]
+
+# Conversão aplicada a cada bloco lido
+COLUNAS_DATA = ["Dt Entrada"]
+COLUNAS_NUMERICAS = ["Valor Orçado", "Prob.Fech."]
+
+# Inspeções já realizadas, por hash do conteúdo (evita reabrir a mesma planilha)
+_inspecoes = OrderedDict()
+_MAX_INSPECOES = 16
+
+
+class ColunaFiltroAusente(KeyError):
+    """Levantada quando a planilha não tem uma das colunas usadas no filtro da leitura."""
+
+
+def _abrir_planilha(arquivo, sheet_name=0):
+    """Abre a planilha em modo somente leitura (o XML é lido sob demanda, linha a linha)."""
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = io.BytesIO(arquivo)
+    elif hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+
+    wb = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    if isinstance(sheet_name, int):
+        return wb, wb.worksheets[sheet_name]
+    return wb, wb[sheet_name]
+
+
+def ler_bytes(arquivo):
+    """Obtém os bytes do arquivo sem gravar nada em disco."""
+    if isinstance(arquivo, (bytes, bytearray)):
+        return bytes(arquivo)
+    if hasattr(arquivo, "getvalue"):
+        return arquivo.getvalue()
+    if hasattr(arquivo, "read"):
+        arquivo.seek(0)
+        conteudo = arquivo.read()
+        arquivo.seek(0)
+        return conteudo
+    with open(arquivo, "rb") as f:
+        return f.read()
+
+
+def sugerir_cabecalho(primeiras_linhas):
+    """Sugere a linha do cabeçalho: a primeira linha sem valores numéricos."""
+    for i, linha in enumerate(primeiras_linhas[:5]):
+        if all(not str(celula).replace('.', '').isdigit() for celula in linha if celula):
+            return i
+    return 0
+
+
+def inspecionar_xlsx(arquivo, n_linhas=5, n_colunas=10, sheet_name=0):
+    """
+    Inspeciona o início de uma planilha em uma única passada, direto dos bytes em memória.
+
+    A planilha é aberta em modo somente leitura e apenas as primeiras n_linhas são
+    percorridas. As dimensões vêm dos metadados da planilha, sem carregar as células.
+    O resultado é memorizado pelo hash do conteúdo, então chamadas seguintes para o mesmo
+    arquivo (ex.: pelo carregamento) não reabrem a planilha.
+
+    Args:
+        arquivo: Caminho, bytes ou objeto de arquivo
+        n_linhas: Número de linhas inspecionadas
+        n_colunas: Número de colunas exibidas em first_rows
+        sheet_name: Índice ou nome da planilha
+
+    Returns:
+        Dicionário com total_rows, total_cols, first_rows (texto), linhas_iniciais
+        (valores brutos, largura completa) e suggested_header
+    """
+    conteudo = ler_bytes(arquivo)
+    chave = (hashlib.sha256(conteudo).hexdigest(), n_linhas, n_colunas, sheet_name)
+    if chave in _inspecoes:
+        _inspecoes.move_to_end(chave)
+        return _inspecoes[chave]
+
+    wb, sheet = _abrir_planilha(conteudo, sheet_name)
+    try:
+        linhas_iniciais = [list(linha) for linha in sheet.iter_rows(max_row=n_linhas, values_only=True)]
+        info = {
+            "total_rows": sheet.max_row,
+            "total_cols": sheet.max_column,
+        }
+    finally:
+        wb.close()
+
+    info["linhas_iniciais"] = linhas_iniciais
+    info["first_rows"] = [
+        [str(valor) if valor is not None else '' for valor in linha[:n_colunas]]
+        for linha in linhas_iniciais
+    ]
+    info["suggested_header"] = sugerir_cabecalho(info["first_rows"])
+
+    _inspecoes[chave] = info
+    if len(_inspecoes) > _MAX_INSPECOES:
+        _inspecoes.popitem(last=False)
+    return info
+
+
+def tipar_bloco(df):
+    """Converte as colunas conhecidas de um bloco para datetime e numérico."""
+    for col in COLUNAS_DATA:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    for col in COLUNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def ler_xlsx_em_blocos(arquivo, colunas=None, header_row=0, sheet_name=0, tamanho_bloco=50_000,
+                       filtro=None, max_linhas=None):
+    """
+    Lê uma planilha XLSX em blocos, trazendo apenas as colunas solicitadas.
+
+    O cabeçalho é lido uma única vez e as linhas seguintes são percorridas com o modo
+    somente leitura do openpyxl, guardando apenas os valores das colunas projetadas.
+    Assim, o pico de memória fica limitado ao tamanho do bloco e não ao da planilha inteira.
+
+    Args:
+        arquivo: Caminho, bytes ou objeto de arquivo
+        colunas: Lista de colunas desejadas (None para todas); colunas ausentes são ignoradas
+        header_row: Índice da linha que contém os nomes das colunas (0-indexado)
+        sheet_name: Índice ou nome da planilha
+        tamanho_bloco: Número de linhas por DataFrame emitido
+        filtro: Dicionário {coluna: valor} avaliado durante a leitura; linhas que não
+                atendem ao filtro são descartadas antes de serem materializadas (levanta
+                ColunaFiltroAusente se uma coluna do filtro não está no cabeçalho)
+        max_linhas: Número máximo de linhas lidas (None para todas); a leitura do arquivo
+                    para assim que esse número de linhas é atingido
+
+    Yields:
+        DataFrames tipados com até tamanho_bloco linhas
+    """
+    wb, sheet = _abrir_planilha(arquivo, sheet_name)
+    try:
+        linhas = sheet.iter_rows(values_only=True)
+
+        # 1. Avançar até o cabeçalho e mapear as colunas projetadas
+        cabecalho = None
+        for i, linha in enumerate(linhas):
+            if i == header_row:
+                cabecalho = list(linha)
+                break
+        if cabecalho is None:
+            return
+
+        posicoes = {}
+        for j, nome in enumerate(cabecalho):
+            if nome is not None and nome not in posicoes:
+                posicoes[nome] = j
+        nomes = [c for c in (colunas if colunas is not None else posicoes) if c in posicoes]
+        indices = [posicoes[c] for c in nomes]
+
+        filtro = filtro or {}
+        colunas_faltantes = [c for c in filtro if c not in posicoes]
+        if colunas_faltantes:
+            raise ColunaFiltroAusente(f"Colunas do filtro não encontradas: {', '.join(map(str, colunas_faltantes))}")
+        condicoes = [(posicoes[c], valor) for c, valor in filtro.items()]
+
+        # 2. Percorrer as linhas acumulando apenas os valores projetados
+        bloco = []
+        emitidos = 0
+        restantes = max_linhas
+        for linha in linhas:
+            if restantes is not None and restantes <= 0:
+                break
+            if condicoes and not all(j < len(linha) and linha[j] == valor for j, valor in condicoes):
+                continue
+            valores = [linha[j] if j < len(linha) else None for j in indices]
+            if all(v is None for v in valores):
+                continue
+            bloco.append(valores)
+            if restantes is not None:
+                restantes -= 1
+            if len(bloco) >= tamanho_bloco:
+                yield tipar_bloco(pd.DataFrame(bloco, columns=nomes))
+                emitidos += 1
+                bloco = []
+
+        if bloco or emitidos == 0:
+            yield tipar_bloco(pd.DataFrame(bloco, columns=nomes))
+    finally:
+        wb.close()
+
+
+def ler_xlsx_colunas(arquivo, colunas=None, header_row=0, sheet_name=0, tamanho_bloco=50_000, filtro=None,
+                     max_linhas=None):
+    """
+    Lê uma planilha XLSX trazendo apenas as colunas solicitadas (ver ler_xlsx_em_blocos).
+
+    Returns:
+        DataFrame com as colunas projetadas, na ordem solicitada
+    """
+    blocos = list(ler_xlsx_em_blocos(arquivo, colunas, header_row, sheet_name, tamanho_bloco, filtro, max_linhas))
+    if not blocos:
+        return pd.DataFrame()
+    return pd.concat(blocos, ignore_index=True)
+
+
+def ler_planilhas_em_blocos(arquivos, colunas=None, header_row=0, sheet_name=0, tamanho_bloco=50_000):
+    """
+    Lê várias planilhas XLSX em sequência, como um único fluxo de blocos (ver ler_xlsx_em_blocos).
+
+    Útil para processar juntas planilhas que não caberiam na memória ao mesmo tempo
+    (ex.: vários anos ou filiais com motor_externo.processar_fora_da_memoria).
+
+    Args:
+        arquivos: Caminhos, bytes ou objetos de arquivo, na ordem em que devem ser lidos
+        colunas: Lista de colunas desejadas (None para todas)
+        header_row: Índice da linha que contém os nomes das colunas (o mesmo em todas)
+        sheet_name: Índice ou nome da planilha
+        tamanho_bloco: Número máximo de linhas por DataFrame emitido
+
+    Yields:
+        DataFrames tipados com até tamanho_bloco linhas
+    """
+    for arquivo in arquivos:
+        yield from ler_xlsx_em_blocos(arquivo, colunas, header_row, sheet_name, tamanho_bloco)
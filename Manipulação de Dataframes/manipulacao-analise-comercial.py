@@ -4,12 +4,27 @@ import streamlit as st
 import numpy as np
 import io
 import datetime
-import re
-import gc
 from datetime import datetime
 
 # Importe para processar os dados conforme o arquivo análise_produtos_clientes.py
 from analise_pendentes import exibir_analise_pendentes
+from motor_historico import COLUNAS_ORIGEM_HISTORICO
+from motor_incremental import ProcessamentoIncremental
+from dimensoes import ClientDimension, ProductDimension
+from motor_analise import classificar_clientes_abc, construir_dimensao_produtos, historico_produtos_clientes
+from motor_abc import GERAL, LIMITE_A, LIMITE_B, MEDIDAS, CurvasABC, abc_janela_movel
+from pipeline_comercial import executar_pipeline, limpar_analise
+from cache_excel import ler_excel_com_cache, estatisticas_cache
+from cache_resultados import CacheResultados, memorizar
+from esquema_dados import ESQUEMA_ANALISE, ESQUEMA_CATEGORIAS, relatorio_memoria
+from exportacao import FORMATOS, exportar, nome_arquivo
+from leitor_xlsx import COLUNAS_ANALISE, inspecionar_xlsx
+from historico_compacto import comparar_memoria
+from formatacao import formatar_exibicao
+from perfil import medir_etapa, tabela_medicoes, medicoes_para_json
+from tarefas import CANCELADA, CONCLUIDA, ExecutorTarefas, TarefaCancelada
+from indice_filtros import COLUNAS_FILTRO, TODOS, IndiceFiltros
+from paginacao import IndiceOrdenacao, paginar, preparar_pagina, total_paginas
 
 
 # Adicione esta função para replicar a lógica do análise_produtos_clientes.py
@@ -28,66 +43,18 @@ def processar_dados_produtos_clientes(df_analise, df_categorias):
     try:
         st.write("Iniciando processamento de dados conforme análise_produtos_clientes.py...")
         
-        # 1. Classificar clientes ABC
-        df_classificacao_abc = classificar_clientes_abc(df_analise)
+        # 1. Classificar clientes ABC e montar as dimensões de clientes e produtos
+        dim_clientes = ClientDimension(classificar_clientes_abc(df_analise))
+        dim_produtos = ProductDimension(df_categorias)
         
-        # 2. Realizar merge entre df_analise e df_classificacao_abc
-        df_resultado = pd.merge(
-            df_analise[["Código Produto", "Descrição Produto", "Dt Entrada", "Cliente", 
-                        "Consultor Interno", "Prob.Fech.", "Motivo Não Venda"]],
-            df_classificacao_abc,
-            on='Cliente', 
-            how='inner'
-        )
-        
-        # 3. Juntar com as categorias de produtos
-        df_categorias_slim = df_categorias[["Código Produto", "Negócio", "Grupo", "Subgrupo"]]
-        df_resultado_final = pd.merge(df_resultado, df_categorias_slim, on="Código Produto", how="left")
-        
-        # 4. Converter coluna 'Dt Entrada' para datetime
-        df_resultado_final['Dt Entrada_temp'] = pd.to_datetime(df_resultado_final['Dt Entrada'], errors='coerce')
-        
-        # 5. Agrupar por subgrupo, código produto e cliente
-        resultado = []
-        
-        for (subgrupo, codigo_produto, cliente), grupo in df_resultado_final.groupby(["Subgrupo", "Código Produto", "Cliente"]):
-            # Ordenar dados por data
-            grupo_ordenado = grupo.sort_values("Dt Entrada_temp")
-            
-            # Criar linha para o resultado
-            linha = {
-                "Subgrupo": subgrupo,
-                "Negócio": grupo_ordenado["Negócio"].iloc[0] if "Negócio" in grupo_ordenado.columns else "",
-                "Grupo": grupo_ordenado["Grupo"].iloc[0] if "Grupo" in grupo_ordenado.columns else "",
-                "Código Produto": codigo_produto,
-                "Descrição Produto": grupo_ordenado["Descrição Produto"].iloc[0],
-                "Cliente": cliente,
-                "Nome Cliente": grupo_ordenado["Nome Cliente"].iloc[0],
-                "UF": grupo_ordenado["UF"].iloc[0],
-                "Cidade": grupo_ordenado["Cidade"].iloc[0],
-                "ABC": grupo_ordenado["ABC"].iloc[0],
-                "Valor Total Orçado": grupo_ordenado["Valor Total Orçado"].iloc[0]
-            }
-            
-            # Adicionar histórico de interações
-            linha["Dt Entrada"] = grupo_ordenado["Dt Entrada_temp"].dt.strftime("%Y-%m-%d").tolist()
-            linha["Prob.Fech."] = grupo_ordenado["Prob.Fech."].tolist()
-            linha["Motivo Não Venda"] = grupo_ordenado["Motivo Não Venda"].tolist()
-            
-            # Calcular última data e consultor
-            if len(grupo_ordenado) > 0:
-                ultima_data_idx = grupo_ordenado["Dt Entrada_temp"].idxmax()
-                linha["Última Data"] = grupo_ordenado.loc[ultima_data_idx, "Dt Entrada_temp"]
-                linha["Último Consultor"] = grupo_ordenado.loc[ultima_data_idx, "Consultor Interno"]
-            
-            resultado.append(linha)
-        
-        # 6. Criar DataFrame final
-        df_final = pd.DataFrame(resultado)
+        # 2. Histórico dos clientes classificados e produtos categorizados, com as informações
+        #    do cliente e do produto
+        df_analise = df_analise[[col for col in COLUNAS_ORIGEM_HISTORICO if col in df_analise.columns]]
+        df_final = historico_produtos_clientes(df_analise, dim_clientes, dim_produtos)
         
-        # 7. Formatar datas
-        if "Última Data" in df_final.columns:
-            df_final["Última Data"] = pd.to_datetime(df_final["Última Data"]).dt.strftime("%Y-%m-%d")
+        # 3. Ordenar por subgrupo, código produto e cliente
+        df_final = df_final.sort_values(["Subgrupo", "Código Produto", "Cliente"], kind="mergesort") \
+                           .reset_index(drop=True)
         
         st.success(f"Processamento concluído! {len(df_final)} registros gerados.")
         return df_final
@@ -120,14 +87,21 @@ st.title("Dashboard de Análise Comercial")
 
 
 # Adicione esta função antes de carregar_dados
-@st.cache_data
-def carregar_excel_corretamente(arquivo, header_row=0):
+def carregar_excel_corretamente(arquivo, header_row=0, colunas=None, esquema=None, max_linhas=None):
     """
     Carrega um arquivo Excel garantindo que os cabeçalhos sejam interpretados corretamente.
     
+    A leitura passa pelo cache em disco (cache_excel), endereçado pelo conteúdo do arquivo,
+    de modo que reenviar a mesma planilha não exige uma nova leitura do Excel.
+    
     Args:
         arquivo: Caminho do arquivo ou objeto de arquivo
         header_row: Índice da linha que contém os nomes das colunas (0 por padrão)
+        colunas: Colunas a carregar (None para todas). Quando informado, a planilha é lida
+                 em streaming, guardando apenas essas colunas
+        esquema: Tipos das colunas (esquema_dados), aplicados na carga e guardados no cache
+        max_linhas: Número máximo de linhas carregadas (None para todas); a leitura do
+                    arquivo para ao atingi-lo
     
     Returns:
         DataFrame do pandas carregado corretamente
@@ -135,43 +109,31 @@ def carregar_excel_corretamente(arquivo, header_row=0):
     try:
         # Mostrar mensagem de carregamento
         with st.spinner('Carregando arquivo Excel...'):
-            # Verificar se é um objeto de arquivo ou caminho
-            if hasattr(arquivo, 'read'):
-                # É um objeto de arquivo (upload via Streamlit)
-                # Primeiro, verificamos os nomes das colunas
-                df_header = pd.read_excel(arquivo, nrows=0)
-                st.write(f"Colunas detectadas: {list(df_header.columns)}")
-                
-                # Reiniciar o ponteiro do arquivo
-                arquivo.seek(0)
-                
-                # Carregar o arquivo completo com os cabeçalhos corretos
-                df = pd.read_excel(
-                    arquivo,
-                    header=header_row
-                )
-            else:
-                # É um caminho de arquivo
-                df = pd.read_excel(
-                    arquivo,
-                    header=header_row
-                )
+            # Carregar o arquivo (do cache em disco quando o mesmo conteúdo já foi lido)
+            df, do_cache = ler_excel_com_cache(arquivo, header_row=header_row, colunas=colunas, esquema=esquema,
+                                               max_linhas=max_linhas)
+            st.write(f"Colunas detectadas: {list(df.columns)}")
                 
             # Mostrar informações sobre o DataFrame carregado
-            st.success(f"Arquivo carregado com sucesso: {len(df)} linhas, {len(df.columns)} colunas")
+            origem = " (cache)" if do_cache else ""
+            st.success(f"Arquivo carregado com sucesso{origem}: {len(df)} linhas, {len(df.columns)} colunas")
             
-            # Verificar se o número de colunas está razoável
-            if len(df.columns) > 100:
-                st.warning(f"Detectado um número anormalmente alto de colunas: {len(df.columns)}. Verificando possível erro de formatação...")
+            # Verificar se o cabeçalho foi encontrado: com a projeção de colunas, um cabeçalho
+            # na linha errada aparece como colunas esperadas ausentes; sem ela, como um número
+            # anormalmente alto de colunas
+            faltantes = [col for col in colunas if col not in df.columns] if colunas is not None else []
+            if faltantes or len(df.columns) > 100:
+                if faltantes:
+                    st.warning(f"Colunas esperadas não encontradas com o cabeçalho na linha {header_row}: "
+                               f"{', '.join(faltantes)}. Verificando possível erro de formatação...")
+                else:
+                    st.warning(f"Detectado um número anormalmente alto de colunas: {len(df.columns)}. Verificando possível erro de formatação...")
                 
                 # Tentar identificar o problema e corrigir
-                if isinstance(header_row, int) and header_row == 0:
-                    # Tentar carregar com diferentes opções de cabeçalho
-                    if hasattr(arquivo, 'read'):
-                        arquivo.seek(0)
-                    
-                    # Mostrar as primeiras linhas para análise
-                    df_preview = pd.read_excel(arquivo, nrows=5, header=None)
+                if isinstance(header_row, int):
+                    # Mostrar as primeiras linhas para análise (mesma inspeção usada na verificação de estrutura)
+                    estrutura = verificar_estrutura_excel(arquivo)
+                    df_preview = pd.DataFrame(estrutura.get('first_rows', []))
                     st.write("Visualização das primeiras linhas (sem cabeçalho):")
                     st.dataframe(df_preview)
                     
@@ -181,13 +143,15 @@ def carregar_excel_corretamente(arquivo, header_row=0):
                     st.info("2. Tente carregar novamente especificando qual linha contém os cabeçalhos (0-indexado)")
                     
                     # Oferecer interface para o usuário escolher a linha de cabeçalho
-                    novo_header = st.number_input("Linha do cabeçalho (0 é a primeira linha):", 0, 10, 0)
+                    novo_header = st.number_input("Linha do cabeçalho (0 é a primeira linha):", 0, 10,
+                                                  estrutura.get('suggested_header', 0))
                     
                     if novo_header != header_row and st.button("Recarregar com novo cabeçalho"):
                         # Recarregar com o novo header
                         if hasattr(arquivo, 'read'):
                             arquivo.seek(0)
-                        return carregar_excel_corretamente(arquivo, header_row=novo_header)
+                        return carregar_excel_corretamente(arquivo, header_row=novo_header, colunas=colunas,
+                                                          esquema=esquema, max_linhas=max_linhas)
             
             return df
                 
@@ -201,319 +165,315 @@ def carregar_excel_corretamente(arquivo, header_row=0):
 
 
 # Cache the data loading function to improve performance
-@st.cache_data
 def carregar_dados(caminho_arquivo):
     """
     Lê um arquivo Excel e o carrega como um DataFrame do Pandas.
     """
     try:
-        df = pd.read_excel(caminho_arquivo)
+        df, _ = ler_excel_com_cache(caminho_arquivo)
         return df
     except Exception as e:
         st.error(f"Erro ao ler o arquivo Excel: {e}")
         return None
     
     
-# Adicione esta função após a função carregar_dados
-@st.cache_data(ttl=3600)
-def otimizar_dataframe_inicial(df):
-    """Reduzir o dataframe inicial para melhorar performance"""
-    # Converter tipos de dados para otimizar memória
-    for col in df.select_dtypes(include=['object']).columns:
-        if df[col].nunique() < df.shape[0] / 2:  # Se coluna tem cardinalidade baixa
-            df[col] = df[col].astype('category')
-    
-    # Converter colunas numéricas para tipos mais eficientes
-    for col in df.select_dtypes(include=['float']).columns:
-        df[col] = pd.to_numeric(df[col], downcast='float')
-    
-    for col in df.select_dtypes(include=['int']).columns:
-        df[col] = pd.to_numeric(df[col], downcast='integer')
-    
-    return df
+# Function to process data
+# Substitua a função processar_dados existente pela nova abaixo
+def informar_streamlit(mensagem, nivel="info"):
+    """Exibe no Streamlit as mensagens emitidas pelo pipeline (pipeline_comercial)."""
+    {"aviso": st.warning, "erro": st.error, "sucesso": st.success}.get(nivel, st.write)(mensagem)
 
 
+@st.cache_resource
+def obter_cache_resultados():
+    """Cache de resultados do processamento, compartilhado pelas sessões do servidor."""
+    return CacheResultados()
 
-# Function to process data
-# Substitua a função processar_dados existente pela nova abaixo
-@st.cache_data(ttl=3600, max_entries=10)
-def processar_dados(df_analise, df_categorias):
-    """Processa os dados comerciais para análise."""
+
+@memorizar(obter_cache_resultados)
+def processar_dados(df_analise, df_categorias, limpar=False, _medicoes=None, _ao_informar=None, _ao_progresso=None,
+                    _incremental=None, _verificar_cancelamento=None):
+    """
+    Processa os dados comerciais para análise.
+
+    O resultado é guardado em cache_resultados, com chave formada pelas impressões
+    digitais dos DataFrames de entrada e pelo parâmetro limpar. Sessões que pedem o mesmo
+    processamento enquanto ele está em andamento aguardam e compartilham esse resultado.
+    
+    Args:
+        df_analise: DataFrame com dados de análise comercial
+        df_categorias: DataFrame com dados de categorias de produtos
+        limpar: Aplica limpar_dataframe (sem as mensagens) antes do processamento
+        _medicoes: Lista que recebe as medições de cada etapa (não faz parte da chave do
+                   cache; fica vazia quando o resultado vem do cache)
+        _ao_informar: Destino das mensagens (padrão: exibidas no Streamlit)
+        _ao_progresso: Destino do progresso das etapas (padrão: barra de progresso do Streamlit);
+                       as tarefas em segundo plano passam os métodos de StatusTarefa
+        _incremental: ProcessamentoIncremental da sessão; quando os dados já processados são
+                      o início de df_analise (ex.: a exportação com um novo mês), só as
+                      linhas novas são processadas (ver pipeline_comercial.executar_pipeline)
+        _verificar_cancelamento: Chamada periodicamente enquanto outra sessão calcula o mesmo
+                                 resultado (cache_resultados.memorizar); as tarefas em segundo
+                                 plano passam StatusTarefa.verificar_cancelamento
+    """
+    ao_informar = _ao_informar or informar_streamlit
     try:
         # Verificar se temos dados suficientes
         if df_analise is None or df_categorias is None or len(df_analise) == 0 or len(df_categorias) == 0:
-            st.error("Dados insuficientes para processamento.")
+            ao_informar("Dados insuficientes para processamento.", "erro")
             return pd.DataFrame()
-            
-        # 1. Mostrar informações de diagnóstico
-        st.write(f"DataFrame de análise: {df_analise.shape[0]} linhas x {df_analise.shape[1]} colunas")
-        st.write(f"DataFrame de categorias: {df_categorias.shape[0]} linhas x {df_categorias.shape[1]} colunas")
-        
-        # 2. Verificar colunas necessárias no DataFrame de análise
-        colunas_essenciais_analise = ["Cliente", "Código Produto", "Dt Entrada", "Valor Orçado", 
-                                      "Nome Cliente", "Consultor Interno"]
-        
-        colunas_faltantes = [col for col in colunas_essenciais_analise if col not in df_analise.columns]
-        if colunas_faltantes:
-            st.warning(f"Colunas essenciais faltando no DataFrame de análise: {', '.join(colunas_faltantes)}")
-            st.warning("Processamento pode não funcionar corretamente sem estas colunas.")
-        
-        # 3. Verificar colunas necessárias no DataFrame de categorias
-        colunas_categorias = ["Código Produto", "Negócio", "Grupo", "Subgrupo"]
-        colunas_faltantes_cat = [col for col in colunas_categorias if col not in df_categorias.columns]
-        if colunas_faltantes_cat:
-            st.warning(f"Colunas essenciais faltando no DataFrame de categorias: {', '.join(colunas_faltantes_cat)}")
-            st.warning("Informações de categorização podem estar incompletas.")
-        
-        # 4. Converter a coluna de data para datetime
-        if 'Dt Entrada' in df_analise.columns:
-            df_analise['Dt Entrada'] = pd.to_datetime(df_analise['Dt Entrada'], errors='coerce')
-        
-        # 5. Classificar clientes ABC
-        st.write("Iniciando classificação ABC de clientes...")
-        df_clientes_abc = classificar_clientes_abc(df_analise)
-        
-        # 6. Criar dicionário de categorias de produtos
-        st.write("Criando dicionário de categorias de produtos...")
-        categorias_dict = {}
-        
-        # Adaptar para as colunas disponíveis no DataFrame de categorias
-        colunas_categoria_disponiveis = ["Negócio", "Grupo", "Subgrupo"]
-        colunas_disponiveis = [col for col in colunas_categoria_disponiveis if col in df_categorias.columns]
-        
-        for _, row in df_categorias.iterrows():
-            if "Código Produto" in df_categorias.columns:
-                cod_produto = str(row["Código Produto"])
-                categorias_dict[cod_produto] = {}
-                
-                for col in colunas_disponiveis:
-                    categorias_dict[cod_produto][col] = row.get(col, "")
-        
-        # 7. Criar DataFrame final com informações combinadas
-        st.write("Combinando informações de produtos e clientes...")
-        
-        resultado = []
-        total_registros = len(df_analise)
         
-        # Criar barra de progresso
-        progress_bar = st.progress(0)
-        status_texto = st.empty()
-        
-        # Processar em lotes para economizar memória
-        lote_size = 1000
-        for i in range(0, total_registros, lote_size):
-            # Atualizar progresso
-            progress = min(i / total_registros, 1.0)
-            progress_bar.progress(progress)
-            status_texto.text(f"Processando registros {i+1}-{min(i+lote_size, total_registros)} de {total_registros}")
-            
-            # Processar lote atual
-            lote = df_analise.iloc[i:i+lote_size]
-            
-            # Agrupar por produto e cliente
-            for (cliente, codigo_produto), grupo in lote.groupby(["Cliente", "Código Produto"]):
-                # Informações do produto
-                produto_info = {}
-                if "Descrição Produto" in grupo.columns:
-                    produto_info["Descrição Produto"] = grupo["Descrição Produto"].iloc[0]
-                else:
-                    produto_info["Descrição Produto"] = ""
-                
-                # Verificar se o produto existe no dicionário de categorias
-                if codigo_produto in categorias_dict:
-                    for cat_col in colunas_disponiveis:
-                        produto_info[cat_col] = categorias_dict[codigo_produto][cat_col]
-                else:
-                    for cat_col in colunas_disponiveis:
-                        produto_info[cat_col] = ""
-                
-                # Informações do cliente
-                cliente_info = {}
-                if "Nome Cliente" in grupo.columns:
-                    cliente_info["Nome Cliente"] = grupo["Nome Cliente"].iloc[0]
-                else:
-                    cliente_info["Nome Cliente"] = ""
-                
-                # Verificar se o cliente existe no DataFrame ABC
-                cliente_row = df_clientes_abc[df_clientes_abc["Cliente"] == cliente] if len(df_clientes_abc) > 0 else None
-                if cliente_row is not None and len(cliente_row) > 0:
-                    cliente_info["ABC"] = cliente_row["ABC"].iloc[0]
-                    cliente_info["UF"] = cliente_row["UF"].iloc[0] if "UF" in cliente_row.columns else ""
-                    cliente_info["Cidade"] = cliente_row["Cidade"].iloc[0] if "Cidade" in cliente_row.columns else ""
-                    cliente_info["Valor Total Orçado"] = cliente_row["Valor Total Orçado"].iloc[0]
-                else:
-                    cliente_info["ABC"] = "C"
-                    cliente_info["UF"] = ""
-                    cliente_info["Cidade"] = ""
-                    cliente_info["Valor Total Orçado"] = 0
-                
-                # Histórico de interações
-                if "Dt Entrada" in grupo.columns:
-                    historico_datas = grupo["Dt Entrada"].dt.strftime("%Y-%m-%d").tolist()
-                else:
-                    historico_datas = []
-                
-                historico_prob = grupo["Prob.Fech."].tolist() if "Prob.Fech." in grupo.columns else []
-                historico_motivo = grupo["Motivo Não Venda"].tolist() if "Motivo Não Venda" in grupo.columns else []
-                
-                # Última interação
-                if "Dt Entrada" in grupo.columns and len(grupo) > 0:
-                    ultima_idx = grupo["Dt Entrada"].idxmax() if not grupo["Dt Entrada"].isna().all() else grupo.index[0]
-                    ultima_data = grupo.loc[ultima_idx, "Dt Entrada"]
-                    ultimo_consultor = grupo.loc[ultima_idx, "Consultor Interno"] if "Consultor Interno" in grupo.columns else ""
-                else:
-                    ultima_data = None
-                    ultimo_consultor = ""
-                
-                # Criar registro para o resultado
-                registro = {
-                    "Cliente": cliente,
-                    "Nome Cliente": cliente_info["Nome Cliente"],
-                    "ABC": cliente_info["ABC"],
-                    "UF": cliente_info["UF"],
-                    "Cidade": cliente_info["Cidade"],
-                    "Valor Total Orçado": cliente_info["Valor Total Orçado"],
-                    "Código Produto": codigo_produto,
-                    "Descrição Produto": produto_info["Descrição Produto"],
-                    "Dt Entrada": historico_datas,
-                    "Prob.Fech.": historico_prob,
-                    "Motivo Não Venda": historico_motivo,
-                    "Última Data": ultima_data,
-                    "Último Consultor": ultimo_consultor
-                }
-                
-                # Adicionar categorias se disponíveis
-                for cat_col in colunas_disponiveis:
-                    registro[cat_col] = produto_info[cat_col]
-                
-                resultado.append(registro)
-            
-            # Liberar memória
-            import gc
-            gc.collect()
-        
-        # Limpar elementos de progresso
-        progress_bar.empty()
-        status_texto.empty()
-        
-        # 8. Criar DataFrame final
-        df_final = pd.DataFrame(resultado)
-        
-        # 9. Formatar datas
-        if "Última Data" in df_final.columns:
-            df_final["Última Data"] = pd.to_datetime(df_final["Última Data"]).dt.strftime("%Y-%m-%d")
-        
-        st.success(f"Processamento concluído! {len(df_final)} registros gerados.")
+        # Classificação ABC, dimensões, histórico e montagem (pipeline sem dependência do Streamlit)
+        ao_progresso = _ao_progresso
+        if ao_progresso is None:
+            barra = st.progress(0.0)
+            ao_progresso = lambda etapa, indice, total: barra.progress(indice / total)
+        df_final, _ = executar_pipeline(
+            df_analise, df_categorias, limpar=limpar, medicoes=_medicoes,
+            ao_informar=ao_informar, ao_progresso=ao_progresso, incremental=_incremental,
+        )
         return df_final
         
+    except TarefaCancelada:
+        raise
     except Exception as e:
-        st.error(f"Erro no processamento de dados: {e}")
         import traceback
-        st.error(traceback.format_exc())
+        ao_informar(f"Erro no processamento de dados: {e}", "erro")
+        ao_informar(traceback.format_exc(), "erro")
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=600)
-def filtrar_dataframe(df, negocio, grupo, subgrupo, cliente, consultor):
-    """Filtra o dataframe com base nos critérios selecionados"""
-    df_filtrado = df.copy()
+# Intervalo (s) de atualização do progresso da tarefa de processamento
+INTERVALO_ACOMPANHAMENTO = 0.5
+
+# Rótulos das etapas de pipeline_comercial.ETAPAS exibidos no progresso
+ETAPAS_PROCESSAMENTO = {
+    "carregar": "carregando", "limpar": "limpando os dados", "abc": "classificação ABC",
+    "dimensoes": "dimensões de clientes e produtos", "historico": "histórico de interações",
+    "montar": "montando o resultado", "concluido": "concluído",
+}
+
+
+@st.cache_resource
+def obter_executor_tarefas():
+    """Executor das tarefas em segundo plano, compartilhado pelas sessões do servidor."""
+    return ExecutorTarefas()
+
+
+def processar_em_segundo_plano(status, df_analise, df_categorias, limpar, incremental=None):
+    """
+    Tarefa do executor: processar_dados com as mensagens e o progresso enviados ao status.
+
+    Returns:
+        Tupla (df_final, medições das etapas)
+    """
+    medicoes = []
+    df_final = processar_dados(df_analise, df_categorias, limpar, _medicoes=medicoes,
+                               _ao_informar=status.informar, _ao_progresso=status.progredir,
+                               _incremental=incremental, _verificar_cancelamento=status.verificar_cancelamento)
+    return df_final, medicoes
+
+
+def concluir_processamento(df_final, perfil_processamento, dados_abc):
+    """Guarda na sessão o resultado de uma tarefa de processamento concluída."""
+    st.session_state.perfil_processamento = perfil_processamento
+    st.session_state.perfil_do_cache = not perfil_processamento
+    if df_final is None or len(df_final) == 0:
+        return False
+    st.session_state.df_final = df_final
+    # Dados de origem das curvas ABC por segmento (calculadas ao abrir a aba)
+    st.session_state.dados_abc = dados_abc
+    # Índice dos filtros construído uma única vez por resultado
+    with medir_etapa("indice_filtros", perfil_processamento, len(df_final)) as medicao:
+        medicao["linhas_saida"] = obter_indice_filtros(df_final).n_linhas
+    st.session_state.mostrar_tabs = True
+    return True
+
+
+@st.fragment(run_every=INTERVALO_ACOMPANHAMENTO)
+def acompanhar_processamento():
+    """
+    Mostra o progresso da tarefa de processamento da sessão, atualizado periodicamente sem
+    rodar a página inteira. Ao terminar, o resultado é levado para a sessão e a página é
+    executada de novo com os dados novos.
+    """
+    tarefa = st.session_state.get('tarefa_processamento')
+    if tarefa is None:
+        return
+    executor = obter_executor_tarefas()
+    status = executor.status(tarefa["id"])
+    if status is None:
+        # Tarefa perdida (ex.: servidor reiniciado)
+        del st.session_state['tarefa_processamento']
+        st.rerun()
+    estado = status.instantaneo()
     
-    if negocio != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Negócio'] == negocio]
-    if grupo != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Grupo'] == grupo]
-    if subgrupo != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Subgrupo'] == subgrupo]
-    if cliente != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Nome Cliente'] == cliente]
-    if consultor != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['Último Consultor'] == consultor]
+    if not status.finalizada:
+        texto = "Cancelando..." if estado["cancelamento_pedido"] else \
+            f"Processando dados: {ETAPAS_PROCESSAMENTO.get(estado['etapa'], 'na fila')} ({estado['segundos']:.0f} s)"
+        st.progress(estado["progresso"], text=texto)
+        if estado["mensagens"]:
+            st.caption(estado["mensagens"][-1][0])
+        st.button("Cancelar processamento", key="cancelar_processamento", disabled=estado["cancelamento_pedido"],
+                  on_click=executor.cancelar, args=(tarefa["id"],))
+        return
     
-    return df_filtrado
+    # Tarefa finalizada: retira o resultado do executor e atualiza a página inteira
+    del st.session_state['tarefa_processamento']
+    executor.descartar(tarefa["id"])
+    if status.estado == CONCLUIDA:
+        df_final, perfil_processamento = status.resultado
+        if concluir_processamento(df_final, perfil_processamento, tarefa["dados_abc"]):
+            estado["mensagens"].append(
+                (f"Processamento concluído! {len(df_final)} registros disponíveis para análise.", "sucesso"))
+        else:
+            estado["mensagens"].append(("Não foi possível processar os dados corretamente.", "erro"))
+    elif status.estado == CANCELADA:
+        estado["mensagens"].append(("Processamento cancelado.", "aviso"))
+    else:
+        estado["mensagens"].append((f"Erro no processamento de dados: {status.erro}", "erro"))
+    st.session_state.ultima_tarefa_processamento = estado
+    st.rerun()
 
-@st.cache_data(ttl=600)
-def ordenar_dataframe(df, coluna, ascendente=True):
-    """Ordena o dataframe pela coluna especificada"""
-    return df.sort_values(by=coluna, ascending=ascendente)
 
+def obter_indice_filtros(df):
+    """Índice de filtros do dataframe, construído uma vez por conjunto de dados e guardado na sessão"""
+    guardado = st.session_state.get('indice_filtros')
+    colunas = [col for col in COLUNAS_FILTRO if col in df.columns]
+    if guardado is None or guardado[0] is not df or list(guardado[1].colunas) != colunas:
+        st.session_state.indice_filtros = (df, IndiceFiltros(df))
+    return st.session_state.indice_filtros[1]
 
+def filtrar_posicoes(df, negocio, grupo, subgrupo, cliente, consultor, indice=None):
+    """
+    Posições (iloc) das linhas que atendem aos critérios selecionados.
+    
+    As linhas são localizadas pelo índice de filtros, sem percorrer nem copiar o dataframe.
+    
+    Args:
+        df: DataFrame final
+        negocio, grupo, subgrupo, cliente, consultor: Valores dos filtros ('Todos' não filtra)
+        indice: IndiceFiltros de df (por padrão, o guardado na sessão)
+    """
+    if indice is None:
+        indice = obter_indice_filtros(df)
+    return indice.filtrar({
+        'Negócio': negocio, 'Grupo': grupo, 'Subgrupo': subgrupo,
+        'Nome Cliente': cliente, 'Último Consultor': consultor,
+    })
 
+def filtrar_dataframe(df, negocio, grupo, subgrupo, cliente, consultor, indice=None):
+    """Filtra o dataframe com base nos critérios selecionados (extrai as linhas de filtrar_posicoes)"""
+    return df.iloc[filtrar_posicoes(df, negocio, grupo, subgrupo, cliente, consultor, indice)]
 
-# Helper functions
-def classificar_clientes_abc(df):
-    """Classifica os clientes conforme análise ABC baseada no valor orçado."""
-    try:
-        st.write("Iniciando classificação ABC de clientes...")
-        
-        # Verificar se temos as colunas necessárias
-        if "Cliente" not in df.columns or "Valor Orçado" not in df.columns:
-            st.warning("Não é possível realizar classificação ABC: Colunas 'Cliente' ou 'Valor Orçado' ausentes.")
-            # Retornar um DataFrame vazio com as colunas necessárias
-            return pd.DataFrame(columns=["Cliente", "ABC", "UF", "Cidade", "Valor Total Orçado"])
-        
-        # Agrupar valores por cliente
-        df_clientes = df.groupby("Cliente").agg({
-            "Valor Orçado": "sum",
-            "Nome Cliente": "first",
-            "UF": "first" if "UF" in df.columns else lambda x: "",
-            "Cidade": "first" if "Cidade" in df.columns else lambda x: ""
-        }).reset_index()
-        
-        # Renomear colunas
-        df_clientes = df_clientes.rename(columns={"Valor Orçado": "Valor Total Orçado"})
-        
-        # Ordenar por valor total (decrescente)
-        df_clientes = df_clientes.sort_values("Valor Total Orçado", ascending=False)
-        
-        # Calcular valor total e percentuais
-        valor_total = df_clientes["Valor Total Orçado"].sum()
-        
-        if valor_total == 0:
-            st.warning("Valor total orçado é zero. Não é possível fazer classificação ABC.")
-            df_clientes["ABC"] = "C"
-            df_clientes["Percentual"] = 0
-            df_clientes["Percentual Acumulado"] = 0
-            return df_clientes
-        
-        df_clientes["Percentual"] = df_clientes["Valor Total Orçado"] / valor_total * 100
-        df_clientes["Percentual Acumulado"] = df_clientes["Percentual"].cumsum()
-        
-        # Classificação ABC
-        df_clientes["ABC"] = "C"
-        df_clientes.loc[df_clientes["Percentual Acumulado"] <= 80, "ABC"] = "A"
-        df_clientes.loc[(df_clientes["Percentual Acumulado"] > 80) & 
-                       (df_clientes["Percentual Acumulado"] <= 95), "ABC"] = "B"
-        
-        # Formatação final
-        df_clientes['Ranking'] = df_clientes['Valor Total Orçado'].rank(ascending=False, method='min').astype(int)
-        
-        st.success(f"Classificação ABC concluída: {len(df_clientes)} clientes classificados")
-        
-        return df_clientes
+ROTULOS_FILTRO = {
+    'Negócio': 'Negócio', 'Grupo': 'Grupo', 'Subgrupo': 'Subgrupo',
+    'Nome Cliente': 'Cliente', 'Último Consultor': 'Consultor',
+}
+
+def exibir_filtros(df):
+    """
+    Mostra os filtros na barra lateral com opções dependentes.
     
-    except Exception as e:
-        st.error(f"Erro ao processar classificação ABC: {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return pd.DataFrame(columns=["Cliente", "ABC", "UF", "Cidade", "Valor Total Orçado"])
+    Cada filtro lista apenas os valores que ainda retornam linhas com os demais filtros,
+    com o número de linhas ao lado; as contagens vêm do índice de filtros (IndiceFiltros.facetas).
+    
+    Returns:
+        Dicionário {coluna: valor selecionado} ('Todos' não filtra)
+    """
+    indice = obter_indice_filtros(df)
+    colunas = list(indice.colunas)
+    filtros = {col: st.session_state.get(f"filtro_{col}", TODOS) for col in colunas}
+    
+    # Uma seleção que deixou de retornar linhas com os demais filtros volta para 'Todos'
+    for _ in range(len(colunas)):
+        facetas = indice.facetas(filtros)
+        invalidos = [col for col, valor in filtros.items() if valor != TODOS and valor not in facetas[col].index]
+        if not invalidos:
+            break
+        for col in invalidos:
+            filtros[col] = TODOS
+            st.session_state[f"filtro_{col}"] = TODOS
     
+    with st.sidebar.expander("🔎 Filtros", expanded=True):
+        for col in colunas:
+            contagens = facetas[col]
+            rotulos = {TODOS: f"{TODOS} ({int(contagens.sum()):,})"}
+            rotulos.update({valor: f"{valor if valor != '' else '(sem classificação)'} ({n:,})"
+                            for valor, n in zip(contagens.index, contagens.to_numpy())})
+            st.selectbox(ROTULOS_FILTRO.get(col, col), list(rotulos), key=f"filtro_{col}", format_func=rotulos.get)
     
+    return {col: st.session_state[f"filtro_{col}"] for col in colunas}
+
+def obter_indice_ordenacao(df):
+    """Permutações de ordenação do dataframe, guardadas na sessão e calculadas uma vez por coluna"""
+    guardado = st.session_state.get('indice_ordenacao')
+    if guardado is None or guardado[0] is not df or guardado[1] != list(df.columns):
+        st.session_state.indice_ordenacao = (df, list(df.columns), IndiceOrdenacao(df))
+    return st.session_state.indice_ordenacao[2]
+
+def obter_curvas_abc():
+    """Curvas ABC por segmento e medida do último processamento, calculadas uma vez e guardadas na sessão"""
+    dados = st.session_state.get('dados_abc')
+    if dados is None:
+        return None
+    guardado = st.session_state.get('curvas_abc')
+    if guardado is None or guardado[0] is not dados:
+        df_analise, df_categorias, limpar = dados
+        if limpar:
+            df_analise = limpar_analise(df_analise)
+        dim_produtos, _ = construir_dimensao_produtos(df_categorias)
+        st.session_state.curvas_abc = (dados, CurvasABC(df_analise, dim_produtos))
+    return st.session_state.curvas_abc[1]
+
+def obter_abc_janela_movel(meses_janela, limite_a, limite_b):
+    """Matriz cliente × mês da classe ABC em janela móvel, guardada na sessão para os mesmos parâmetros"""
+    dados = st.session_state.get('dados_abc')
+    if dados is None:
+        return None
+    chave = (meses_janela, limite_a, limite_b)
+    guardado = st.session_state.get('abc_janela_movel')
+    if guardado is None or guardado[0] is not dados or guardado[1] != chave:
+        df_analise, _, limpar = dados
+        if limpar:
+            df_analise = limpar_analise(df_analise)
+        st.session_state.abc_janela_movel = (dados, chave, abc_janela_movel(df_analise, meses_janela,
+                                                                            limite_a=limite_a, limite_b=limite_b))
+    return st.session_state.abc_janela_movel[2]
+
+def ordenar_dataframe(df, coluna, ascendente=True):
+    """Ordena o dataframe pela coluna especificada (usa a permutação pré-calculada da coluna)"""
+    return df.iloc[obter_indice_ordenacao(df).permutacao(coluna, ascendente)]
+
+
 
+
+# Helper functions
 def juntar_categorias_produtos(df, df_categorias):
-    """Realiza junção dos dados de produtos com suas categorias."""
+    """
+    Realiza junção dos dados de produtos com suas categorias.
+    
+    Args:
+        df: DataFrame com a coluna "Código Produto"
+        df_categorias: DataFrame de categorias ou ProductDimension já construída
+    """
     try:
-        df_categorias_slim = df_categorias[["Código Produto", "Negócio", "Grupo", "Subgrupo"]]
-        return pd.merge(df, df_categorias_slim, on="Código Produto", how="left")
+        if isinstance(df_categorias, ProductDimension):
+            dim_produtos = df_categorias
+        else:
+            dim_produtos = ProductDimension(df_categorias)
+        
+        df_info_produto = dim_produtos.buscar(df["Código Produto"], ["Negócio", "Grupo", "Subgrupo"])
+        df_info_produto.index = df.index
+        return pd.concat([df, df_info_produto], axis=1)
     except Exception as e:
         st.error(f"Erro ao juntar categorias: {e}")
         return df
 
-@st.cache_data(ttl=600)
 def paginar_dataframe(df, page, items_per_page):
-    """Retorna apenas os dados da página solicitada"""
+    """Retorna apenas os dados da página solicitada (fatia do dataframe, sem cópia)"""
     start_idx = (page - 1) * items_per_page
-    end_idx = min(start_idx + items_per_page, len(df))
-    return df.iloc[start_idx:end_idx].copy()
+    return df.iloc[start_idx:start_idx + items_per_page]
 
 
 def diagnosticar_dados(df):
@@ -536,7 +496,7 @@ def diagnosticar_dados(df):
     if "Dt Entrada" in df.columns and not pd.api.types.is_datetime64_dtype(df["Dt Entrada"]):
         problemas.append("Coluna 'Dt Entrada' não está no formato datetime")
     
-    if "Valor Orçado" in df.columns:
+    if "Valor Orçado" in df.columns and not pd.api.types.is_numeric_dtype(df["Valor Orçado"]):
         try:
             pd.to_numeric(df["Valor Orçado"], errors='raise')
         except:
@@ -560,55 +520,8 @@ def diagnosticar_dados(df):
 def limpar_dataframe(df):
     """Limpa e prepara o dataframe para processamento."""
     try:
-        linhas_originais = len(df)
-        colunas_originais = len(df.columns)
-        
-        st.write(f"Iniciando limpeza de dados: {linhas_originais} linhas × {colunas_originais} colunas")
-        
-        # 1. Remover colunas vazias ou com nomes problemáticos
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]  # Remove colunas 'Unnamed'
-        
-        # 2. Renomear colunas duplicadas para evitar ambiguidades
-        # Encontrar colunas com .1, .2, etc. e substituir pelos nomes principais
-        rename_cols = {}
-        for col in df.columns:
-            if re.search(r'\.\d+$', col):
-                base_name = re.sub(r'\.\d+$', '', col)
-                # Se a coluna base já existe, vamos manter a duplicata com outro nome
-                if base_name in df.columns:
-                    continue
-                else:
-                    rename_cols[col] = base_name
-        
-        # Aplicar renomeação
-        df = df.rename(columns=rename_cols)
-        
-        # 3. Identificar colunas essenciais
-        colunas_essenciais = ["Cliente", "Código Produto", "Dt Entrada", "Valor Orçado"]
-        
-        # 4. Filtrar linhas com dados essenciais (remover linhas onde todas as colunas essenciais são nulas)
-        df_limpo = df.dropna(subset=[col for col in colunas_essenciais if col in df.columns], how='all')
-        
-        # 5. Preencher valores ausentes
-        if "Valor Orçado" in df_limpo.columns:
-            df_limpo["Valor Orçado"] = df_limpo["Valor Orçado"].fillna(0)
-        
-        if "Prob.Fech." in df_limpo.columns:
-            df_limpo["Prob.Fech."] = df_limpo["Prob.Fech."].fillna(0)
-        
-        # 6. Converter tipos de dados
-        if "Dt Entrada" in df_limpo.columns:
-            df_limpo["Dt Entrada"] = pd.to_datetime(df_limpo["Dt Entrada"], errors='coerce')
-        
-        # 7. Remover linhas duplicadas
-        df_limpo = df_limpo.drop_duplicates(subset=[col for col in ["Cliente", "Código Produto", "Dt Entrada"] 
-                                                  if col in df_limpo.columns])
-        
-        # Relatório de limpeza
-        linhas_removidas = linhas_originais - len(df_limpo)
-        colunas_removidas = colunas_originais - len(df_limpo.columns)
-        
-        st.success(f"Limpeza concluída: {linhas_removidas} linhas removidas, {colunas_removidas} colunas removidas")
+        st.write(f"Iniciando limpeza de dados: {len(df)} linhas × {len(df.columns)} colunas")
+        df_limpo = limpar_analise(df, ao_informar=informar_streamlit)
         st.write(f"DataFrame limpo: {len(df_limpo)} linhas × {len(df_limpo.columns)} colunas")
         
         # Mostrar informações sobre o DF limpo
@@ -638,6 +551,9 @@ def verificar_estrutura_excel(arquivo):
     """
     Verifica a estrutura de um arquivo Excel para identificar problemas de formatação.
     
+    A inspeção lê apenas as primeiras linhas, direto dos bytes em memória e em modo somente
+    leitura, e é memorizada pelo conteúdo do arquivo para ser reaproveitada pelo carregamento.
+    
     Args:
         arquivo: Caminho do arquivo ou objeto de arquivo
         
@@ -645,57 +561,7 @@ def verificar_estrutura_excel(arquivo):
         Informações sobre a estrutura do arquivo
     """
     try:
-        # Criar um dicionário para armazenar informações
-        info = {}
-        
-        # Se for um arquivo carregado pelo Streamlit, precisamos criar uma cópia temporária
-        if hasattr(arquivo, 'read'):
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                tmp.write(arquivo.getvalue())
-                tmp_path = tmp.name
-                arquivo_path = tmp_path
-        else:
-            arquivo_path = arquivo
-        
-        # Usar openpyxl para examinar o arquivo mais detalhadamente
-        import openpyxl
-        wb = openpyxl.load_workbook(arquivo_path, data_only=True)
-        sheet = wb.active
-        
-        # Obter informações básicas
-        info['total_rows'] = sheet.max_row
-        info['total_cols'] = sheet.max_column
-        
-        # Verificar as primeiras linhas para entender a estrutura
-        first_rows = []
-        for i in range(1, min(6, sheet.max_row + 1)):
-            row = []
-            for j in range(1, min(11, sheet.max_column + 1)):
-                cell_value = sheet.cell(row=i, column=j).value
-                row.append(str(cell_value) if cell_value is not None else '')
-            first_rows.append(row)
-        
-        info['first_rows'] = first_rows
-        
-        # Sugerir qual linha deve ser o cabeçalho
-        # Geralmente é a primeira linha, mas podemos tentar detectar automaticamente
-        header_candidates = []
-        for i in range(0, min(5, len(first_rows))):
-            row = first_rows[i]
-            # Verificar se parece um cabeçalho (não tem valores numéricos, etc)
-            is_header = all(not str(cell).replace('.', '').isdigit() for cell in row if cell)
-            if is_header:
-                header_candidates.append(i)
-        
-        info['suggested_header'] = header_candidates[0] if header_candidates else 0
-        
-        # Limpar arquivos temporários
-        if hasattr(arquivo, 'read') and 'tmp_path' in locals():
-            import os
-            os.unlink(tmp_path)
-        
-        return info
+        return inspecionar_xlsx(arquivo)
         
     except Exception as e:
         st.error(f"Erro ao verificar estrutura do arquivo: {str(e)}")
@@ -704,20 +570,14 @@ def verificar_estrutura_excel(arquivo):
         return {"error": str(e)}
     
     
-# Adicione estas funções auxiliares
-def formatar_tupla_dados(tupla_dados):
-    """Formata a tupla de dados para exibição legível"""
-    if isinstance(tupla_dados, (list, tuple)):
-        return '\n\n'.join(map(str, tupla_dados))
-    return str(tupla_dados)
-
 def converter_listas_para_visualizacao(df):
-    """Converte colunas de listas para formato legível no Streamlit"""
-    df_viz = df.copy()
-    for col in df.columns:
-        if isinstance(df[col].iloc[0], list):
-            df_viz[col] = df_viz[col].apply(lambda x: ', '.join(map(str, x)) if isinstance(x, list) else x)
-    return df_viz
+    """
+    Formata valores, percentuais, datas e listas para exibição no Streamlit.
+    
+    Use apenas sobre as linhas exibidas: os dados continuam numéricos e tipados (e o
+    histórico em listas Arrow) e só são formatados como texto na hora de mostrar.
+    """
+    return formatar_exibicao(df)
 
 
 
@@ -780,13 +640,20 @@ def verificar_compatibilidade_dataframes(df_analise, df_categorias):
 st.sidebar.header("Upload de Arquivos")
 # Expandir opções avançadas
 with st.sidebar.expander("Opções avançadas de carregamento", expanded=True):
-    header_analise = st.number_input("Cabeçalho do arquivo de análise (linha):", 0, 10, 0)
+    header_analise = st.number_input("Cabeçalho do arquivo de análise (linha):", 0, 10, 0, key="header_analise")
     header_categorias = st.number_input("Cabeçalho do arquivo de categorias (linha):", 0, 10, 0)
+    limpar_dados = st.checkbox("Limpar dados antes do processamento", value=False,
+                               help="Remove colunas 'Unnamed', linhas vazias e linhas duplicadas "
+                                    "(Cliente, Código Produto, Dt Entrada)")
+    estatisticas = estatisticas_cache()
+    st.caption(f"Cache de planilhas: {estatisticas['acertos']} acertos, {estatisticas['falhas']} falhas, "
+               f"{estatisticas['remocoes']} remoções")
 
 arquivo_analise = st.sidebar.file_uploader("Arquivo de Análise Comercial", type=["xlsx"])
 arquivo_categorias = st.sidebar.file_uploader("Arquivo de Classificação de Produtos", type=["xlsx"])
 
 # Adicione aqui o controle para amostras menores
+max_linhas = None
 with st.sidebar.expander("Configurações de Desenvolvimento", expanded=False):
     modo_dev = st.checkbox("Modo desenvolvimento (limitar dados)", value=False)
     if modo_dev:
@@ -802,8 +669,18 @@ if arquivo_analise is not None and arquivo_categorias is not None:
     # Load data using the proper header rows
     with st.spinner("Carregando arquivos..."):
         # Usar a nova função com os cabeçalhos definidos pelo usuário
-        df_analise = carregar_excel_corretamente(arquivo_analise, header_row=header_analise)
-        df_categorias = carregar_excel_corretamente(arquivo_categorias, header_row=header_categorias)
+        perfil_carga = []
+        with medir_etapa("carregar_analise", perfil_carga) as medicao:
+            # No modo desenvolvimento só as primeiras max_linhas linhas são lidas do arquivo
+            df_analise = carregar_excel_corretamente(arquivo_analise, header_row=header_analise,
+                                                     colunas=COLUNAS_ANALISE, esquema=ESQUEMA_ANALISE,
+                                                     max_linhas=max_linhas)
+            medicao["linhas_saida"] = 0 if df_analise is None else len(df_analise)
+        with medir_etapa("carregar_categorias", perfil_carga) as medicao:
+            df_categorias = carregar_excel_corretamente(arquivo_categorias, header_row=header_categorias,
+                                                        esquema=ESQUEMA_CATEGORIAS)
+            medicao["linhas_saida"] = 0 if df_categorias is None else len(df_categorias)
+        st.session_state.perfil_carga = perfil_carga
         
         if arquivo_analise is not None:
             
@@ -818,25 +695,34 @@ if arquivo_analise is not None and arquivo_categorias is not None:
                 st.subheader("Verificação de compatibilidade")
                 verificar_compatibilidade_dataframes(df_analise, df_categorias)
             
-            # Limitar dados se estiver em modo desenvolvedor
+            # Dados limitados na leitura se estiver em modo desenvolvedor
             if modo_dev:
-                df_analise = df_analise.head(max_linhas)
                 st.info(f"Modo desenvolvimento: processando apenas {len(df_analise)} linhas")
             
             # Opção para continuar com o processamento
             # Após o processamento dos dados
-            if st.button("Processar dados"):
-                with st.spinner("Processando dados..."):
-                    df_final = processar_dados(df_analise, df_categorias)
-                    if df_final is not None and len(df_final) > 0:
-                        st.session_state.df_final = df_final
-                        st.success(f"Processamento concluído! {len(df_final)} registros disponíveis para análise.")
-                        
-                        # Não use experimental_rerun() - ele interrompe o fluxo
-                        # Em vez disso, defina uma flag para mostrar as tabs na mesma execução
-                        st.session_state.mostrar_tabs = True
-                    else:
-                        st.error("Não foi possível processar os dados corretamente.")
+            # O processamento roda em segundo plano (tarefas.ExecutorTarefas): a página continua
+            # respondendo e o progresso é acompanhado por um fragmento atualizado periodicamente
+            em_andamento = st.session_state.get('tarefa_processamento') is not None
+            if st.button("Processar dados", disabled=em_andamento):
+                st.session_state.pop('ultima_tarefa_processamento', None)
+                id_tarefa = obter_executor_tarefas().submeter(
+                    processar_em_segundo_plano, df_analise, df_categorias, limpar_dados,
+                    descricao="Processar dados",
+                    incremental=st.session_state.setdefault('processamento_incremental',
+                                                            ProcessamentoIncremental()))
+                st.session_state.tarefa_processamento = {
+                    "id": id_tarefa, "dados_abc": (df_analise, df_categorias, limpar_dados)}
+            if st.session_state.get('tarefa_processamento') is not None:
+                acompanhar_processamento()
+            
+            # Mensagens da última tarefa de processamento (avisos do pipeline e resultado)
+            ultima_tarefa = st.session_state.get('ultima_tarefa_processamento')
+            if ultima_tarefa is not None:
+                with st.expander("Mensagens do processamento",
+                                 expanded=ultima_tarefa["estado"] != CONCLUIDA):
+                    for mensagem, nivel in ultima_tarefa["mensagens"]:
+                        informar_streamlit(mensagem, nivel)
 
             # Modificar a verificação para exibir as abas
             if ('df_final' in st.session_state and not st.session_state.df_final.empty) or \
@@ -872,9 +758,11 @@ if arquivo_analise is not None and arquivo_categorias is not None:
                         # Sugerir o cabeçalho
                         st.info(f"Linha sugerida para cabeçalho: {estrutura.get('suggested_header', 0)}")
                         
-                        # Adicionar botão para usar esta sugestão
-                        if st.button("Usar linha sugerida como cabeçalho"):
-                            header_analise = estrutura.get('suggested_header', 0)
+                        # Adicionar botão para usar esta sugestão (aplicada ao campo de cabeçalho
+                        # antes da próxima execução, reaproveitando esta mesma inspeção)
+                        st.button("Usar linha sugerida como cabeçalho",
+                                  on_click=st.session_state.update,
+                                  kwargs={"header_analise": estrutura.get('suggested_header', 0)})
     
     if df_analise is not None and df_categorias is not None:
         # Mostrar diagnóstico inicial
@@ -892,9 +780,8 @@ if arquivo_analise is not None and arquivo_categorias is not None:
             st.subheader("Colunas do arquivo de categorias")
             st.write(df_categorias.columns.tolist())
         
-        # Limitar dados se estiver em modo desenvolvedor
+        # Dados limitados na leitura se estiver em modo desenvolvedor
         if modo_dev:
-            df_analise = df_analise.head(max_linhas)
             st.info(f"Modo desenvolvimento: processando apenas {len(df_analise)} linhas")
         
         # Adicionar botão para iniciar o processamento
@@ -943,6 +830,16 @@ if arquivo_analise is not None and arquivo_categorias is not None:
             st.write(f"Dimensões: {df_categorias.shape[0]} linhas x {df_categorias.shape[1]} colunas")
             st.write(f"Colunas: {', '.join(map(str, df_categorias.columns))}")
 
+            # Memória antes e depois da aplicação dos tipos declarados (esquema_dados)
+            st.subheader("Memória por coluna")
+            for rotulo, df_memoria in [("Análise", df_analise), ("Categorias", df_categorias)]:
+                relatorio = relatorio_memoria(df_memoria)
+                if len(relatorio) > 0:
+                    total = relatorio.iloc[-1]
+                    st.write(f"**{rotulo}:** {total['Antes (MB)']:.1f} MB → {total['Depois (MB)']:.1f} MB "
+                             f"({total['Redução (%)']:.0f}% de redução)")
+                    st.dataframe(relatorio.round(2), hide_index=True)
+
 # Substitua o bloco de código onde aparecem as abas com este código:
 
 # Tabs system - only show if data has been processed
@@ -1022,11 +919,18 @@ if df_final is not None or ('df_final' in st.session_state and st.session_state.
             
             # 4. Visualizar as primeiras linhas
             st.write("**Primeiras 5 linhas:**")
-            st.dataframe(df_final.head())
+            st.dataframe(converter_listas_para_visualizacao(df_final.head()))
+            
+            # Memória do histórico compacto em relação às antigas listas Python
+            memoria = comparar_memoria(df_final)
+            if memoria["bytes_listas"] > 0:
+                st.write(f"**Memória do histórico:** {memoria['bytes_compacto'] / 1024**2:,.1f} MB "
+                         f"(como listas Python: ~{memoria['bytes_listas'] / 1024**2:,.1f} MB, "
+                         f"redução de {memoria['reducao']:.0%})")
             
             # 5. Verificar tipos de dados
             st.write("**Tipos de dados:**")
-            tipos = df_final.dtypes.reset_index()
+            tipos = df_final.dtypes.astype(str).reset_index()
             tipos.columns = ["Coluna", "Tipo"]
             st.dataframe(tipos)
             
@@ -1098,8 +1002,49 @@ if df_final is not None or ('df_final' in st.session_state and st.session_state.
         with col4:
             st.metric("Clientes A", len(df_final[df_final["ABC"] == "A"]["Cliente"].unique()))
         
-        # Resto do conteúdo da primeira aba...
-        # [Mantenha o código existente para filtros, etc.]
+        # Filtros da barra lateral e linhas selecionadas
+        filtros = exibir_filtros(df_final)
+        posicoes = obter_indice_filtros(df_final).filtrar(filtros)
+        st.write(f"**{len(posicoes):,} registros** com os filtros selecionados")
+        
+        # Ordenação e paginação sobre as posições: só a página exibida é montada e enviada
+        indice_ordenacao = obter_indice_ordenacao(df_final)
+        col_ordem, col_direcao, col_itens, col_pagina = st.columns([3, 2, 2, 2])
+        with col_ordem:
+            coluna_ordem = st.selectbox("Ordenar por", [None] + indice_ordenacao.colunas, key="coluna_ordem",
+                                        format_func=lambda col: "(ordem original)" if col is None else col)
+        with col_direcao:
+            ascendente = st.radio("Direção", ["Crescente", "Decrescente"], horizontal=True,
+                                  key="direcao_ordem") == "Crescente"
+        with col_itens:
+            itens_por_pagina = st.selectbox("Linhas por página", [25, 50, 100, 200], index=1, key="itens_pagina")
+        n_paginas = total_paginas(len(posicoes), itens_por_pagina)
+        with col_pagina:
+            pagina = st.number_input(f"Página (de {n_paginas:,})", min_value=1, max_value=n_paginas,
+                                     value=min(st.session_state.get('pagina_dados', 1), n_paginas))
+        st.session_state.pagina_dados = pagina
+        
+        colunas_exibidas = st.multiselect(
+            "Colunas exibidas", df_final.columns.tolist(),
+            default=[col for col in colunas_essenciais if col in df_final.columns], key="colunas_exibidas")
+        
+        ordem = indice_ordenacao.ordenar(posicoes, coluna_ordem, ascendente)
+        st.dataframe(preparar_pagina(df_final, paginar(ordem, pagina, itens_por_pagina), colunas_exibidas))
+        
+        # Exportação das linhas filtradas, na ordem escolhida (gerada em memória só ao baixar)
+        col_formato, col_exportar = st.columns([2, 7])
+        with col_formato:
+            formato_exportacao = st.selectbox("Formato de exportação", list(FORMATOS), key="formato_exportacao")
+        nome_exportacao, mime_exportacao = nome_arquivo(
+            df_final, formato_exportacao, f"analise_comercial_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        with col_exportar:
+            st.download_button(
+                f"Exportar {len(posicoes):,} registros",
+                data=lambda: exportar(df_final.iloc[ordem], formato_exportacao),
+                file_name=nome_exportacao,
+                mime=mime_exportacao,
+                key="exportar_dados"
+            )
 
     # === SEGUNDA ABA: ANÁLISE ESTATÍSTICA ===
     elif current_tab == "Análise Estatística":
@@ -1109,7 +1054,50 @@ if df_final is not None or ('df_final' in st.session_state and st.session_state.
     # === TERCEIRA ABA: ANÁLISE AVANÇADA ===
     elif current_tab == "Análise Avançada":
         st.header("Análise Avançada")
-        # ...resto do código da tab3...
+        
+        # Classificação ABC por segmento e medida: as curvas são calculadas uma vez e os
+        # limites do slider só fazem uma busca binária sobre elas
+        curvas_abc = obter_curvas_abc()
+        if curvas_abc is None:
+            st.info("Processe os dados para ver a classificação ABC por segmento.")
+        else:
+            st.subheader("Classificação ABC por segmento")
+            col_segmento, col_medida = st.columns(2)
+            with col_segmento:
+                segmento_abc = st.selectbox("Segmento", curvas_abc.segmentos, key="abc_segmento",
+                                            format_func=lambda segmento: GERAL if segmento is None else segmento)
+            with col_medida:
+                medida_abc = st.radio("Medida", list(MEDIDAS), format_func=MEDIDAS.get, horizontal=True,
+                                      key="abc_medida")
+            limite_a, limite_b = st.slider("Limites das faixas A e B (% acumulado)", 1, 99,
+                                           (LIMITE_A, LIMITE_B), key="abc_limites")
+            
+            resumo_abc = curvas_abc.resumo(segmento_abc, medida_abc, limite_a, limite_b)
+            st.dataframe(formatar_exibicao(resumo_abc, {col: "percentual" for col in resumo_abc.columns
+                                                        if col.startswith("%")}), hide_index=True)
+            
+            df_abc = curvas_abc.classificar(segmento_abc, medida_abc, limite_a, limite_b)
+            if segmento_abc is not None:
+                valor_segmento = st.selectbox(f"Clientes de {segmento_abc}", curvas_abc.curvas[(segmento_abc, medida_abc)]["rotulos"],
+                                              key="abc_valor_segmento")
+                df_abc = df_abc[df_abc["Segmento"] == valor_segmento]
+            st.write(f"**{len(df_abc):,} clientes** (mostrando os 500 primeiros)")
+            st.dataframe(formatar_exibicao(df_abc.head(500)), hide_index=True)
+            
+            # Evolução da classe de cada cliente: ABC da janela móvel avaliado a cada mês
+            st.subheader("Evolução da classe ABC (janela móvel)")
+            meses_janela = st.slider("Janela (meses)", 1, 36, 12, key="abc_meses_janela")
+            matriz_abc = obter_abc_janela_movel(meses_janela, limite_a, limite_b)
+            if matriz_abc is None or matriz_abc.empty:
+                st.info("Sem datas de entrada válidas para a análise em janela móvel.")
+            else:
+                contagem_classes = matriz_abc.apply(lambda coluna: coluna.value_counts()).reindex(["A", "B", "C"]).fillna(0)
+                contagem_classes.columns = contagem_classes.columns.astype(str)
+                st.line_chart(contagem_classes.T)
+                st.write(f"**Classe por mês** ({matriz_abc.shape[0]:,} clientes; mostrando os 500 primeiros)")
+                matriz_exibida = matriz_abc.head(500)
+                matriz_exibida.columns = matriz_exibida.columns.astype(str)
+                st.dataframe(matriz_exibida)
 
     # === QUARTA ABA: PROPOSTAS PENDENTES ===
     elif current_tab == "Propostas Pendentes":
@@ -1118,3 +1106,36 @@ if df_final is not None or ('df_final' in st.session_state and st.session_state.
 
 else:
     st.info("Por favor, faça o upload dos arquivos de dados para visualizar a análise comercial.")
+
+
+# Painel de perfil: tempo, CPU, memória e linhas de cada etapa da última execução
+with st.sidebar.expander("⏱️ Perfil de execução", expanded=False):
+    perfil_execucao = st.session_state.get('perfil_carga', []) + st.session_state.get('perfil_processamento', [])
+    if not perfil_execucao:
+        st.caption("Nenhuma etapa medida ainda. Carregue os arquivos e processe os dados.")
+    else:
+        st.dataframe(tabela_medicoes(perfil_execucao), hide_index=True)
+        st.caption("CPU da thread de cada etapa; a memória é a do processo inteiro e inclui a de "
+                   "outros processamentos em andamento ao mesmo tempo.")
+        if st.session_state.get('perfil_do_cache'):
+            st.caption("O último processamento veio do cache: apenas a carga dos arquivos foi medida.")
+    estatisticas_resultados = obter_cache_resultados().estatisticas()
+    st.caption(
+        f"Cache de resultados: {estatisticas_resultados['acertos']} acertos em memória, "
+        f"{estatisticas_resultados['acertos_disco']} relidos do disco, {estatisticas_resultados['falhas']} falhas, "
+        f"{estatisticas_resultados['despejos']} despejos; "
+        f"{estatisticas_resultados['calculos']} processamento(s) executado(s) e "
+        f"{estatisticas_resultados['coalescidas']} aproveitado(s) de outra sessão "
+        f"(coalescência de {estatisticas_resultados['taxa_coalescencia']:.0%}); "
+        f"{estatisticas_resultados['bytes_memoria'] / 1024 ** 2:.1f} de "
+        f"{estatisticas_resultados['limite_memoria_bytes'] / 1024 ** 2:.0f} MB em memória, "
+        f"{estatisticas_resultados['entradas_disco']} resultado(s) em disco"
+    )
+    if perfil_execucao:
+        st.download_button(
+            "Baixar perfil (JSON)",
+            medicoes_para_json(perfil_execucao, processamento_do_cache=st.session_state.get('perfil_do_cache', False),
+                               cache_resultados=estatisticas_resultados),
+            file_name="perfil_execucao.json",
+            mime="application/json",
+        )
@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+
+from esquema_dados import centavos_da_moeda, eh_moeda
+
+
+# Limites padrão da classificação ABC (percentual acumulado)
+LIMITE_A = 80
+LIMITE_B = 95
+
+# Segmentos em que os clientes podem ser classificados (None: base inteira)
+SEGMENTOS = ["Negócio", "Grupo", "UF", "Consultor Interno"]
+
+# Medidas de classificação e seus rótulos
+MEDIDAS = {
+    "valor": "Valor Orçado",
+    "orcamentos": "Orçamentos",
+    "produtos": "Produtos Distintos",
+}
+
+# Rótulo do segmento que representa a base inteira
+GERAL = "Geral"
+
+
+def valores_em_centavos(valores):
+    """Converte valores monetários para centavos inteiros (somas exatas e independentes da ordem)."""
+    if isinstance(valores, pd.Series) and eh_moeda(valores):
+        # Coluna tipada por esquema_dados: os centavos já estão guardados como inteiros
+        return centavos_da_moeda(valores)
+    valores = pd.to_numeric(pd.Series(valores), errors="coerce").fillna(0).to_numpy(dtype="float64")
+    return np.round(valores * 100).astype("int64")
+
+
+def _unicos(valores):
+    """Valores distintos ordenados (por ordenação: mais rápido que np.unique sem return_inverse)."""
+    ordenados = np.sort(valores)
+    distintos = np.ones(len(ordenados), dtype=bool)
+    distintos[1:] = ordenados[1:] != ordenados[:-1]
+    return ordenados[distintos]
+
+
+def participacao_acumulada(valores_ordenados, total):
+    """
+    Percentual acumulado de uma sequência já ordenada de forma decrescente.
+
+    A soma acumulada é feita sobre os valores (inteiros, quando em centavos) e dividida
+    uma única vez pelo total, sem acumular o erro de arredondamento dos percentuais.
+    """
+    return np.cumsum(valores_ordenados) / total * 100
+
+
+def classes_abc(acumulado, limite_a=LIMITE_A, limite_b=LIMITE_B):
+    """A até limite_a (inclusive), B até limite_b (inclusive) e C acima disso."""
+    return np.where(acumulado <= limite_a, "A", np.where(acumulado <= limite_b, "B", "C")).astype(object)
+
+
+class CurvasABC:
+    """
+    Curvas ABC de clientes por segmento e por medida, calculadas uma única vez.
+
+    Para cada segmento (a base inteira, Negócio, Grupo, UF e Consultor Interno) os
+    clientes são agrupados em uma única passada por (segmento, cliente), com as três
+    medidas: valor orçado (em centavos), número de orçamentos e produtos distintos. Os
+    clientes de cada valor de segmento são ordenados pela medida e a participação
+    acumulada fica guardada em um único array crescente por segmento/medida (valor do
+    segmento * 1000 + percentual acumulado).
+
+    Assim, mudar os limites A/B (ex.: um slider) é uma busca binária nesse array, que
+    devolve onde termina a faixa A e a faixa B em cada valor do segmento, sem recalcular
+    os agrupamentos.
+
+    Args:
+        df: DataFrame de análise comercial ("Cliente", "Valor Orçado", "Código Produto" e
+            as colunas dos segmentos)
+        dim_produtos: ProductDimension usada para obter Negócio e Grupo quando essas
+            colunas não estão em df
+        segmentos: Colunas de segmento (as ausentes são ignoradas)
+    """
+
+    def __init__(self, df, dim_produtos=None, segmentos=SEGMENTOS):
+        validas = df["Cliente"].notna().to_numpy()
+        df = df[validas]
+        codigos_cliente, self.clientes = pd.factorize(df["Cliente"], sort=True)
+        if "Código Produto" in df.columns:
+            codigos_produto, produtos = pd.factorize(df["Código Produto"])
+        else:
+            codigos_produto, produtos = np.zeros(len(df), dtype=np.intp), []
+        centavos = valores_em_centavos(df["Valor Orçado"])
+
+        # Segmentos de produto (Negócio, Grupo) buscados uma vez por produto distinto
+        de_produto = [segmento for segmento in segmentos if segmento not in df.columns
+                      and dim_produtos is not None and segmento in dim_produtos.colunas]
+        if de_produto:
+            categorias = dim_produtos.buscar(pd.Series(produtos), de_produto)
+        colunas_segmento = {}
+        for segmento in segmentos:
+            if segmento in df.columns:
+                colunas_segmento[segmento] = df[segmento].to_numpy()
+            elif segmento in de_produto:
+                # O código -1 (produto nulo) aponta para o None acrescentado no fim
+                por_produto = np.append(categorias[segmento].to_numpy(dtype=object), None)
+                colunas_segmento[segmento] = por_produto[codigos_produto]
+
+        self.segmentos = [None] + list(colunas_segmento)
+        self.curvas = {}
+        self._agrupar(None, np.zeros(len(df), dtype=np.intp), [GERAL], codigos_cliente, codigos_produto, centavos)
+        for segmento, valores in colunas_segmento.items():
+            codigos, rotulos = pd.factorize(valores, sort=True)
+            self._agrupar(segmento, codigos, list(rotulos), codigos_cliente, codigos_produto, centavos)
+
+    def _agrupar(self, segmento, codigos_segmento, rotulos, codigos_cliente, codigos_produto, centavos):
+        """Agrupa por (segmento, cliente) e monta as curvas do segmento para cada medida."""
+        validas = codigos_segmento >= 0
+        n_clientes = len(self.clientes)
+        chave = codigos_segmento[validas].astype(np.int64) * n_clientes + codigos_cliente[validas]
+        grupos, grupo_da_linha = np.unique(chave, return_inverse=True)
+
+        # Produtos distintos: pares (grupo, produto) únicos, ignorando produtos nulos
+        produtos = codigos_produto[validas]
+        n_produtos = int(produtos.max(initial=0)) + 1
+        com_produto = produtos >= 0
+        pares = _unicos(grupo_da_linha[com_produto].astype(np.int64) * n_produtos + produtos[com_produto])
+        medidas = {
+            "valor": np.bincount(grupo_da_linha, weights=centavos[validas], minlength=len(grupos)).astype(np.int64),
+            "orcamentos": np.bincount(grupo_da_linha, minlength=len(grupos)),
+            "produtos": np.bincount(pares // n_produtos, minlength=len(grupos)),
+        }
+        segmento_do_grupo = grupos // n_clientes
+        cliente_do_grupo = grupos % n_clientes
+
+        for medida, valores in medidas.items():
+            # Decrescente pela medida dentro de cada segmento; empates pelo código do cliente
+            ordem = np.lexsort((cliente_do_grupo, -valores, segmento_do_grupo))
+            seg = segmento_do_grupo[ordem]
+            val = valores[ordem]
+            totais = np.bincount(seg, weights=val, minlength=len(rotulos))
+            inicios = np.searchsorted(seg, np.arange(len(rotulos) + 1))
+            acumulado_global = np.cumsum(val)
+            antes = np.concatenate([[0], acumulado_global])[inicios[:-1]]
+            com_total = totais[seg] > 0
+            # Segmentos sem valor algum ficam inteiros na faixa C
+            acumulado = np.full(len(val), 100.0)
+            acumulado[com_total] = (acumulado_global[com_total] - antes[seg][com_total]) / totais[seg][com_total] * 100
+            self.curvas[(segmento, medida)] = {
+                "rotulos": rotulos,
+                "segmento": seg,
+                "cliente": cliente_do_grupo[ordem],
+                "medida": val,
+                "acumulado": acumulado,
+                "inicios": inicios,
+                # Crescente em todo o array: permite uma única busca binária para todos os segmentos.
+                # Com valores negativos (créditos, devoluções) o acumulado passa de 100 antes de
+                # voltar a 100 no fim do segmento; limitado a 100, segue crescente no segmento e
+                # continua C para qualquer limite até 100
+                "chave_busca": seg * 1000.0 + np.minimum(acumulado, 100.0),
+            }
+
+    def limites(self, segmento=None, medida="valor", limite_a=LIMITE_A, limite_b=LIMITE_B):
+        """
+        Posições (no array da curva) onde terminam as faixas A e B de cada valor do segmento.
+
+        Uma busca binária por limite, para todos os valores do segmento de uma vez.
+
+        Returns:
+            Tupla (fim_a, fim_b) com um elemento por valor do segmento
+        """
+        curva = self.curvas[(segmento, medida)]
+        base = np.arange(len(curva["rotulos"])) * 1000.0
+        fim_a = np.searchsorted(curva["chave_busca"], base + limite_a, side="right")
+        fim_b = np.searchsorted(curva["chave_busca"], base + limite_b, side="right")
+        return fim_a, fim_b
+
+    def resumo(self, segmento=None, medida="valor", limite_a=LIMITE_A, limite_b=LIMITE_B):
+        """
+        Quantidade de clientes A, B e C e participação de cada faixa por valor do segmento,
+        calculada só com a busca binária dos limites.
+        """
+        curva = self.curvas[(segmento, medida)]
+        fim_a, fim_b = self.limites(segmento, medida, limite_a, limite_b)
+        inicios, fins = curva["inicios"][:-1], curva["inicios"][1:]
+        acumulado = np.concatenate([[0.0], curva["acumulado"]])
+        # Percentual acumulado no fim de cada faixa (0 quando a faixa está vazia)
+        no_fim_a = np.where(fim_a > inicios, acumulado[fim_a], 0.0)
+        no_fim_b = np.where(fim_b > inicios, acumulado[fim_b], 0.0)
+        return pd.DataFrame({
+            "Segmento": curva["rotulos"],
+            "Clientes": fins - inicios,
+            "Clientes A": fim_a - inicios,
+            "Clientes B": fim_b - fim_a,
+            "Clientes C": fins - fim_b,
+            "% A": no_fim_a,
+            "% B": np.where(fim_b > fim_a, no_fim_b - no_fim_a, 0.0),
+            "% C": np.where(fins > fim_b, 100 - no_fim_b, 0.0),
+        })
+
+    def classificar(self, segmento=None, medida="valor", limite_a=LIMITE_A, limite_b=LIMITE_B):
+        """
+        Classificação ABC dos clientes de cada valor do segmento.
+
+        Returns:
+            DataFrame com "Segmento", "Cliente", a medida, "Percentual Acumulado", "ABC" e
+            "Ranking" (posição do cliente no segmento), ordenado por segmento e medida
+        """
+        curva = self.curvas[(segmento, medida)]
+        fim_a, fim_b = self.limites(segmento, medida, limite_a, limite_b)
+        seg = curva["segmento"]
+        posicao = np.arange(len(seg))
+        abc = np.where(posicao < fim_a[seg], "A", np.where(posicao < fim_b[seg], "B", "C")).astype(object)
+        # Ranking com empates na menor posição (como rank(method="min"))
+        novo_valor = np.ones(len(seg), dtype=bool)
+        novo_valor[1:] = (seg[1:] != seg[:-1]) | (curva["medida"][1:] != curva["medida"][:-1])
+        inicio_empate = np.maximum.accumulate(np.where(novo_valor, posicao, 0))
+        valores = curva["medida"] / 100 if medida == "valor" else curva["medida"]
+        return pd.DataFrame({
+            "Segmento": np.asarray(curva["rotulos"], dtype=object)[seg],
+            "Cliente": self.clientes[curva["cliente"]],
+            MEDIDAS[medida]: valores,
+            "Percentual Acumulado": curva["acumulado"],
+            "ABC": abc,
+            "Ranking": inicio_empate - curva["inicios"][seg] + 1,
+        })
+
+
+def abc_janela_movel(df, meses_janela=12, inicio=None, fim=None, limite_a=LIMITE_A, limite_b=LIMITE_B):
+    """
+    Classe ABC de cada cliente em uma janela móvel de meses (ex.: últimos 12 meses),
+    avaliada a cada mês.
+
+    Os valores são somados uma única vez em uma matriz cliente × mês (centavos) e acumulados
+    ao longo dos meses; o total de qualquer janela é a diferença entre duas colunas dessa
+    matriz de somas acumuladas. Todas as janelas são classificadas juntas: cada coluna é
+    ordenada de forma decrescente e a participação acumulada é comparada aos limites.
+    O resultado de cada mês é o mesmo de classificar_clientes_abc sobre as linhas da janela.
+
+    Args:
+        df: DataFrame com "Cliente", "Valor Orçado" e "Dt Entrada" (linhas sem data são ignoradas)
+        meses_janela: Tamanho da janela em meses, terminando no mês avaliado (inclusive)
+        inicio: Primeiro mês avaliado (ex.: "2022-12"); por padrão, o primeiro mês dos dados
+        fim: Último mês avaliado; por padrão, o último mês dos dados
+        limite_a: Percentual acumulado até o qual o cliente é A
+        limite_b: Percentual acumulado até o qual o cliente é B
+
+    Returns:
+        DataFrame cliente × mês (PeriodIndex mensal nas colunas) com "A", "B", "C" ou None
+        quando o cliente não tem orçamentos na janela
+    """
+    datas = pd.to_datetime(df["Dt Entrada"], errors="coerce")
+    validas = (datas.notna() & df["Cliente"].notna()).to_numpy()
+    if not validas.any():
+        return pd.DataFrame()
+    # Meses contados desde o ano 0 (ano * 12 + mês - 1), como inteiros
+    meses = (datas.dt.year.to_numpy()[validas] * 12 + datas.dt.month.to_numpy()[validas] - 1).astype(np.int64)
+    primeiro = pd.Period(year=int(meses.min() // 12), month=int(meses.min() % 12 + 1), freq="M")
+    ultimo = pd.Period(year=int(meses.max() // 12), month=int(meses.max() % 12 + 1), freq="M")
+
+    codigos_cliente, clientes = pd.factorize(df["Cliente"].to_numpy()[validas], sort=True)
+    codigos_mes = meses - meses.min()
+    n_clientes, n_meses = len(clientes), int(meses.max() - meses.min()) + 1
+
+    # Matrizes cliente × mês com uma coluna de zeros à esquerda: coluna k = soma dos meses < k
+    celula = codigos_cliente.astype(np.int64) * n_meses + codigos_mes
+    tamanho = n_clientes * n_meses
+    centavos = np.bincount(celula, weights=valores_em_centavos(df["Valor Orçado"])[validas],
+                           minlength=tamanho).astype(np.int64).reshape(n_clientes, n_meses)
+    contagens = np.bincount(celula, minlength=tamanho).reshape(n_clientes, n_meses)
+    soma_valores = np.zeros((n_clientes, n_meses + 1), dtype=np.int64)
+    soma_contagens = np.zeros((n_clientes, n_meses + 1), dtype=np.int64)
+    np.cumsum(centavos, axis=1, out=soma_valores[:, 1:])
+    np.cumsum(contagens, axis=1, out=soma_contagens[:, 1:])
+
+    avaliados = pd.period_range(inicio or primeiro, fim or ultimo, freq="M")
+    # Janela de cada mês avaliado: colunas [inicio, fim) da matriz (limitadas ao período dos dados)
+    fins = np.array([(mes - primeiro).n for mes in avaliados], dtype=np.int64) + 1
+    inicios = np.clip(fins - meses_janela, 0, n_meses)
+    fins = np.clip(fins, 0, n_meses)
+
+    # Totais de todas as janelas de uma vez (cliente × mês avaliado)
+    valores = soma_valores[:, fins] - soma_valores[:, inicios]
+    presentes = (soma_contagens[:, fins] - soma_contagens[:, inicios]) > 0
+
+    # Ordenação decrescente por coluna (empates na ordem de Cliente) e participação acumulada
+    ordem = np.argsort(-valores, axis=0, kind="stable")
+    ordenados = np.take_along_axis(valores, ordem, axis=0)
+    totais = ordenados.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acumulado = np.cumsum(ordenados, axis=0) / totais * 100
+    classes_ordenadas = np.where(totais > 0, classes_abc(acumulado, limite_a, limite_b), "C")
+
+    classes = np.empty_like(classes_ordenadas)
+    np.put_along_axis(classes, ordem, classes_ordenadas, axis=0)
+    classes[~presentes] = None
+    return pd.DataFrame(classes, index=pd.Index(clientes, name="Cliente"), columns=avaliados)
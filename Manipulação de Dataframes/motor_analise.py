@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+from dimensoes import ClientDimension, ProductDimension
+from motor_abc import LIMITE_A, LIMITE_B, classes_abc, participacao_acumulada, valores_em_centavos
+from motor_historico import agregar_historico
+
+
+COLUNAS_CATEGORIA = ["Negócio", "Grupo", "Subgrupo"]
+
+# Valores usados quando o cliente não aparece na classificação ABC
+PADROES_CLIENTE = {"ABC": "C", "UF": "", "Cidade": "", "Valor Total Orçado": 0}
+
+
+def agregar_clientes(df):
+    """
+    Agrega os dados comerciais por cliente.
+
+    O total orçado é somado em centavos inteiros, o que torna a soma exata e permite
+    atualizá-la incrementalmente com o mesmo resultado de uma soma completa.
+
+    Args:
+        df: DataFrame com as colunas "Cliente" e "Valor Orçado"
+
+    Returns:
+        DataFrame ordenado por Cliente com "Centavos", "Nome Cliente", "UF" e "Cidade"
+        (primeiro valor não nulo de cada cliente)
+    """
+    df_base = pd.DataFrame({
+        "Cliente": df["Cliente"].to_numpy(),
+        "Centavos": valores_em_centavos(df["Valor Orçado"]),
+    })
+    for col in ["Nome Cliente", "UF", "Cidade"]:
+        df_base[col] = df[col].to_numpy() if col in df.columns else ""
+
+    return df_base.groupby("Cliente").agg({
+        "Centavos": "sum",
+        "Nome Cliente": "first",
+        "UF": "first",
+        "Cidade": "first",
+    }).reset_index()
+
+
+def classificar_abc_totais(df_clientes, limite_a=LIMITE_A, limite_b=LIMITE_B):
+    """
+    Classifica os clientes em A/B/C a partir dos totais já agregados por cliente.
+
+    Args:
+        df_clientes: Saída de agregar_clientes (ordenada por Cliente)
+        limite_a: Percentual acumulado até o qual o cliente é A
+        limite_b: Percentual acumulado até o qual o cliente é B
+
+    Returns:
+        DataFrame com "Valor Total Orçado", "Percentual", "Percentual Acumulado", "ABC" e "Ranking"
+    """
+    df_clientes = df_clientes.copy()
+    centavos = df_clientes.pop("Centavos").to_numpy()
+    df_clientes.insert(1, "Valor Total Orçado", centavos / 100)
+
+    # Ordenar por valor total (decrescente; empates na ordem de Cliente, como em motor_abc)
+    ordem = np.argsort(-centavos, kind="stable")
+    df_clientes = df_clientes.iloc[ordem]
+    centavos = centavos[ordem]
+
+    # Calcular valor total e percentuais
+    valor_total = centavos.sum()
+
+    if valor_total == 0:
+        df_clientes["ABC"] = "C"
+        df_clientes["Percentual"] = 0
+        df_clientes["Percentual Acumulado"] = 0
+        return df_clientes
+
+    df_clientes["Percentual"] = centavos / valor_total * 100
+    df_clientes["Percentual Acumulado"] = participacao_acumulada(centavos, valor_total)
+
+    # Classificação ABC
+    df_clientes["ABC"] = classes_abc(df_clientes["Percentual Acumulado"].to_numpy(), limite_a, limite_b)
+
+    df_clientes['Ranking'] = df_clientes['Valor Total Orçado'].rank(ascending=False, method='min').astype(int)
+    return df_clientes
+
+
+def classificar_clientes_abc(df):
+    """Classifica os clientes conforme análise ABC baseada no valor orçado."""
+    return classificar_abc_totais(agregar_clientes(df))
+
+
+def montar_resultado(df_historico, dim_clientes, dim_produtos=None, colunas_categoria=None):
+    """
+    Completa o histórico agregado com as informações do cliente e do produto.
+
+    Args:
+        df_historico: Saída de agregar_historico
+        dim_clientes: ClientDimension com a classificação ABC
+        dim_produtos: ProductDimension com as categorias (opcional)
+        colunas_categoria: Colunas de categoria a incluir
+
+    Returns:
+        DataFrame final, uma linha por (Cliente, Código Produto)
+    """
+    df_final = df_historico.copy()
+    colunas_categoria = COLUNAS_CATEGORIA if colunas_categoria is None else colunas_categoria
+
+    # Informações do cliente (classificação ABC)
+    df_info_cliente = dim_clientes.buscar(df_final["Cliente"], list(PADROES_CLIENTE), PADROES_CLIENTE)
+    posicao = df_final.columns.get_loc("Nome Cliente") + 1
+    for coluna in PADROES_CLIENTE:
+        df_final.insert(posicao, coluna, df_info_cliente[coluna].to_numpy())
+        posicao += 1
+
+    # Categorias do produto
+    if dim_produtos is not None:
+        df_info_produto = dim_produtos.buscar(df_final["Código Produto"], colunas_categoria,
+                                              {col: "" for col in colunas_categoria})
+        for cat_col in colunas_categoria:
+            df_final[cat_col] = df_info_produto[cat_col].to_numpy()
+
+    return df_final
+
+
+def montar_historico(df_analise, dim_clientes, dim_produtos=None, colunas_categoria=None):
+    """
+    Agrega o histórico por (Cliente, Código Produto) e completa com as informações do
+    cliente e do produto (agregar_historico + montar_resultado).
+
+    Usada também em cada partição por clientes do processamento em vários processos
+    (execucao_particionada), com as dimensões já construídas sobre todos os dados.
+    """
+    return montar_resultado(agregar_historico(df_analise), dim_clientes, dim_produtos, colunas_categoria)
+
+
+def historico_produtos_clientes(df_analise, dim_clientes, dim_produtos):
+    """
+    Histórico por cliente/produto da análise de produtos por cliente (análise_produtos_clientes.py):
+    apenas clientes classificados e produtos com subgrupo, com as informações do cliente e
+    as categorias do produto.
+
+    Como montar_historico, pode ser aplicada a cada partição por clientes. As linhas não
+    saem ordenadas.
+
+    Args:
+        df_analise: DataFrame com dados de análise comercial
+        dim_clientes: ClientDimension com a classificação ABC
+        dim_produtos: ProductDimension com as categorias
+
+    Returns:
+        DataFrame com uma linha por (Cliente, Código Produto)
+    """
+    # 1. Manter apenas clientes classificados e produtos categorizados (o subgrupo é
+    #    determinado pelo produto, então basta agregar o histórico por cliente/produto)
+    df_resultado = df_analise[["Código Produto", "Descrição Produto", "Dt Entrada", "Cliente",
+                               "Consultor Interno", "Prob.Fech.", "Motivo Não Venda"]]
+    df_resultado = df_resultado[dim_clientes.posicoes(df_resultado["Cliente"]) >= 0]
+    df_resultado = df_resultado.assign(**{
+        "Nome Cliente": dim_clientes.buscar(df_resultado["Cliente"], ["Nome Cliente"])["Nome Cliente"].to_numpy()})
+    subgrupos = dim_produtos.buscar(df_resultado["Código Produto"], ["Subgrupo"])["Subgrupo"]
+    df_historico = agregar_historico(df_resultado[subgrupos.notna().to_numpy()])
+
+    # 2. Completar com as informações do cliente e do produto
+    df_info_cliente = dim_clientes.buscar(df_historico["Cliente"], ["UF", "Cidade", "ABC", "Valor Total Orçado"])
+    df_info_produto = dim_produtos.buscar(df_historico["Código Produto"], ["Negócio", "Grupo", "Subgrupo"])
+    return pd.concat([df_info_produto[["Subgrupo", "Negócio", "Grupo"]],
+                      df_historico[["Código Produto", "Descrição Produto", "Cliente", "Nome Cliente"]],
+                      df_info_cliente,
+                      df_historico[["Dt Entrada", "Prob.Fech.", "Motivo Não Venda",
+                                    "Última Data", "Último Consultor"]]], axis=1)
+
+
+def preparar_analise(df_analise):
+    """Retorna uma cópia de df_analise com "Dt Entrada" convertida para datetime."""
+    df_analise = df_analise.copy()
+    if "Dt Entrada" in df_analise.columns:
+        df_analise["Dt Entrada"] = pd.to_datetime(df_analise["Dt Entrada"], errors="coerce")
+    return df_analise
+
+
+def construir_dimensao_produtos(df_categorias):
+    """Monta a dimensão de produtos e a lista de colunas de categoria disponíveis."""
+    colunas = [col for col in COLUNAS_CATEGORIA if col in df_categorias.columns]
+    dim_produtos = ProductDimension(df_categorias) if "Código Produto" in df_categorias.columns else None
+    return dim_produtos, colunas
+
+
+def processar(df_analise, df_categorias):
+    """
+    Executa o processamento completo (ABC, categorias e histórico) sem dependência do Streamlit.
+
+    Args:
+        df_analise: DataFrame com dados de análise comercial
+        df_categorias: DataFrame com dados de categorias de produtos
+
+    Returns:
+        DataFrame final, uma linha por (Cliente, Código Produto)
+    """
+    df_analise = preparar_analise(df_analise)
+    dim_clientes = ClientDimension(classificar_clientes_abc(df_analise))
+    dim_produtos, colunas_categoria = construir_dimensao_produtos(df_categorias)
+    return montar_historico(df_analise, dim_clientes, dim_produtos, colunas_categoria)
@@ -0,0 +1,430 @@
+import glob
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cache_excel import dataframe_arrow, gravar_parquet, ler_parquet, tabela_arrow
+from dimensoes import ClientDimension
+from motor_analise import (agregar_clientes, classificar_abc_totais, construir_dimensao_produtos,
+                           montar_resultado, preparar_analise)
+from motor_historico import agregar_historico
+from perfil import medir_etapa
+from pipeline_comercial import limpar_analise
+
+
+# Memória de trabalho do processamento fora da memória e diretório dos arquivos temporários
+# (o diretório temporário do sistema por padrão)
+LIMITE_MEMORIA_MB = int(os.environ.get("PROCESSAMENTO_EXTERNO_LIMITE_MB", "512"))
+DIRETORIO_TEMPORARIO = os.environ.get("PROCESSAMENTO_EXTERNO_DIR") or None
+
+# Fração do limite usada pelas linhas acumuladas antes de gravar uma sequência ordenada
+FRACAO_SEQUENCIA = 0.25
+
+# Memória usada na intercalação e no histórico de um lote de clientes, em múltiplos do
+# tamanho estimado do lote (cópias da ordenação, agregações e gravação)
+FATOR_LOTE = 6
+
+# Linhas por record batch nos arquivos temporários (unidade de leitura da intercalação; a
+# intercalação mantém um record batch de cada sequência em memória)
+LINHAS_POR_LEITURA = 2048
+
+# Etapas do processamento fora da memória, na ordem em que são executadas
+ETAPAS_EXTERNAS = ["carregar", "intercalar", "abc", "historico"]
+
+# Número da linha na entrada, usado para restaurar a ordem original dentro de cada lote
+COLUNA_LINHA = "__linha"
+
+CHAVES_DUPLICADAS = ["Cliente", "Código Produto", "Dt Entrada"]
+
+# Lote usado quando não há nenhuma linha com cliente
+_SEM_LINHAS = pd.DataFrame(columns=["Cliente", "Código Produto", "Valor Orçado"])
+
+
+class LimiteMemoriaInsuficiente(MemoryError):
+    """Levantada quando o processamento não cabe no limite de memória configurado."""
+
+
+def _sem_informe(mensagem, nivel="info"):
+    pass
+
+
+def _sem_progresso(etapa, indice, total):
+    pass
+
+
+def _gravar(df, caminho):
+    """
+    Grava o DataFrame em um arquivo Arrow IPC, em record batches de LINHAS_POR_LEITURA linhas.
+
+    Returns:
+        Tamanho estimado (bytes) de um record batch
+    """
+    tabela = tabela_arrow(df)
+    with pa.ipc.new_file(caminho, tabela.schema) as escritor:
+        escritor.write_table(tabela, max_chunksize=LINHAS_POR_LEITURA)
+    return tabela.nbytes * min(LINHAS_POR_LEITURA, len(df)) // max(len(df), 1)
+
+
+def _ler(caminho):
+    with pa.ipc.open_file(caminho) as leitor:
+        return dataframe_arrow(leitor.read_all())
+
+
+def _partes_resultado(diretorio):
+    return sorted(glob.glob(os.path.join(diretorio, "parte_*.parquet")))
+
+
+def ler_resultado(diretorio):
+    """
+    Lê o resultado gravado por processar_fora_da_memoria com saida (as partes na ordem).
+
+    Returns:
+        DataFrame final, igual ao que seria retornado sem saida
+    """
+    return pd.concat([ler_parquet(caminho) for caminho in _partes_resultado(diretorio)], ignore_index=True)
+
+
+class _CursorSequencia:
+    """
+    Leitura de uma sequência ordenada por cliente, um record batch de cada vez.
+
+    As linhas de cada cliente ficam contíguas e na ordem global dos clientes, então as linhas
+    de um intervalo de clientes são sempre as próximas da sequência. Do record batch atual
+    (em formato Arrow) só a coluna "Cliente" é convertida para pandas; as demais colunas
+    são convertidas apenas para as linhas entregues, o que reduz o custo de manter muitas
+    sequências abertas na intercalação.
+    """
+
+    def __init__(self, caminho, clientes):
+        # O arquivo fica aberto até fechar(): no Windows, um arquivo aberto não pode ser removido
+        self._arquivo = pa.OSFile(caminho)
+        try:
+            self._leitor = pa.ipc.open_file(self._arquivo)
+        except Exception:
+            self._arquivo.close()
+            raise
+        self._clientes = clientes
+        self._proximo = 0
+        self._tabela = None
+        self._posicoes = None
+        self._inicio = 0
+
+    def _carregar(self):
+        if self._proximo >= self._leitor.num_record_batches:
+            self._tabela = None
+            return False
+        lote = self._leitor.get_batch(self._proximo)
+        self._proximo += 1
+        self._tabela = pa.Table.from_batches([lote]).replace_schema_metadata(self._leitor.schema.metadata)
+        clientes = dataframe_arrow(self._tabela.select(["Cliente"]))["Cliente"]
+        self._posicoes = self._clientes.get_indexer(clientes.to_numpy())
+        self._inicio = 0
+        return True
+
+    def tomar(self, limite):
+        """Retira as linhas dos clientes de posição menor que limite (lista de DataFrames)."""
+        # As fatias são convertidas juntas: cada conversão de uma tabela com colunas
+        # categóricas refaz a lista de categorias inteira (o dicionário da sequência)
+        fatias = []
+        while self._tabela is not None or self._carregar():
+            fim = self._inicio + int(np.searchsorted(self._posicoes[self._inicio:], limite))
+            if fim > self._inicio:
+                fatias.append(self._tabela.slice(self._inicio, fim - self._inicio))
+            self._inicio = fim
+            if fim < self._tabela.num_rows:
+                break
+            self._tabela = None
+        return [dataframe_arrow(pa.concat_tables(fatias))] if fatias else []
+
+    def fechar(self):
+        self._leitor = None
+        self._tabela = None
+        self._arquivo.close()
+
+
+class ProcessamentoExterno:
+    """
+    Processamento completo de dados comerciais maiores que a memória, com o mesmo resultado
+    de executar_pipeline (df_final e classificação ABC dos clientes).
+
+    Os dados são recebidos em blocos (ex.: leitor_xlsx.ler_xlsx_em_blocos sobre várias
+    planilhas) e passam por três fases, cada uma com a memória limitada a limite_memoria_mb:
+      1. carregar: os blocos são preparados (e limpos, com limpar) e acumulados; quando as
+         linhas acumuladas passam da sua fração do limite, são ordenadas por (Cliente, Código
+         Produto) e gravadas em disco como uma sequência ordenada. Só a contagem de linhas
+         por cliente fica em memória.
+      2. intercalar: as sequências são intercaladas em lotes de clientes consecutivos (na
+         ordem global dos clientes), lendo de cada uma só as linhas do lote. Cada lote tem
+         todas as linhas dos seus clientes, na ordem original: as duplicadas são removidas,
+         os totais dos clientes (agregar_clientes) são calculados e o lote é gravado de novo.
+      3. abc e historico: os clientes são classificados com os totais exatos e o histórico
+         de cada lote é agregado e completado com as dimensões (montar_resultado).
+
+    O limite vale para a memória de trabalho: blocos acumulados, record batches abertos das
+    sequências, lotes e agregações. Com saida (em concluir), o resultado é gravado lote a lote
+    e não fica em memória; ficam só os dados por cliente (contagem de linhas, totais e
+    classificação ABC) e as dimensões. Sem saida, o resultado inteiro também fica em memória,
+    além do limite. A memória do leitor dos blocos (de quem chama) não é contada.
+
+    Um cliente não é dividido entre lotes: se as linhas do maior cliente não cabem no limite,
+    LimiteMemoriaInsuficiente é levantada assim que isso é detectado (ainda na leitura, ou
+    antes da intercalação, quando o número de sequências abertas é conhecido).
+
+    Args:
+        df_categorias: DataFrame com dados de categorias de produtos
+        limpar: Aplica limpar_analise a cada bloco (e remove as duplicadas na intercalação)
+        remover_duplicadas: Remove linhas repetidas por (Cliente, Código Produto, Dt Entrada)
+        limite_memoria_mb: Memória de trabalho (padrão: LIMITE_MEMORIA_MB)
+        diretorio: Diretório dos arquivos temporários (padrão: DIRETORIO_TEMPORARIO)
+    """
+
+    def __init__(self, df_categorias, limpar=False, remover_duplicadas=True, limite_memoria_mb=None,
+                 diretorio=None):
+        self.dim_produtos, self.colunas_categoria = construir_dimensao_produtos(df_categorias)
+        self.limpar = limpar
+        self.remover_duplicadas = remover_duplicadas
+        self.limite_bytes = (limite_memoria_mb or LIMITE_MEMORIA_MB) * 1024 * 1024
+        self._diretorio = tempfile.mkdtemp(prefix="analise_externa_", dir=diretorio or DIRETORIO_TEMPORARIO)
+        self._acumulados = []
+        self._bytes_acumulados = 0
+        self._sequencias = []
+        self._bytes_leitura = 0
+        self._linhas_por_cliente = pd.Series(dtype="int64")
+        self._bytes_lidos = 0
+        self.linhas_lidas = 0
+        self.linhas_removidas = 0
+        self.df_clientes_abc = None
+        self.df_final = None
+
+    def _caminho(self, prefixo, numero):
+        return os.path.join(self._diretorio, f"{prefixo}_{numero:05d}.arrow")
+
+    def acrescentar(self, bloco):
+        """Recebe o próximo bloco de linhas; grava uma sequência ordenada quando o limite é atingido."""
+        n = len(bloco)
+        if self.limpar:
+            bloco = limpar_analise(bloco, remover_duplicadas=False)
+        bloco = preparar_analise(bloco)
+        bloco[COLUNA_LINHA] = np.arange(self.linhas_lidas, self.linhas_lidas + len(bloco))
+        self.linhas_lidas += n
+        self.linhas_removidas += n - len(bloco)
+
+        # Linhas sem cliente não entram nos totais nem no histórico
+        bloco = bloco[bloco["Cliente"].notna().to_numpy()]
+        if len(bloco) == 0:
+            return
+        contagem = pd.Series(bloco["Cliente"].to_numpy()).value_counts()
+        self._linhas_por_cliente = self._linhas_por_cliente.add(contagem, fill_value=0).astype("int64")
+
+        tamanho = int(bloco.memory_usage(index=False, deep=True).sum())
+        self._bytes_lidos += tamanho
+        self._verificar_lote(int(self._linhas_por_cliente.max()), self.limite_bytes)
+        self._acumulados.append(bloco)
+        self._bytes_acumulados += tamanho
+        if self._bytes_acumulados >= self.limite_bytes * FRACAO_SEQUENCIA:
+            self._gravar_sequencia()
+
+    def _gravar_sequencia(self):
+        """Ordena as linhas acumuladas por cliente e produto e grava a sequência em disco."""
+        if not self._acumulados:
+            return
+        df = pd.concat(self._acumulados, ignore_index=True)
+        self._acumulados = []
+        self._bytes_acumulados = 0
+        # Ordem dos valores (como no factorize(sort=True) de agregar_historico), estável para
+        # manter a ordem original dentro de cada par
+        cod_cliente, _ = pd.factorize(df["Cliente"].to_numpy(), sort=True)
+        cod_produto, _ = pd.factorize(df["Código Produto"].to_numpy(), sort=True)
+        df = df.iloc[np.lexsort((cod_produto, cod_cliente))]
+        caminho = self._caminho("sequencia", len(self._sequencias))
+        self._bytes_leitura = max(self._bytes_leitura, _gravar(df, caminho))
+        self._sequencias.append(caminho)
+
+    def _linhas_por_lote(self, disponivel):
+        """Linhas de um lote que cabem em disponivel bytes (ver FATOR_LOTE)."""
+        bytes_por_linha = max(self._bytes_lidos / max(int(self._linhas_por_cliente.sum()), 1), 1)
+        return int(disponivel / FATOR_LOTE / bytes_por_linha), bytes_por_linha
+
+    def _verificar_lote(self, maior_cliente, disponivel):
+        """Levanta LimiteMemoriaInsuficiente se o maior cliente não cabe em um lote."""
+        linhas_lote, bytes_por_linha = self._linhas_por_lote(disponivel)
+        if maior_cliente > linhas_lote:
+            necessario = maior_cliente * bytes_por_linha * FATOR_LOTE + self.limite_bytes - disponivel
+            raise LimiteMemoriaInsuficiente(
+                f"O maior cliente tem {maior_cliente} linhas e não cabe no limite de "
+                f"{self.limite_bytes / 1024 ** 2:.0f} MB; use um limite de pelo menos "
+                f"{necessario / 1024 ** 2:.0f} MB (estimativa com as linhas lidas até aqui).")
+        return linhas_lote
+
+    def _lotes_de_clientes(self, linhas_por_cliente):
+        """
+        Limites (posições de clientes) dos lotes da intercalação: cada lote tem as linhas que
+        cabem no limite depois de descontado um record batch de cada sequência aberta.
+        """
+        disponivel = self.limite_bytes - self._bytes_leitura * len(self._sequencias)
+        linhas_lote = self._verificar_lote(int(linhas_por_cliente.max()) if len(linhas_por_cliente) else 0,
+                                           disponivel)
+        limites = [0]
+        acumulado = 0
+        for posicao, linhas in enumerate(linhas_por_cliente.to_numpy()):
+            if acumulado and acumulado + linhas > linhas_lote:
+                limites.append(posicao)
+                acumulado = 0
+            acumulado += linhas
+        limites.append(len(linhas_por_cliente))
+        return limites
+
+    def _intercalar(self, ao_informar):
+        """Intercala as sequências em lotes de clientes; retorna os caminhos dos lotes e os totais."""
+        self._gravar_sequencia()
+        # Clientes na ordem global (a mesma das sequências e de agregar_historico)
+        codigos, clientes = pd.factorize(self._linhas_por_cliente.index.to_numpy(), sort=True)
+        linhas_por_cliente = pd.Series(self._linhas_por_cliente.to_numpy()[np.argsort(codigos)])
+        limites = self._lotes_de_clientes(linhas_por_cliente)
+        indice_clientes = pd.Index(clientes)
+        ao_informar(f"Intercalando {len(self._sequencias)} sequências em {len(limites) - 1} lotes de clientes...")
+
+        cursores = []
+        lotes = []
+        totais = []
+        try:
+            for caminho in self._sequencias:
+                cursores.append(_CursorSequencia(caminho, indice_clientes))
+            for fim in limites[1:]:
+                partes = [parte for cursor in cursores for parte in cursor.tomar(fim)]
+                if not partes:
+                    continue
+                df = pd.concat(partes, ignore_index=True)
+                df = df.iloc[np.argsort(df[COLUNA_LINHA].to_numpy(), kind="stable")].reset_index(drop=True)
+                if self.limpar and self.remover_duplicadas:
+                    n = len(df)
+                    df = df.drop_duplicates(subset=[col for col in CHAVES_DUPLICADAS if col in df.columns],
+                                            ignore_index=True)
+                    self.linhas_removidas += n - len(df)
+                totais.append(agregar_clientes(df))
+                caminho = self._caminho("lote", len(lotes))
+                _gravar(df, caminho)
+                lotes.append(caminho)
+        finally:
+            for cursor in cursores:
+                cursor.fechar()
+
+        for caminho in self._sequencias:
+            os.remove(caminho)
+        self._sequencias = []
+        df_clientes = pd.concat(totais, ignore_index=True) if totais else agregar_clientes(_SEM_LINHAS)
+        return lotes, df_clientes
+
+    def concluir(self, ao_informar=None, ao_progresso=None, medicoes=None, saida=None):
+        """
+        Intercala as sequências gravadas e monta o resultado.
+
+        Args:
+            ao_informar: Função chamada com (mensagem, nivel)
+            ao_progresso: Função chamada com (etapa, indice, total) no início de cada etapa
+            medicoes: Lista onde as medições das etapas são acrescentadas
+            saida: Diretório onde o resultado é gravado à medida que é montado, um arquivo
+                   Parquet por lote de clientes (parte_00000.parquet, ...; ler com
+                   ler_resultado), sem mantê-lo em memória. Partes de uma execução anterior
+                   no diretório são apagadas
+
+        Returns:
+            DataFrame final, uma linha por (Cliente, Código Produto), ou None com saida; a
+            classificação ABC dos clientes fica em df_clientes_abc
+        """
+        ao_informar = ao_informar or _sem_informe
+        ao_progresso = ao_progresso or _sem_progresso
+        medicoes = [] if medicoes is None else medicoes
+        total = len(ETAPAS_EXTERNAS)
+        try:
+            ao_progresso("intercalar", ETAPAS_EXTERNAS.index("intercalar"), total)
+            with medir_etapa("intercalar", medicoes, self.linhas_lidas) as medicao:
+                lotes, df_clientes = self._intercalar(ao_informar)
+                medicao["linhas_saida"] = len(df_clientes)
+            if self.limpar:
+                ao_informar(f"Limpeza concluída: {self.linhas_removidas} linhas removidas", "sucesso")
+
+            ao_progresso("abc", ETAPAS_EXTERNAS.index("abc"), total)
+            with medir_etapa("abc", medicoes, len(df_clientes)) as medicao:
+                self.df_clientes_abc = classificar_abc_totais(df_clientes)
+                dim_clientes = ClientDimension(self.df_clientes_abc)
+                medicao["linhas_saida"] = len(self.df_clientes_abc)
+            if "Ranking" not in self.df_clientes_abc.columns:
+                ao_informar("Valor total orçado é zero. Verifique os dados.", "aviso")
+
+            ao_progresso("historico", ETAPAS_EXTERNAS.index("historico"), total)
+            with medir_etapa("historico", medicoes, self.linhas_lidas) as medicao:
+                if saida is not None:
+                    os.makedirs(saida, exist_ok=True)
+                    for caminho in _partes_resultado(saida):
+                        os.remove(caminho)
+                partes = []
+                linhas_saida = 0
+                for numero, caminho in enumerate(lotes or [None]):
+                    if caminho is None:
+                        df_lote = _SEM_LINHAS
+                    else:
+                        df_lote = _ler(caminho).drop(columns=COLUNA_LINHA)
+                        os.remove(caminho)
+                    df_parte = montar_resultado(agregar_historico(df_lote), dim_clientes,
+                                                self.dim_produtos, self.colunas_categoria)
+                    del df_lote
+                    linhas_saida += len(df_parte)
+                    if saida is None:
+                        partes.append(df_parte)
+                    else:
+                        gravar_parquet(df_parte, os.path.join(saida, f"parte_{numero:05d}.parquet"))
+                    del df_parte
+                self.df_final = pd.concat(partes, ignore_index=True) if saida is None else None
+                medicao["linhas_saida"] = linhas_saida
+        finally:
+            self.descartar()
+
+        ao_progresso("concluido", total, total)
+        return self.df_final
+
+    def descartar(self):
+        """Apaga os arquivos temporários."""
+        self._acumulados = []
+        shutil.rmtree(self._diretorio, ignore_errors=True)
+
+
+def processar_fora_da_memoria(blocos, df_categorias, limpar=False, remover_duplicadas=True, limite_memoria_mb=None,
+                              diretorio=None, ao_informar=None, ao_progresso=None, medicoes=None, saida=None):
+    """
+    Executa o processamento completo sobre blocos de dados comerciais sem mantê-los em
+    memória ao mesmo tempo (ver ProcessamentoExterno).
+
+    Args:
+        blocos: Iterável de DataFrames com as linhas da análise comercial, na ordem dos dados
+        df_categorias: DataFrame com dados de categorias de produtos
+        limpar: Aplica limpar_analise antes do processamento
+        remover_duplicadas: Repassado a limpar_analise
+        limite_memoria_mb: Memória de trabalho (padrão: LIMITE_MEMORIA_MB)
+        diretorio: Diretório dos arquivos temporários
+        ao_informar: Função chamada com (mensagem, nivel)
+        ao_progresso: Função chamada com (etapa, indice, total) no início de cada etapa
+        medicoes: Lista onde as medições das etapas são acrescentadas (nova lista por padrão)
+        saida: Diretório onde o resultado é gravado em partes, sem ficar em memória (ver
+               ProcessamentoExterno.concluir)
+
+    Returns:
+        Tupla (df_final, df_clientes_abc, medicoes); df_final é None com saida
+    """
+    ao_progresso = ao_progresso or _sem_progresso
+    medicoes = [] if medicoes is None else medicoes
+    processamento = ProcessamentoExterno(df_categorias, limpar, remover_duplicadas, limite_memoria_mb, diretorio)
+    try:
+        ao_progresso("carregar", ETAPAS_EXTERNAS.index("carregar"), len(ETAPAS_EXTERNAS))
+        with medir_etapa("carregar", medicoes) as medicao:
+            for bloco in blocos:
+                processamento.acrescentar(bloco)
+            medicao["linhas_entrada"] = medicao["linhas_saida"] = processamento.linhas_lidas
+        df_final = processamento.concluir(ao_informar, ao_progresso, medicoes, saida)
+    finally:
+        processamento.descartar()
+    return df_final, processamento.df_clientes_abc, medicoes
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from historico_compacto import lista_categorias, lista_datas, lista_numeros
+
+
+# Colunas produzidas pelo motor de histórico, na ordem em que são retornadas
+COLUNAS_HISTORICO = [
+    "Cliente", "Nome Cliente", "Código Produto", "Descrição Produto",
+    "Dt Entrada", "Prob.Fech.", "Motivo Não Venda", "Última Data", "Último Consultor"
+]
+
+# Colunas dos dados comerciais lidas pelo motor de histórico
+COLUNAS_ORIGEM_HISTORICO = [
+    "Cliente", "Código Produto", "Nome Cliente", "Descrição Produto",
+    "Dt Entrada", "Prob.Fech.", "Motivo Não Venda", "Consultor Interno"
+]
+
+
+def _fatiar_em_listas(valores, inicios, fins):
+    """Converte um array ordenado em uma lista Python por grupo."""
+    lista = valores.tolist()
+    return [lista[a:b] for a, b in zip(inicios, fins)]
+
+
+def agregar_historico(df, compacto=True):
+    """
+    Agrega o histórico de interações por (Cliente, Código Produto) em uma única passada.
+
+    Em vez de percorrer os grupos com um laço Python, o DataFrame é ordenado uma única
+    vez por cliente, produto e data, e todos os grupos são resolvidos com operações
+    vetorizadas sobre os limites de cada grupo no array ordenado.
+
+    Por padrão, os históricos são devolvidos como listas Arrow (offsets + valores):
+    datas como timestamp, probabilidades como float e motivos como categorias, e a
+    "Última Data" como datetime (formatada só na exibição). Com compacto=False, são
+    devolvidos como listas Python com as datas em texto.
+
+    Args:
+        df: DataFrame com dados de análise comercial (precisa de "Cliente" e "Código Produto")
+        compacto: Usa a representação compacta (Arrow) para as listas de histórico
+
+    Returns:
+        DataFrame com uma linha por (Cliente, Código Produto), contendo as listas de
+        histórico de "Dt Entrada", "Prob.Fech." e "Motivo Não Venda" ordenadas por data,
+        além de "Última Data" e "Último Consultor"
+    """
+    # 1. Descartar linhas sem as chaves do agrupamento (mesmo comportamento do groupby)
+    validos = df[["Cliente", "Código Produto"]].notna().all(axis=1).to_numpy()
+    if not validos.all():
+        df = df[validos]
+
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame(columns=COLUNAS_HISTORICO)
+
+    # 2. Codificar as chaves como inteiros (ordenados) para permitir um lexsort
+    cod_cliente, _ = pd.factorize(df["Cliente"], sort=True)
+    cod_produto, _ = pd.factorize(df["Código Produto"], sort=True)
+
+    # 3. Datas como inteiros; datas ausentes (NaT) ficam no fim de cada grupo
+    if "Dt Entrada" in df.columns:
+        datas = pd.to_datetime(df["Dt Entrada"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+    else:
+        datas = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+    datas_int = datas.view("i8")
+    nat = np.isnat(datas)
+    chave_data = np.where(nat, np.iinfo(np.int64).max, datas_int)
+
+    # 4. Ordenação única e estável: cliente, produto, data
+    ordem = np.lexsort((chave_data, cod_produto, cod_cliente))
+    cc = cod_cliente[ordem]
+    cp = cod_produto[ordem]
+
+    # 5. Limites de cada grupo no array ordenado
+    novo_grupo = np.empty(n, dtype=bool)
+    novo_grupo[0] = True
+    novo_grupo[1:] = (cc[1:] != cc[:-1]) | (cp[1:] != cp[:-1])
+    inicios = np.flatnonzero(novo_grupo)
+    fins = np.append(inicios[1:], n)
+
+    # 6. Primeira linha de cada grupo na ordem original do arquivo
+    primeira = np.minimum.reduceat(ordem, inicios)
+
+    # 7. Última interação: primeira ocorrência da maior data do grupo
+    #    (grupos só com datas ausentes usam a primeira linha, como o idxmax original)
+    datas_ord = datas_int[ordem]
+    maior_data = np.maximum.reduceat(datas_ord, inicios)
+    posicoes = np.arange(n)
+    candidatos = np.where(datas_ord == np.repeat(maior_data, fins - inicios), posicoes, n)
+    ultima = ordem[np.minimum.reduceat(candidatos, inicios)]
+
+    def coluna(nome, padrao=""):
+        if nome in df.columns:
+            return df[nome].to_numpy()
+        return np.full(n, padrao, dtype=object)
+
+    # 8. Listas de histórico: valores ordenados + limites de cada grupo
+    if compacto:
+        offsets = np.append(inicios, n)
+        vazios = np.zeros(len(inicios) + 1, dtype=np.int64)
+        historicos = {
+            "Dt Entrada": lista_datas(offsets, datas[ordem]) if "Dt Entrada" in df.columns
+                          else lista_datas(vazios, datas[:0]),
+            "Prob.Fech.": lista_numeros(offsets, df["Prob.Fech."].to_numpy()[ordem]) if "Prob.Fech." in df.columns
+                          else lista_numeros(vazios, []),
+            "Motivo Não Venda": lista_categorias(offsets, df["Motivo Não Venda"].to_numpy()[ordem])
+                                if "Motivo Não Venda" in df.columns else lista_categorias(vazios, []),
+        }
+    else:
+        datas_texto = np.datetime_as_string(datas, unit="D").astype(object)
+        datas_texto[nat] = np.nan
+        historicos = {
+            "Dt Entrada": (_fatiar_em_listas(datas_texto[ordem], inicios, fins)
+                           if "Dt Entrada" in df.columns else [[] for _ in inicios]),
+            "Prob.Fech.": (_fatiar_em_listas(df["Prob.Fech."].to_numpy()[ordem], inicios, fins)
+                           if "Prob.Fech." in df.columns else [[] for _ in inicios]),
+            "Motivo Não Venda": (_fatiar_em_listas(df["Motivo Não Venda"].to_numpy()[ordem], inicios, fins)
+                                 if "Motivo Não Venda" in df.columns else [[] for _ in inicios]),
+        }
+
+    resultado = {
+        "Cliente": df["Cliente"].to_numpy()[ordem[inicios]],
+        "Código Produto": df["Código Produto"].to_numpy()[ordem[inicios]],
+        "Nome Cliente": coluna("Nome Cliente")[primeira],
+        "Descrição Produto": coluna("Descrição Produto")[primeira],
+        **{col: historicos[col] for col in ["Dt Entrada", "Prob.Fech.", "Motivo Não Venda"]},
+        "Última Data": (datas[ultima] if compacto else pd.Series(datas[ultima]).dt.strftime("%Y-%m-%d").to_numpy())
+                       if "Dt Entrada" in df.columns else np.full(len(inicios), None),
+        "Último Consultor": coluna("Consultor Interno")[ultima],
+    }
+
+    return pd.DataFrame(resultado, columns=COLUNAS_HISTORICO)
+
+
+def ordem_historico(df):
+    """
+    Posições que colocam as linhas de um histórico agregado na ordem de agregar_historico
+    (Cliente e Código Produto), por exemplo depois de juntar históricos calculados por partes.
+    """
+    cod_cliente, _ = pd.factorize(df["Cliente"], sort=True)
+    cod_produto, _ = pd.factorize(df["Código Produto"], sort=True)
+    return np.lexsort((cod_produto, cod_cliente))
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from dimensoes import ClientDimension
+from motor_analise import (agregar_clientes, classificar_abc_totais, construir_dimensao_produtos,
+                           montar_resultado, preparar_analise)
+from motor_historico import agregar_historico
+
+
+CHAVES = ["Cliente", "Código Produto"]
+
+
+def _chaves_validas(df):
+    """MultiIndex com os pares (Cliente, Código Produto) não nulos de df."""
+    chaves = df[CHAVES].dropna()
+    return pd.MultiIndex.from_frame(chaves).unique()
+
+
+def _mesma_coluna(anterior, atual):
+    """
+    Indica se duas colunas têm os mesmos valores, linha a linha. Colunas categóricas são
+    comparadas pelos valores, mesmo com listas de categorias diferentes (ex.: a mesma
+    planilha tipada antes e depois de receber um novo mês).
+    """
+    if isinstance(anterior.dtype, pd.CategoricalDtype) and isinstance(atual.dtype, pd.CategoricalDtype):
+        # Código de cada categoria de atual nas categorias de anterior (-2: ausente; -1: nulo)
+        mapa = anterior.cat.categories.get_indexer(atual.cat.categories)
+        mapa = np.append(np.where(mapa < 0, -2, mapa), -1)
+        return np.array_equal(anterior.cat.codes.to_numpy(), mapa[atual.cat.codes.to_numpy()])
+    return anterior.reset_index(drop=True).equals(atual.reset_index(drop=True))
+
+
+def _mesmo_conteudo(anterior, atual):
+    """Indica se os DataFrames têm as mesmas colunas e os mesmos valores (ver _mesma_coluna)."""
+    return list(anterior.columns) == list(atual.columns) and len(anterior) == len(atual) \
+        and all(_mesma_coluna(anterior.iloc[:, j], atual.iloc[:, j]) for j in range(len(atual.columns)))
+
+
+def _ordenar_por_chaves(df):
+    """Ordena por Cliente e Código Produto com a mesma regra usada por agregar_historico."""
+    cod_cliente, _ = pd.factorize(df["Cliente"], sort=True)
+    cod_produto, _ = pd.factorize(df["Código Produto"], sort=True)
+    ordem = np.lexsort((cod_produto, cod_cliente))
+    return df.iloc[ordem].reset_index(drop=True)
+
+
+class ProcessamentoIncremental:
+    """
+    Mantém o resultado de processar_dados atualizado à medida que novos meses são acrescentados.
+
+    Guarda os agregados por cliente (totais em centavos) e o histórico já agregado por
+    (Cliente, Código Produto). Ao receber novas linhas:
+      - os totais dos clientes são somados aos agregados existentes e as faixas ABC são
+        recalculadas a partir deles, sem um novo groupby sobre todas as linhas;
+      - apenas os grupos (Cliente, Código Produto) presentes nas novas linhas têm o
+        histórico recalculado.
+    O resultado é idêntico ao de um processamento completo sobre todas as linhas.
+
+    Com atualizar, o estado pode ser reaproveitado entre execuções de executar_pipeline
+    (ex.: a mesma exportação reenviada com um mês a mais no final): as linhas já
+    processadas são reconhecidas comparando as primeiras linhas dos novos dados com as
+    guardadas.
+
+    Args:
+        df_categorias: DataFrame com dados de categorias de produtos (pode ser informado
+                       depois, em atualizar)
+    """
+
+    def __init__(self, df_categorias=None):
+        self.df_categorias = None
+        self.dim_produtos, self.colunas_categoria = None, []
+        if df_categorias is not None:
+            self._definir_categorias(df_categorias)
+        self.df_analise = None
+        self.df_clientes = None
+        self.df_historico = None
+        self.df_final = None
+
+    def _definir_categorias(self, df_categorias):
+        self.df_categorias = df_categorias
+        self.dim_produtos, self.colunas_categoria = construir_dimensao_produtos(df_categorias)
+
+    def processar_tudo(self, df_analise):
+        """Processamento completo inicial; guarda o estado para as próximas atualizações."""
+        return self._processar_tudo(preparar_analise(df_analise).reset_index(drop=True))
+
+    def _processar_tudo(self, df_analise):
+        self.df_analise = df_analise
+        self.df_clientes = agregar_clientes(self.df_analise)
+        self.df_historico = agregar_historico(self.df_analise)
+        return self._montar()
+
+    def linhas_ja_processadas(self, df_analise):
+        """
+        Número de linhas do estado atual que são as primeiras linhas de df_analise.
+
+        Args:
+            df_analise: DataFrame da análise comercial já preparado (preparar_analise)
+
+        Returns:
+            O número de linhas já processadas, ou None se df_analise não começa por elas
+            (outras colunas, linhas alteradas, removidas ou fora de ordem)
+        """
+        if self.df_analise is None or len(df_analise) < len(self.df_analise):
+            return None
+        n = len(self.df_analise)
+        return n if _mesmo_conteudo(self.df_analise, df_analise.iloc[:n]) else None
+
+    def atualizar(self, df_analise, df_categorias=None):
+        """
+        Processa df_analise aproveitando o estado da execução anterior.
+
+        Se as linhas já processadas são as primeiras linhas de df_analise, só as demais
+        são incorporadas (como em acrescentar); caso contrário (ou se as categorias
+        mudaram), os dados são processados por completo.
+
+        Args:
+            df_analise: DataFrame completo da análise comercial
+            df_categorias: DataFrame de categorias (None mantém o atual)
+
+        Returns:
+            Tupla (df_final, linhas novas); linhas novas é None quando houve processamento completo
+        """
+        if df_categorias is not None and (self.df_categorias is None
+                                          or not _mesmo_conteudo(self.df_categorias, df_categorias)):
+            self._definir_categorias(df_categorias)
+            self.df_analise = None
+
+        df_analise = preparar_analise(df_analise).reset_index(drop=True)
+        n = self.linhas_ja_processadas(df_analise)
+        if n is None:
+            return self._processar_tudo(df_analise), None
+        if n == len(df_analise):
+            return self.df_final, 0
+        try:
+            return self._incorporar(df_analise, n), len(df_analise) - n
+        except BaseException:
+            # Estado possivelmente incompleto: a próxima execução processa tudo de novo
+            self.df_analise = None
+            raise
+
+    def acrescentar(self, df_novas):
+        """
+        Incorpora novas linhas (ex.: um novo mês da exportação comercial).
+
+        Args:
+            df_novas: DataFrame com as linhas novas, no mesmo esquema de df_analise
+
+        Returns:
+            DataFrame final atualizado
+        """
+        if self.df_analise is None:
+            return self.processar_tudo(df_novas)
+
+        n = len(self.df_analise)
+        return self._incorporar(pd.concat([self.df_analise, preparar_analise(df_novas)], ignore_index=True), n)
+
+    def _incorporar(self, df_analise, n):
+        """Passa a df_analise (já preparada), cujas n primeiras linhas são as já processadas."""
+        df_novas = df_analise.iloc[n:]
+        self.df_analise = df_analise
+
+        # 1. Atualizar os agregados por cliente somando os agregados das novas linhas
+        self.df_clientes = pd.concat([self.df_clientes, agregar_clientes(df_novas)], ignore_index=True) \
+            .groupby("Cliente").agg({
+                "Centavos": "sum",
+                "Nome Cliente": "first",
+                "UF": "first",
+                "Cidade": "first",
+            }).reset_index()
+
+        # 2. Recalcular apenas os grupos tocados pelas novas linhas
+        tocados = _chaves_validas(df_novas)
+        if len(tocados) > 0:
+            linhas_tocadas = pd.MultiIndex.from_frame(self.df_analise[CHAVES]).isin(tocados)
+            df_recalculado = agregar_historico(self.df_analise[linhas_tocadas])
+
+            grupos_mantidos = ~pd.MultiIndex.from_frame(self.df_historico[CHAVES]).isin(tocados)
+            self.df_historico = _ordenar_por_chaves(
+                pd.concat([self.df_historico[grupos_mantidos], df_recalculado], ignore_index=True)
+            )
+
+        return self._montar()
+
+    def _montar(self):
+        dim_clientes = ClientDimension(classificar_abc_totais(self.df_clientes))
+        self.df_final = montar_resultado(self.df_historico, dim_clientes, self.dim_produtos,
+                                         self.colunas_categoria)
+        return self.df_final
@@ -0,0 +1,135 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from formatacao import formatar_exibicao
+from historico_compacto import eh_lista_arrow
+
+
+# Elementos mostrados de cada lista do histórico na página exibida
+MAX_ITENS_LISTA = 5
+
+# Abaixo desta fração das linhas, um subconjunto é ordenado diretamente pelas suas chaves;
+# acima, é extraído da permutação completa da coluna
+FRACAO_ORDENACAO_DIRETA = 1 / 8
+
+
+def _chave_ordenacao(serie):
+    """
+    Chave inteira de ordenação da coluna: a posição de cada valor entre os valores distintos
+    ordenados, com os nulos depois de todos os valores.
+    """
+    try:
+        codigos, unicos = pd.factorize(serie, sort=True)
+    except TypeError:
+        # Tipos misturados (ex.: códigos de produto inteiros e alfanuméricos): ordena como texto
+        codigos, unicos = pd.factorize(serie.astype(str).where(serie.notna()), sort=True)
+    return np.where(codigos < 0, len(unicos), codigos).astype(np.int32), len(unicos)
+
+
+class IndiceOrdenacao:
+    """
+    Permutações de ordenação das colunas de um DataFrame, calculadas uma única vez.
+
+    A primeira ordenação por uma coluna calcula a chave de ordenação e a permutação da
+    coluna; as seguintes (inclusive na direção inversa e sobre subconjuntos filtrados) apenas
+    reaproveitam esses arrays. Colunas de listas (histórico) não são ordenáveis.
+
+    Args:
+        df: DataFrame a ordenar (normalmente o df_final de processar_dados)
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.n_linhas = len(df)
+        self.colunas = [col for col in df.columns if not eh_lista_arrow(df[col])
+                        and not (len(df) > 0 and isinstance(df[col].iloc[0], list))]
+        self._chaves = {}
+        self._permutacoes = {}
+
+    def _chave(self, coluna, ascendente):
+        if (coluna, ascendente) not in self._chaves:
+            if (coluna, True) not in self._chaves:
+                self._chaves[(coluna, True)] = _chave_ordenacao(self.df[coluna])
+            chave, n_valores = self._chaves[(coluna, True)]
+            if not ascendente:
+                # Inverte a ordem dos valores mantendo os nulos no fim
+                self._chaves[(coluna, False)] = (np.where(chave < n_valores, n_valores - 1 - chave, chave),
+                                                 n_valores)
+        return self._chaves[(coluna, ascendente)][0]
+
+    def permutacao(self, coluna, ascendente=True):
+        """Posições de todas as linhas na ordem da coluna (estável; nulos no fim)."""
+        if (coluna, ascendente) not in self._permutacoes:
+            ordem = np.argsort(self._chave(coluna, ascendente), kind="stable").astype(np.int32)
+            ordem.flags.writeable = False
+            self._permutacoes[(coluna, ascendente)] = ordem
+        return self._permutacoes[(coluna, ascendente)]
+
+    def ordenar(self, posicoes=None, coluna=None, ascendente=True):
+        """
+        Ordena um conjunto de linhas sem tocar no DataFrame.
+
+        Args:
+            posicoes: Posições (iloc) das linhas, ex.: o resultado de IndiceFiltros.filtrar
+                (None para todas as linhas)
+            coluna: Coluna de ordenação (None mantém a ordem original)
+            ascendente: Direção da ordenação
+
+        Returns:
+            Array com as posições na ordem pedida
+        """
+        if coluna is None:
+            return np.arange(self.n_linhas, dtype=np.int32) if posicoes is None else posicoes
+        if posicoes is None or len(posicoes) == self.n_linhas:
+            return self.permutacao(coluna, ascendente)
+        if len(posicoes) < self.n_linhas * FRACAO_ORDENACAO_DIRETA:
+            # Poucas linhas: ordena só as chaves do subconjunto (as posições já estão em ordem crescente)
+            chave = self._chave(coluna, ascendente)
+            return posicoes[np.argsort(chave[posicoes], kind="stable")]
+        # Muitas linhas: percorre a permutação completa mantendo as linhas selecionadas
+        selecionadas = np.zeros(self.n_linhas, dtype=bool)
+        selecionadas[posicoes] = True
+        permutacao = self.permutacao(coluna, ascendente)
+        return permutacao[selecionadas[permutacao]]
+
+
+def total_paginas(n_linhas, itens_por_pagina):
+    """Número de páginas (ao menos uma, mesmo sem linhas)."""
+    return max(math.ceil(n_linhas / itens_por_pagina), 1)
+
+
+def paginar(ordem, pagina, itens_por_pagina):
+    """
+    Posições das linhas de uma página (fatia do array de posições, sem cópia).
+
+    Args:
+        ordem: Posições das linhas na ordem de exibição
+        pagina: Número da página, começando em 1
+        itens_por_pagina: Linhas por página
+    """
+    inicio = (pagina - 1) * itens_por_pagina
+    return ordem[inicio:inicio + itens_por_pagina]
+
+
+def preparar_pagina(df, posicoes, colunas=None, max_itens=MAX_ITENS_LISTA):
+    """
+    Monta o DataFrame enviado para exibição: só as linhas da página e as colunas pedidas,
+    com valores, percentuais e datas no padrão brasileiro e as listas do histórico
+    formatadas e truncadas (ver formatacao.formatar_exibicao).
+
+    Args:
+        df: DataFrame completo
+        posicoes: Posições (iloc) das linhas da página
+        colunas: Colunas exibidas (None para todas)
+        max_itens: Elementos mostrados de cada lista
+
+    Returns:
+        DataFrame pequeno, do tamanho da página
+    """
+    if colunas is None:
+        pagina = df.iloc[posicoes]
+    else:
+        pagina = df.iloc[posicoes, df.columns.get_indexer(colunas)]
+    return formatar_exibicao(pagina, max_itens=max_itens)
@@ -0,0 +1,139 @@
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # psutil é opcional: sem ele, o pico é medido com tracemalloc
+    psutil = None
+
+# O que cada medição de medir_etapa cobre (exportado junto com as medições): as tarefas do
+# dashboard rodam em threads do mesmo processo (tarefas.ExecutorTarefas), então a memória
+# inclui a de outras tarefas em execução ao mesmo tempo
+ESCOPO_MEDICOES = {
+    "cpu_segundos": "thread da etapa (sem as threads internas de NumPy/Arrow)",
+    "pico_memoria_mb": "processo inteiro (inclui outras tarefas em execução ao mesmo tempo)",
+}
+
+
+def memoria_rss():
+    """Memória residente (RSS) atual do processo em bytes, ou None sem psutil."""
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+@contextmanager
+def monitorar_memoria(intervalo=0.005):
+    """
+    Mede o pico de memória do bloco, acima da memória em uso no início.
+
+    Com psutil, uma thread amostra o RSS do processo durante o bloco, o que inclui as
+    alocações feitas fora do Python (NumPy, Arrow). Sem psutil, usa o pico do tracemalloc,
+    que só enxerga as alocações rastreadas pelo Python e deixa o bloco mais lento.
+    Processos filhos (ex.: pools de leitura) não são contabilizados. As duas medidas são do
+    processo inteiro: outras threads alocando ao mesmo tempo (ex.: tarefas simultâneas do
+    dashboard) entram no pico.
+
+    Yields:
+        Dicionário preenchido ao final com "pico_bytes" e "metodo" ("rss" ou "tracemalloc")
+    """
+    resultado = {"pico_bytes": 0, "metodo": "rss" if psutil is not None else "tracemalloc"}
+
+    if psutil is None:
+        ja_rastreando = tracemalloc.is_tracing()
+        if not ja_rastreando:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        inicial, _ = tracemalloc.get_traced_memory()
+        try:
+            yield resultado
+        finally:
+            _, pico = tracemalloc.get_traced_memory()
+            if not ja_rastreando:
+                tracemalloc.stop()
+            resultado["pico_bytes"] = max(pico - inicial, 0)
+        return
+
+    processo = psutil.Process(os.getpid())
+    inicial = processo.memory_info().rss
+    pico = [inicial]
+    parar = threading.Event()
+
+    def amostrar():
+        while not parar.wait(intervalo):
+            pico[0] = max(pico[0], processo.memory_info().rss)
+
+    amostrador = threading.Thread(target=amostrar, daemon=True)
+    amostrador.start()
+    try:
+        yield resultado
+    finally:
+        parar.set()
+        amostrador.join()
+        pico[0] = max(pico[0], processo.memory_info().rss)
+        resultado["pico_bytes"] = pico[0] - inicial
+
+
+@contextmanager
+def medir_etapa(etapa, medicoes, linhas_entrada=0):
+    """
+    Mede uma etapa do processamento e registra o resultado em medicoes.
+
+    São medidos o tempo de relógio, o tempo de CPU da thread que executa a etapa e o pico
+    de memória acima do uso no início da etapa (ver monitorar_memoria). O tempo de CPU não
+    inclui o de outras tarefas do processo, mas a memória é a do processo inteiro: com
+    outras tarefas em execução ao mesmo tempo, o pico também inclui as alocações delas e
+    não é confiável (ver ESCOPO_MEDICOES). O bloco pode preencher medicao["linhas_saida"]
+    com o tamanho do resultado da etapa.
+
+    Args:
+        etapa: Nome da etapa
+        medicoes: Lista onde a medição é acrescentada
+        linhas_entrada: Número de linhas recebidas pela etapa
+    """
+    medicao = {"etapa": etapa, "segundos": 0.0, "cpu_segundos": 0.0, "pico_memoria_mb": 0.0,
+               "linhas_entrada": int(linhas_entrada), "linhas_saida": 0}
+    memoria = {"pico_bytes": 0, "metodo": None}
+    inicio = time.perf_counter()
+    inicio_cpu = time.thread_time()
+    try:
+        with monitorar_memoria() as memoria:
+            yield medicao
+    finally:
+        medicao["segundos"] = time.perf_counter() - inicio
+        medicao["cpu_segundos"] = time.thread_time() - inicio_cpu
+        medicao["pico_memoria_mb"] = memoria["pico_bytes"] / 1024 ** 2
+        medicao["metodo_memoria"] = memoria["metodo"]
+        medicoes.append(medicao)
+
+
+def tabela_medicoes(medicoes):
+    """DataFrame com as medições das etapas para exibição, com uma linha de total."""
+    df = pd.DataFrame(medicoes, columns=["etapa", "segundos", "cpu_segundos", "pico_memoria_mb",
+                                         "linhas_entrada", "linhas_saida"])
+    if len(df) > 0:
+        total = {"etapa": "total", "segundos": df["segundos"].sum(), "cpu_segundos": df["cpu_segundos"].sum(),
+                 "pico_memoria_mb": df["pico_memoria_mb"].max(), "linhas_entrada": None, "linhas_saida": None}
+        df = pd.concat([df, pd.DataFrame([total])], ignore_index=True)
+    return df.rename(columns={
+        "etapa": "Etapa", "segundos": "Tempo (s)", "cpu_segundos": "CPU (s)",
+        "pico_memoria_mb": "Pico de memória (MB)", "linhas_entrada": "Linhas (entrada)",
+        "linhas_saida": "Linhas (saída)",
+    })
+
+
+def medicoes_para_json(medicoes, **informacoes):
+    """Serializa as medições (e informações adicionais da execução) em JSON para download."""
+    return json.dumps({
+        "gerado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+        **informacoes,
+        "escopo": ESCOPO_MEDICOES,
+        "etapas": medicoes,
+    }, ensure_ascii=False, indent=2, default=str)
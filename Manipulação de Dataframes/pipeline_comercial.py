@@ -0,0 +1,261 @@
+import io
+import re
+
+import pandas as pd
+
+from cache_excel import gravar_parquet, ler_excel_com_cache
+from dimensoes import ClientDimension
+from execucao_particionada import executar_particionado
+from leitor_xlsx import COLUNAS_ANALISE, ler_bytes, ler_xlsx_colunas
+from motor_analise import (classificar_clientes_abc, construir_dimensao_produtos, montar_historico,
+                           montar_resultado, preparar_analise)
+from motor_historico import COLUNAS_ORIGEM_HISTORICO, agregar_historico, ordem_historico
+from perfil import medir_etapa
+
+
+# Etapas do processamento, na ordem em que são executadas
+ETAPAS = ["carregar", "limpar", "abc", "dimensoes", "historico", "montar"]
+
+COLUNAS_ESSENCIAIS_ANALISE = ["Cliente", "Código Produto", "Dt Entrada", "Valor Orçado",
+                              "Nome Cliente", "Consultor Interno"]
+COLUNAS_ESSENCIAIS_CATEGORIAS = ["Código Produto", "Negócio", "Grupo", "Subgrupo"]
+
+
+def _sem_informe(mensagem, nivel="info"):
+    pass
+
+
+def _sem_progresso(etapa, indice, total):
+    pass
+
+
+def verificar_colunas(df_analise, df_categorias, ao_informar=None):
+    """
+    Verifica as colunas essenciais dos dois DataFrames e informa as ausentes.
+
+    Returns:
+        Lista com as colunas ausentes (análise e categorias)
+    """
+    ao_informar = ao_informar or _sem_informe
+    faltantes = [col for col in COLUNAS_ESSENCIAIS_ANALISE if col not in df_analise.columns]
+    if faltantes:
+        ao_informar(f"Colunas essenciais faltando no DataFrame de análise: {', '.join(faltantes)}", "aviso")
+        ao_informar("Processamento pode não funcionar corretamente sem estas colunas.", "aviso")
+
+    faltantes_cat = [col for col in COLUNAS_ESSENCIAIS_CATEGORIAS if col not in df_categorias.columns]
+    if faltantes_cat:
+        ao_informar(f"Colunas essenciais faltando no DataFrame de categorias: {', '.join(faltantes_cat)}", "aviso")
+        ao_informar("Informações de categorização podem estar incompletas.", "aviso")
+    return faltantes + faltantes_cat
+
+
+def limpar_analise(df, remover_duplicadas=True, ao_informar=None):
+    """
+    Limpa e prepara o DataFrame de análise para o processamento.
+
+    Remove colunas 'Unnamed', renomeia colunas duplicadas (".1", ".2"...), descarta linhas
+    sem nenhuma coluna essencial, preenche valores ausentes e converte as datas.
+
+    Args:
+        df: DataFrame de análise comercial
+        remover_duplicadas: Remove linhas repetidas por (Cliente, Código Produto, Dt Entrada)
+        ao_informar: Função chamada com (mensagem, nivel) para o relatório da limpeza
+
+    Returns:
+        DataFrame limpo (uma cópia; o original não é alterado)
+    """
+    ao_informar = ao_informar or _sem_informe
+    linhas_originais = len(df)
+    colunas_originais = len(df.columns)
+
+    # 1. Remover colunas 'Unnamed'
+    df = df.loc[:, ~df.columns.astype(str).str.contains('^Unnamed')]
+
+    # 2. Renomear colunas duplicadas (".1", ".2"...) quando o nome principal não existe
+    rename_cols = {}
+    for col in df.columns:
+        if re.search(r'\.\d+$', str(col)):
+            base_name = re.sub(r'\.\d+$', '', str(col))
+            if base_name not in df.columns:
+                rename_cols[col] = base_name
+    df = df.rename(columns=rename_cols)
+
+    # 3. Remover linhas onde todas as colunas essenciais são nulas
+    colunas_essenciais = [col for col in ["Cliente", "Código Produto", "Dt Entrada", "Valor Orçado"]
+                          if col in df.columns]
+    df_limpo = df.dropna(subset=colunas_essenciais, how='all').copy()
+
+    # 4. Preencher valores ausentes e converter tipos
+    for col in ["Valor Orçado", "Prob.Fech."]:
+        if col in df_limpo.columns:
+            df_limpo[col] = df_limpo[col].fillna(0)
+    if "Dt Entrada" in df_limpo.columns:
+        df_limpo["Dt Entrada"] = pd.to_datetime(df_limpo["Dt Entrada"], errors='coerce')
+
+    # 5. Remover linhas duplicadas
+    if remover_duplicadas:
+        df_limpo = df_limpo.drop_duplicates(subset=[col for col in ["Cliente", "Código Produto", "Dt Entrada"]
+                                                    if col in df_limpo.columns])
+
+    ao_informar(f"Limpeza concluída: {linhas_originais - len(df_limpo)} linhas removidas, "
+                f"{colunas_originais - len(df_limpo.columns)} colunas removidas", "sucesso")
+    return df_limpo
+
+
+def executar_pipeline(df_analise, df_categorias, limpar=False, remover_duplicadas=True,
+                      ao_informar=None, ao_progresso=None, medicoes=None, processos=1, incremental=None):
+    """
+    Executa a cadeia limpar → ABC → dimensões → histórico → montagem sem dependência do Streamlit.
+
+    Com mais de um processo, o histórico e a montagem (junção com a classificação ABC e as
+    categorias) são executados por partição de clientes em um pool de processos
+    (execucao_particionada), com as dimensões construídas antes sobre todos os dados; a
+    etapa "historico" mede esse processamento e a etapa "montar" a junção das partições na
+    ordem do processamento em um único processo. O resultado é o mesmo.
+
+    Com incremental (motor_incremental.ProcessamentoIncremental), o estado da execução
+    anterior é reaproveitado: se as linhas já processadas são as primeiras linhas de
+    df_analise (ex.: a exportação reenviada com um novo mês no final), só as linhas novas
+    são agregadas e apenas os grupos (Cliente, Código Produto) que elas tocam têm o
+    histórico recalculado; caso contrário, tudo é processado e o estado é substituído. O
+    resultado é o mesmo do processamento completo, e a etapa "historico" mede todo o
+    trabalho incremental.
+
+    Args:
+        df_analise: DataFrame com dados de análise comercial (não é alterado)
+        df_categorias: DataFrame com dados de categorias de produtos
+        limpar: Aplica limpar_analise antes do processamento
+        remover_duplicadas: Repassado a limpar_analise
+        ao_informar: Função chamada com (mensagem, nivel); nivel é "info", "aviso", "erro" ou "sucesso"
+        ao_progresso: Função chamada com (etapa, indice, total) no início de cada etapa
+        medicoes: Lista onde as medições das etapas são acrescentadas (nova lista por padrão)
+        processos: Processos usados no histórico e na montagem (1 executa tudo no processo atual);
+                   ignorado com incremental
+        incremental: ProcessamentoIncremental com o estado da execução anterior (atualizado aqui)
+
+    Returns:
+        Tupla (df_final, medicoes), com uma medição por etapa executada
+    """
+    ao_informar = ao_informar or _sem_informe
+    ao_progresso = ao_progresso or _sem_progresso
+    medicoes = [] if medicoes is None else medicoes
+    total = len(ETAPAS)
+
+    ao_informar(f"DataFrame de análise: {df_analise.shape[0]} linhas x {df_analise.shape[1]} colunas")
+    ao_informar(f"DataFrame de categorias: {df_categorias.shape[0]} linhas x {df_categorias.shape[1]} colunas")
+    verificar_colunas(df_analise, df_categorias, ao_informar)
+
+    if limpar:
+        ao_progresso("limpar", ETAPAS.index("limpar"), total)
+        with medir_etapa("limpar", medicoes, len(df_analise)) as medicao:
+            df_analise = limpar_analise(df_analise, remover_duplicadas, ao_informar)
+            medicao["linhas_saida"] = len(df_analise)
+
+    if incremental is not None:
+        ao_progresso("historico", ETAPAS.index("historico"), total)
+        with medir_etapa("historico", medicoes, len(df_analise)) as medicao:
+            df_final, linhas_novas = incremental.atualizar(df_analise, df_categorias)
+            medicao["linhas_saida"] = len(df_final)
+        if linhas_novas is None:
+            ao_informar("Processamento completo: os dados anteriores não são o início dos dados atuais.")
+        else:
+            ao_informar(f"Processamento incremental: {linhas_novas} linhas novas incorporadas.")
+        ao_progresso("concluido", total, total)
+        ao_informar(f"Processamento concluído! {len(df_final)} registros gerados.", "sucesso")
+        return df_final, medicoes
+
+    ao_progresso("abc", ETAPAS.index("abc"), total)
+    ao_informar("Iniciando classificação ABC de clientes...")
+    with medir_etapa("abc", medicoes, len(df_analise)) as medicao:
+        df_analise = preparar_analise(df_analise)
+        df_clientes_abc = classificar_clientes_abc(df_analise)
+        medicao["linhas_saida"] = len(df_clientes_abc)
+    if "Ranking" not in df_clientes_abc.columns:
+        ao_informar("Valor total orçado é zero. Verifique os dados.", "aviso")
+
+    ao_progresso("dimensoes", ETAPAS.index("dimensoes"), total)
+    ao_informar("Criando dicionário de categorias de produtos...")
+    with medir_etapa("dimensoes", medicoes, len(df_clientes_abc) + len(df_categorias)) as medicao:
+        dim_clientes = ClientDimension(df_clientes_abc)
+        dim_produtos, colunas_categoria = construir_dimensao_produtos(df_categorias)
+        medicao["linhas_saida"] = len(dim_clientes.indice) + (len(dim_produtos.indice) if dim_produtos else 0)
+
+    if processos > 1:
+        ao_progresso("historico", ETAPAS.index("historico"), total)
+        ao_informar(f"Combinando informações de produtos e clientes em {processos} processos...")
+        with medir_etapa("historico", medicoes, len(df_analise)) as medicao:
+            df_origem = df_analise[[col for col in COLUNAS_ORIGEM_HISTORICO if col in df_analise.columns]]
+            df_partes = executar_particionado(df_origem, montar_historico,
+                                              (dim_clientes, dim_produtos, colunas_categoria), processos=processos)
+            medicao["linhas_saida"] = len(df_partes)
+
+        ao_progresso("montar", ETAPAS.index("montar"), total)
+        with medir_etapa("montar", medicoes, len(df_partes)) as medicao:
+            df_final = df_partes.iloc[ordem_historico(df_partes)].reset_index(drop=True)
+            medicao["linhas_saida"] = len(df_final)
+    else:
+        ao_progresso("historico", ETAPAS.index("historico"), total)
+        ao_informar("Combinando informações de produtos e clientes...")
+        with medir_etapa("historico", medicoes, len(df_analise)) as medicao:
+            df_historico = agregar_historico(df_analise)
+            medicao["linhas_saida"] = len(df_historico)
+
+        ao_progresso("montar", ETAPAS.index("montar"), total)
+        with medir_etapa("montar", medicoes, len(df_historico)) as medicao:
+            df_final = montar_resultado(df_historico, dim_clientes, dim_produtos, colunas_categoria)
+            medicao["linhas_saida"] = len(df_final)
+
+    ao_progresso("concluido", total, total)
+    ao_informar(f"Processamento concluído! {len(df_final)} registros gerados.", "sucesso")
+    return df_final, medicoes
+
+
+def carregar_analise(arquivo, header_row=0, usar_cache=True):
+    """
+    Carrega a planilha de análise comercial (apenas as colunas usadas pelo pipeline).
+
+    Args:
+        arquivo: Caminho, bytes ou objeto de arquivo
+        header_row: Índice da linha que contém os nomes das colunas
+        usar_cache: Usa o cache em disco de planilhas (cache_excel)
+
+    Returns:
+        DataFrame da análise comercial
+    """
+    if usar_cache:
+        df, _ = ler_excel_com_cache(arquivo, header_row=header_row, colunas=COLUNAS_ANALISE)
+        return df
+    return ler_xlsx_colunas(io.BytesIO(ler_bytes(arquivo)), COLUNAS_ANALISE, header_row=header_row)
+
+
+def carregar_categorias(arquivo, header_row=0, usar_cache=True):
+    """Carrega a planilha de classificação de produtos."""
+    if usar_cache:
+        df, _ = ler_excel_com_cache(arquivo, header_row=header_row)
+        return df
+    return pd.read_excel(io.BytesIO(ler_bytes(arquivo)), header=header_row)
+
+
+def processar_arquivo(arquivo, df_categorias, header_row=0, usar_cache=True, limpar=True,
+                      remover_duplicadas=True, ao_informar=None, ao_progresso=None):
+    """
+    Carrega uma planilha de análise comercial e executa o pipeline completo.
+
+    Returns:
+        Tupla (df_final, medicoes), incluindo a medição da etapa "carregar"
+    """
+    ao_progresso = ao_progresso or _sem_progresso
+    medicoes = []
+
+    ao_progresso("carregar", ETAPAS.index("carregar"), len(ETAPAS))
+    with medir_etapa("carregar", medicoes) as medicao:
+        df_analise = carregar_analise(arquivo, header_row, usar_cache)
+        medicao["linhas_saida"] = len(df_analise)
+
+    return executar_pipeline(df_analise, df_categorias, limpar=limpar, remover_duplicadas=remover_duplicadas,
+                             ao_informar=ao_informar, ao_progresso=ao_progresso, medicoes=medicoes)
+
+
+def gravar_resultado(df_final, caminho):
+    """Grava o resultado em Parquet (listas de histórico preservadas; ler de volta com cache_excel.ler_parquet)."""
+    gravar_parquet(df_final.reset_index(drop=True), caminho)
@@ -0,0 +1,151 @@
+"""
+Processa em lote um diretório de planilhas de análise comercial, sem o Streamlit.
+
+Cada planilha .xlsx do diretório de entrada passa pelo pipeline completo
+(carregar → limpar → ABC → dimensões → histórico → montagem) e o resultado é gravado
+em <saida>/<nome da planilha>.parquet. O tempo de cada etapa é mostrado por arquivo,
+junto com o total e a vazão (linhas por segundo) do lote.
+
+Com --juntar, as planilhas são processadas juntas, como uma única análise (ex.: vários anos
+ou filiais), pelo processamento fora da memória (motor_externo): as planilhas são lidas em
+blocos e a memória de trabalho fica limitada a --limite-memoria-mb, mesmo que os dados não
+caibam na memória. O resultado é gravado à medida que é montado em <saida>/resultado/ (um
+arquivo Parquet por lote de clientes; ler com motor_externo.ler_resultado) e a classificação
+ABC dos clientes em <saida>/clientes_abc.parquet.
+
+Uso:
+    python processar_lote.py entrada/ --categorias "Classificação Produtos.xlsx" --saida resultados/
+    python processar_lote.py entrada/ --categorias cat.xlsx --sem-cache --sem-limpeza
+    python processar_lote.py entrada/ --categorias cat.xlsx --juntar --limite-memoria-mb 1024
+"""
+import argparse
+import os
+import sys
+import time
+
+from leitor_xlsx import COLUNAS_ANALISE, ler_planilhas_em_blocos
+from motor_externo import (ETAPAS_EXTERNAS, LIMITE_MEMORIA_MB, LimiteMemoriaInsuficiente,
+                           processar_fora_da_memoria)
+from pipeline_comercial import ETAPAS, carregar_categorias, gravar_resultado, processar_arquivo
+
+
+def imprimir_informe(mensagem, nivel="info"):
+    """Mostra apenas avisos e erros do pipeline (as mensagens informativas poluiriam a saída)."""
+    if nivel in ("aviso", "erro"):
+        print(f"  [{nivel}] {mensagem}", file=sys.stderr)
+
+
+def listar_planilhas(diretorio, ignorar=()):
+    """Lista as planilhas .xlsx do diretório (ignorando arquivos temporários do Excel)."""
+    ignorar = {os.path.abspath(caminho) for caminho in ignorar}
+    return sorted(
+        os.path.join(diretorio, nome) for nome in os.listdir(diretorio)
+        if nome.lower().endswith(".xlsx") and not nome.startswith("~$")
+        and os.path.abspath(os.path.join(diretorio, nome)) not in ignorar
+    )
+
+
+def processar_juntas(planilhas, df_categorias, args):
+    """Processa as planilhas como uma única análise, fora da memória, e grava o resultado."""
+    print(f"{len(planilhas)} planilhas processadas juntas; limite de memória: {args.limite_memoria_mb} MB")
+    print(f"{'etapa':<12} {'linhas':>10} {'tempo (s)':>10}")
+    inicio = time.perf_counter()
+    blocos = ler_planilhas_em_blocos(planilhas, COLUNAS_ANALISE, header_row=args.header_analise)
+    try:
+        _, df_clientes_abc, medicoes = processar_fora_da_memoria(
+            blocos, df_categorias, limpar=not args.sem_limpeza, remover_duplicadas=not args.manter_duplicadas,
+            limite_memoria_mb=args.limite_memoria_mb, ao_informar=imprimir_informe,
+            saida=os.path.join(args.saida, "resultado"),
+        )
+    except LimiteMemoriaInsuficiente as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 1
+    t_gravar = time.perf_counter()
+    gravar_resultado(df_clientes_abc, os.path.join(args.saida, "clientes_abc.parquet"))
+    t_gravar = time.perf_counter() - t_gravar
+
+    # A etapa "historico" inclui a gravação do resultado
+    tempos = {medicao["etapa"]: medicao for medicao in medicoes}
+    for etapa in ETAPAS_EXTERNAS:
+        if etapa in tempos:
+            print(f"{etapa:<12} {tempos[etapa]['linhas_saida']:>10} {tempos[etapa]['segundos']:>10.2f}")
+    print(f"{'gravar':<12} {len(df_clientes_abc):>10} {t_gravar:>10.2f}")
+    total = time.perf_counter() - inicio
+    linhas = tempos["carregar"]["linhas_saida"]
+    print(f"{'total':<12} {linhas:>10} {total:>10.2f}")
+    print(f"vazão: {linhas / total:,.0f} linhas/s")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", help="Diretório com as planilhas de análise comercial")
+    parser.add_argument("--categorias", required=True, help="Planilha de classificação de produtos")
+    parser.add_argument("--saida", default="resultados", help="Diretório dos arquivos Parquet gerados")
+    parser.add_argument("--header-analise", type=int, default=0, help="Linha do cabeçalho das planilhas de análise")
+    parser.add_argument("--header-categorias", type=int, default=0,
+                        help="Linha do cabeçalho da planilha de categorias")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usa o cache em disco de planilhas")
+    parser.add_argument("--sem-limpeza", action="store_true", help="Não aplica a etapa de limpeza")
+    parser.add_argument("--manter-duplicadas", action="store_true",
+                        help="Não remove linhas repetidas por (Cliente, Código Produto, Dt Entrada)")
+    parser.add_argument("--juntar", action="store_true",
+                        help="Processa as planilhas juntas, como uma única análise, fora da memória")
+    parser.add_argument("--limite-memoria-mb", type=int, default=LIMITE_MEMORIA_MB,
+                        help="Memória de trabalho do processamento com --juntar")
+    args = parser.parse_args()
+
+    planilhas = listar_planilhas(args.entrada, ignorar=[args.categorias])
+    if not planilhas:
+        parser.error(f"Nenhuma planilha .xlsx encontrada em {args.entrada}")
+    os.makedirs(args.saida, exist_ok=True)
+
+    inicio = time.perf_counter()
+    df_categorias = carregar_categorias(args.categorias, args.header_categorias, usar_cache=not args.sem_cache)
+    print(f"Categorias: {len(df_categorias)} linhas ({time.perf_counter() - inicio:.2f} s)")
+    if args.juntar:
+        return processar_juntas(planilhas, df_categorias, args)
+
+    etapas = [etapa for etapa in ETAPAS if not (args.sem_limpeza and etapa == "limpar")]
+    print(f"{'arquivo':<30} {'linhas':>9} {'saída':>9} " + " ".join(f"{e:>10}" for e in etapas)
+          + f" {'gravar':>8} {'total (s)':>10}")
+
+    totais = dict.fromkeys(etapas + ["gravar"], 0.0)
+    linhas_lote = 0
+    falhas = 0
+    for caminho in planilhas:
+        nome = os.path.splitext(os.path.basename(caminho))[0]
+        try:
+            df_final, medicoes = processar_arquivo(
+                caminho, df_categorias, header_row=args.header_analise, usar_cache=not args.sem_cache,
+                limpar=not args.sem_limpeza, remover_duplicadas=not args.manter_duplicadas,
+                ao_informar=imprimir_informe,
+            )
+            t_gravar = time.perf_counter()
+            gravar_resultado(df_final, os.path.join(args.saida, f"{nome}.parquet"))
+            t_gravar = time.perf_counter() - t_gravar
+        except Exception as e:
+            falhas += 1
+            print(f"{nome[:30]:<30} erro: {e}", file=sys.stderr)
+            continue
+
+        tempos = {medicao["etapa"]: medicao["segundos"] for medicao in medicoes}
+        tempos["gravar"] = t_gravar
+        for etapa in totais:
+            totais[etapa] += tempos.get(etapa, 0.0)
+        linhas = medicoes[0]["linhas_saida"]
+        linhas_lote += linhas
+        print(f"{nome[:30]:<30} {linhas:>9} {len(df_final):>9} "
+              + " ".join(f"{tempos.get(e, 0.0):>10.2f}" for e in etapas)
+              + f" {t_gravar:>8.2f} {sum(tempos.values()):>10.2f}")
+
+    total = time.perf_counter() - inicio
+    print(f"{'total':<30} {linhas_lote:>9} {'':>9} " + " ".join(f"{totais[e]:>10.2f}" for e in etapas)
+          + f" {totais['gravar']:>8.2f} {total:>10.2f}")
+    print(f"{len(planilhas) - falhas} de {len(planilhas)} planilhas processadas; "
+          f"vazão: {linhas_lote / total:,.0f} linhas/s")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Tarefas executadas ao mesmo tempo e tarefas concluídas mantidas até serem retiradas
+MAX_TAREFAS_SIMULTANEAS = int(os.environ.get("TAREFAS_MAX_SIMULTANEAS", "2"))
+MAX_TAREFAS_GUARDADAS = 32
+
+# Estados de uma tarefa
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+CANCELADA = "cancelada"
+ERRO = "erro"
+ESTADOS_FINAIS = (CONCLUIDA, CANCELADA, ERRO)
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro da tarefa quando o cancelamento foi pedido."""
+
+
+class StatusTarefa:
+    """
+    Estado compartilhado entre a tarefa (em uma thread do executor) e a interface.
+
+    A tarefa informa a etapa e as mensagens com progredir e informar, que têm a mesma
+    assinatura dos callbacks ao_progresso e ao_informar de pipeline_comercial; ambos
+    verificam o pedido de cancelamento e levantam TarefaCancelada, então o cancelamento
+    acontece no próximo ponto em que a tarefa informa algo (entre as etapas). A interface
+    lê o estado com instantaneo.
+
+    Args:
+        id_tarefa: Identificador da tarefa
+        descricao: Descrição exibida na interface
+    """
+
+    def __init__(self, id_tarefa, descricao=""):
+        self.id = id_tarefa
+        self.descricao = descricao
+        self.estado = PENDENTE
+        self.etapa = None
+        self.progresso = 0.0
+        self.mensagens = []  # (mensagem, nivel)
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.iniciada_em = None
+        self.concluida_em = None
+        self._cancelar = threading.Event()
+        self._trava = threading.Lock()
+
+    @property
+    def cancelamento_pedido(self):
+        return self._cancelar.is_set()
+
+    @property
+    def finalizada(self):
+        return self.estado in ESTADOS_FINAIS
+
+    def pedir_cancelamento(self):
+        self._cancelar.set()
+
+    def verificar_cancelamento(self):
+        """Levanta TarefaCancelada se o cancelamento foi pedido."""
+        if self._cancelar.is_set():
+            raise TarefaCancelada(self.id)
+
+    def progredir(self, etapa, indice, total):
+        """Registra o início de uma etapa (callback ao_progresso)."""
+        self.verificar_cancelamento()
+        with self._trava:
+            self.etapa = etapa
+            self.progresso = indice / total if total else 0.0
+
+    def informar(self, mensagem, nivel="info"):
+        """Registra uma mensagem da tarefa (callback ao_informar)."""
+        self.verificar_cancelamento()
+        with self._trava:
+            self.mensagens.append((mensagem, nivel))
+
+    def _mudar_estado(self, estado, resultado=None, erro=None):
+        with self._trava:
+            self.estado = estado
+            if estado == EXECUTANDO:
+                self.iniciada_em = time.time()
+            else:
+                self.resultado = resultado
+                self.erro = erro
+                self.concluida_em = time.time()
+                if estado == CONCLUIDA:
+                    self.progresso = 1.0
+
+    def instantaneo(self):
+        """Cópia consistente do estado atual (sem o resultado), para exibição."""
+        with self._trava:
+            fim = self.concluida_em or time.time()
+            return {
+                "id": self.id,
+                "descricao": self.descricao,
+                "estado": self.estado,
+                "etapa": self.etapa,
+                "progresso": self.progresso,
+                "mensagens": list(self.mensagens),
+                "erro": self.erro,
+                "cancelamento_pedido": self._cancelar.is_set(),
+                "segundos": fim - self.iniciada_em if self.iniciada_em else 0.0,
+            }
+
+
+class ExecutorTarefas:
+    """
+    Executa tarefas em segundo plano em um pool de threads, cada uma com um identificador.
+
+    A função da tarefa recebe o StatusTarefa como primeiro argumento; o valor retornado fica
+    em status.resultado e uma exceção vira o estado "erro" (com o traceback em status.erro).
+    Tarefas concluídas ficam guardadas até serem retiradas com descartar (as mais antigas são
+    descartadas além de max_guardadas).
+
+    Args:
+        max_simultaneas: Número de threads do pool
+        max_guardadas: Tarefas finalizadas mantidas à espera de serem retiradas
+    """
+
+    def __init__(self, max_simultaneas=MAX_TAREFAS_SIMULTANEAS, max_guardadas=MAX_TAREFAS_GUARDADAS):
+        self.max_guardadas = max_guardadas
+        self._pool = ThreadPoolExecutor(max_workers=max_simultaneas, thread_name_prefix="tarefa")
+        self._tarefas = OrderedDict()  # id -> (StatusTarefa, Future)
+        self._trava = threading.Lock()
+
+    def submeter(self, funcao, *args, descricao="", **kwargs):
+        """
+        Agenda funcao(status, *args, **kwargs) e retorna o identificador da tarefa.
+        """
+        status = StatusTarefa(uuid.uuid4().hex, descricao)
+
+        def executar():
+            if status.cancelamento_pedido:
+                status._mudar_estado(CANCELADA)
+                return
+            status._mudar_estado(EXECUTANDO)
+            try:
+                resultado = funcao(status, *args, **kwargs)
+            except TarefaCancelada:
+                status._mudar_estado(CANCELADA)
+            except Exception as e:
+                status._mudar_estado(ERRO, erro=f"{e}\n{traceback.format_exc()}")
+            else:
+                status._mudar_estado(CONCLUIDA, resultado=resultado)
+
+        with self._trava:
+            self._tarefas[status.id] = (status, self._pool.submit(executar))
+            self._limitar_guardadas()
+        return status.id
+
+    def _limitar_guardadas(self):
+        finalizadas = [id_tarefa for id_tarefa, (status, _) in self._tarefas.items() if status.finalizada]
+        for id_tarefa in finalizadas[:max(len(finalizadas) - self.max_guardadas, 0)]:
+            del self._tarefas[id_tarefa]
+
+    def status(self, id_tarefa):
+        """StatusTarefa da tarefa, ou None se não existe (ou já foi descartada)."""
+        with self._trava:
+            tarefa = self._tarefas.get(id_tarefa)
+        return None if tarefa is None else tarefa[0]
+
+    def cancelar(self, id_tarefa):
+        """
+        Pede o cancelamento da tarefa. Uma tarefa ainda na fila não chega a ser executada;
+        uma em execução para no próximo ponto em que informa progresso.
+
+        Returns:
+            True se a tarefa existe e ainda não tinha terminado
+        """
+        status = self.status(id_tarefa)
+        if status is None or status.finalizada:
+            return False
+        status.pedir_cancelamento()
+        return True
+
+    def descartar(self, id_tarefa):
+        """Remove a tarefa do executor (liberando o resultado), cancelando-a se ainda não terminou."""
+        self.cancelar(id_tarefa)
+        with self._trava:
+            self._tarefas.pop(id_tarefa, None)
+
+    def tarefas_ativas(self):
+        """Número de tarefas na fila ou em execução."""
+        with self._trava:
+            return sum(1 for status, _ in self._tarefas.values() if not status.finalizada)
+
+    def encerrar(self, esperar=True):
+        """Cancela as tarefas pendentes e encerra o pool."""
+        with self._trava:
+            ids = list(self._tarefas)
+        for id_tarefa in ids:
+            self.cancelar(id_tarefa)
+        self._pool.shutdown(wait=esperar)
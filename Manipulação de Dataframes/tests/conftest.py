@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam no diretório acima de tests/ (não formam um pacote)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dados_sinteticos import gerar_analise, gerar_categorias  # noqa: E402
+from esquema_dados import ESQUEMA_ANALISE, ESQUEMA_CATEGORIAS, aplicar_esquema  # noqa: E402
+
+
+def _sem_tipos(df):
+    return df
+
+
+@pytest.fixture(params=["bruto", "tipado"])
+def dados(request):
+    """
+    Análise comercial (sem tipos) e categorias sintéticas, com a função que prepara a
+    análise como o dashboard a recebe: sem tipos ou com os tipos de esquema_dados.
+    """
+    df_analise = gerar_analise(4000, semente=7)
+    df_categorias = gerar_categorias(df_analise, semente=7)
+    if request.param == "bruto":
+        return df_analise, df_categorias, _sem_tipos
+    return df_analise, aplicar_esquema(df_categorias, ESQUEMA_CATEGORIAS), \
+        lambda df: aplicar_esquema(df, ESQUEMA_ANALISE)
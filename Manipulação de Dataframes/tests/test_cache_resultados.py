@@ -0,0 +1,48 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from cache_resultados import CacheResultados, impressao_digital, memorizar
+from tarefas import TarefaCancelada
+
+
+def test_impressao_digital_muda_com_qualquer_valor(dados):
+    df_analise, _, tipar = dados
+    df = tipar(df_analise)
+    assert impressao_digital(df.copy()) == impressao_digital(df)
+    assert impressao_digital(df.iloc[10:]) == impressao_digital(df.iloc[10:].copy())
+
+    for col in range(len(df.columns)):
+        alterado = df.copy()
+        alterado.iloc[1237, col] = df.iloc[1238, col]
+        if not alterado.iloc[:, col].equals(df.iloc[:, col]):
+            assert impressao_digital(alterado) != impressao_digital(df), df.columns[col]
+
+
+def test_espera_por_outra_chamada_pode_ser_cancelada(tmp_path):
+    cache = CacheResultados(diretorio=str(tmp_path))
+    iniciou, liberar = threading.Event(), threading.Event()
+
+    @memorizar(lambda: cache)
+    def calcular(n, _verificar_cancelamento=None):
+        iniciou.set()
+        liberar.wait(10)
+        return pd.DataFrame({"n": [n]})
+
+    lider = threading.Thread(target=calcular, args=(1,))
+    lider.start()
+    iniciou.wait(10)
+
+    def verificar():
+        raise TarefaCancelada("espera")
+
+    inicio = time.perf_counter()
+    with pytest.raises(TarefaCancelada):
+        calcular(1, _verificar_cancelamento=verificar)
+    assert time.perf_counter() - inicio < 5
+
+    liberar.set()
+    lider.join(10)
+    pd.testing.assert_frame_equal(calcular(1), pd.DataFrame({"n": [1]}))
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from cache_excel import gravar_parquet, ler_parquet
+from dados_sinteticos import gerar_analise, gerar_categorias
+from dimensoes import ProductDimension
+from esquema_dados import ESQUEMA_ANALISE, ESQUEMA_CATEGORIAS, aplicar_esquema
+from motor_abc import MEDIDAS, CurvasABC, abc_janela_movel
+from pipeline_comercial import executar_pipeline
+
+
+@pytest.fixture(scope="module")
+def brutos_e_tipados():
+    """Os mesmos dados sintéticos sem tipos e com os tipos de esquema_dados."""
+    df_analise = gerar_analise(4000, semente=7)
+    df_categorias = gerar_categorias(df_analise, semente=7)
+    return (df_analise, df_categorias), \
+        (aplicar_esquema(df_analise, ESQUEMA_ANALISE), aplicar_esquema(df_categorias, ESQUEMA_CATEGORIAS))
+
+
+@pytest.mark.parametrize("limpar", [False, True])
+def test_pipeline_igual_com_e_sem_tipos(brutos_e_tipados, limpar):
+    brutos, tipados = brutos_e_tipados
+    df_tipado, _ = executar_pipeline(*tipados, limpar=limpar)
+    df_bruto, _ = executar_pipeline(*brutos, limpar=limpar)
+    pd.testing.assert_frame_equal(df_tipado, df_bruto)
+
+
+def test_curvas_abc_iguais_com_e_sem_tipos(brutos_e_tipados):
+    (bruto, categorias_brutas), (tipado, categorias_tipadas) = brutos_e_tipados
+    curvas_brutas = CurvasABC(bruto, ProductDimension(categorias_brutas))
+    curvas_tipadas = CurvasABC(tipado, ProductDimension(categorias_tipadas))
+    for segmento in curvas_brutas.segmentos:
+        for medida in MEDIDAS:
+            # Com os tipos, "Cliente" volta com o tipo categórico da coluna de origem
+            classificacao = curvas_tipadas.classificar(segmento, medida).astype({"Cliente": "int64"})
+            pd.testing.assert_frame_equal(classificacao, curvas_brutas.classificar(segmento, medida))
+
+
+def test_abc_janela_movel_igual_com_e_sem_tipos(brutos_e_tipados):
+    (bruto, _), (tipado, _) = brutos_e_tipados
+    pd.testing.assert_frame_equal(abc_janela_movel(tipado), abc_janela_movel(bruto))
+
+
+def test_tipos_preservados_no_parquet(brutos_e_tipados, tmp_path):
+    _, (tipado, categorias) = brutos_e_tipados
+    for df in (tipado, categorias):
+        caminho = str(tmp_path / "dados.parquet")
+        gravar_parquet(df, caminho)
+        pd.testing.assert_frame_equal(ler_parquet(caminho), df)
+
+
+def test_coluna_mista_preservada_no_parquet(tmp_path):
+    df = pd.DataFrame({"Código Produto": pd.Series([101, "A10", None, 7.5], dtype=object),
+                       "Nome Cliente": ["Ana", "", None, "Bruno"]})
+    caminho = str(tmp_path / "dados.parquet")
+    gravar_parquet(df, caminho)
+    lido = ler_parquet(caminho)
+    assert lido["Código Produto"].tolist() == [101, "A10", None, 7.5]
+    pd.testing.assert_series_equal(lido["Nome Cliente"], df["Nome Cliente"], check_dtype=False)
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from dimensoes import ClientDimension, ProductDimension
+from execucao_particionada import executar_particionado, particoes_por_chave
+from motor_analise import classificar_clientes_abc, historico_produtos_clientes, preparar_analise
+from pipeline_comercial import executar_pipeline
+
+
+def test_particoes_por_chave_agrupa_a_mesma_chave():
+    chaves = pd.Series([3, 1, 3, 2, 1, 3])
+    particoes = particoes_por_chave(chaves, 2)
+    for chave in chaves.unique():
+        assert len(set(particoes[(chaves == chave).to_numpy()])) == 1
+
+
+def test_pipeline_em_dois_processos_igual_ao_serial(dados):
+    df_analise, df_categorias, tipar = dados
+    df_analise = tipar(df_analise)
+    df_serial, _ = executar_pipeline(df_analise, df_categorias)
+    df_particionado, _ = executar_pipeline(df_analise, df_categorias, processos=2)
+    pd.testing.assert_frame_equal(df_particionado, df_serial)
+
+
+def test_historico_produtos_clientes_em_dois_processos(dados):
+    df_analise, df_categorias, tipar = dados
+    df_analise = preparar_analise(tipar(df_analise))
+    argumentos = (ClientDimension(classificar_clientes_abc(df_analise)), ProductDimension(df_categorias))
+    ordem = ["Cliente", "Código Produto"]
+    df_serial = historico_produtos_clientes(df_analise, *argumentos).sort_values(ordem, ignore_index=True)
+    df_particionado = executar_particionado(df_analise, historico_produtos_clientes, argumentos, processos=2) \
+        .sort_values(ordem, ignore_index=True)
+    pd.testing.assert_frame_equal(df_particionado, df_serial)
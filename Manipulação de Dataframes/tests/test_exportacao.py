@@ -0,0 +1,147 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import exportacao
+from esquema_dados import aplicar_esquema
+from exportacao import PLANILHA_DADOS, PLANILHA_HISTORICO, exportar, nome_arquivo, separar_historico
+from pipeline_comercial import executar_pipeline
+
+
+@pytest.fixture
+def df_final(dados):
+    df_analise, df_categorias, tipar = dados
+    df_final, _ = executar_pipeline(tipar(df_analise.iloc[:600]), df_categorias)
+    return df_final
+
+
+@pytest.fixture(params=["xlsxwriter", "openpyxl"])
+def biblioteca_xlsx(request, monkeypatch):
+    """Exporta com xlsxwriter e também com o modo write_only do openpyxl (sem xlsxwriter)."""
+    if request.param == "openpyxl":
+        monkeypatch.setattr(exportacao, "xlsxwriter", None)
+    return request.param
+
+
+def _sem_listas():
+    """Colunas escalares com ausentes, textos vazios, negativos e uma coluna monetária tipada."""
+    df = pd.DataFrame({
+        "Cliente": [3, 1, 2, 5, 4],
+        "Nome Cliente": ["Ana", "", None, "Érica; \"aspas\"", "Bruno"],
+        "Valor Orçado": [1234.5, -0.01, np.nan, 1e9, 0.0],
+        "Última Data": pd.to_datetime(["2024-01-31", None, "2023-12-01", "2022-06-15", "2024-02-29"]),
+        "Prob.Fech.": [0.5, 100.0, np.nan, 25.0, -3.25],
+    })
+    return aplicar_esquema(df, {"Valor Orçado": "moeda"})
+
+
+def _comparavel(df):
+    """Valores como objetos Python comparáveis após a leitura: ausentes e textos vazios como None,
+    números como float e datas como Timestamp."""
+    df = df.copy()
+    for col in df.columns:
+        if exportacao.eh_moeda(df[col]):
+            df[col] = df[col].astype("float64")
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            df[col] = df[col].astype("float64")
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].astype("datetime64[ns]")
+    df = df.astype(object).where(df.notna(), None)
+    return df.map(lambda valor: None if isinstance(valor, str) and valor == "" else valor) \
+        .reset_index(drop=True)
+
+
+def _ler_xlsx(conteudo):
+    return pd.read_excel(io.BytesIO(conteudo), sheet_name=None)
+
+
+def _ler_csv(arquivo, esperado):
+    """Lê um CSV exportado com as datas e textos do DataFrame esperado."""
+    datas = [col for col in esperado.columns if pd.api.types.is_datetime64_any_dtype(esperado[col])]
+    textos = {col: str for col in esperado.columns if pd.api.types.is_string_dtype(esperado[col])
+              or esperado[col].dtype == object}
+    return pd.read_csv(arquivo, sep=exportacao.SEPARADOR_CSV, decimal=exportacao.DECIMAL_CSV,
+                       encoding="utf-8-sig", parse_dates=datas, dtype=textos, keep_default_na=False,
+                       na_values={col: [""] for col in esperado.columns})
+
+
+def test_xlsx_sem_listas(biblioteca_xlsx):
+    df = _sem_listas()
+    planilhas = _ler_xlsx(exportar(df, "xlsx"))
+    assert list(planilhas) == [PLANILHA_DADOS]
+    pd.testing.assert_frame_equal(_comparavel(planilhas[PLANILHA_DADOS]), _comparavel(df))
+
+
+def test_xlsx_com_historico(df_final, biblioteca_xlsx):
+    principal, historico = separar_historico(df_final)
+    planilhas = _ler_xlsx(exportar(df_final, "xlsx"))
+    assert list(planilhas) == [PLANILHA_DADOS, PLANILHA_HISTORICO]
+    pd.testing.assert_frame_equal(_comparavel(planilhas[PLANILHA_DADOS]), _comparavel(principal))
+    pd.testing.assert_frame_equal(_comparavel(planilhas[PLANILHA_HISTORICO]), _comparavel(historico))
+
+
+def test_xlsx_dividido_no_limite_de_linhas(df_final, biblioteca_xlsx, monkeypatch):
+    monkeypatch.setattr(exportacao, "LINHAS_POR_PLANILHA", 100)
+    principal, historico = separar_historico(df_final)
+    planilhas = _ler_xlsx(exportar(df_final, "xlsx"))
+
+    for nome, esperado in [(PLANILHA_DADOS, principal), (PLANILHA_HISTORICO, historico)]:
+        partes = [nome] + [f"{nome} ({i})" for i in range(2, -(-len(esperado) // 100) + 1)]
+        assert [titulo for titulo in planilhas if titulo.startswith(nome)] == partes
+        assert all(len(planilhas[titulo]) == 100 for titulo in partes[:-1])
+        lido = pd.concat([planilhas[titulo] for titulo in partes], ignore_index=True)
+        pd.testing.assert_frame_equal(_comparavel(lido), _comparavel(esperado))
+
+
+def test_csv_sem_listas():
+    df = _sem_listas()
+    conteudo = exportar(df, "csv")
+    assert nome_arquivo(df, "csv", "analise") == ("analise.csv", "text/csv")
+    pd.testing.assert_frame_equal(_comparavel(_ler_csv(io.BytesIO(conteudo), df)), _comparavel(df))
+
+
+def test_csv_com_historico_em_zip(df_final):
+    principal, historico = separar_historico(df_final)
+    conteudo = exportar(df_final, "csv")
+    assert nome_arquivo(df_final, "csv", "analise") == ("analise.zip", exportacao.MIME_ZIP)
+
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo_zip:
+        assert arquivo_zip.namelist() == ["dados.csv", "historico.csv"]
+        for nome, esperado in [("dados.csv", principal), ("historico.csv", historico)]:
+            with arquivo_zip.open(nome) as arquivo:
+                lido = _ler_csv(arquivo, esperado)
+            pd.testing.assert_frame_equal(_comparavel(lido), _comparavel(esperado))
+
+
+def test_parquet_mantem_as_listas(df_final):
+    tabela = pq.read_table(io.BytesIO(exportar(df_final, "parquet")))
+    assert tabela.column_names == list(df_final.columns)
+    listas = exportacao.colunas_lista(df_final)
+    assert listas
+    for col in listas:
+        assert tabela.column(col).to_pylist() == pa.array(df_final[col].array).to_pylist(), col
+    pd.testing.assert_frame_equal(tabela.drop_columns(listas).to_pandas(), df_final.drop(columns=listas),
+                                  check_dtype=False)
+
+
+def test_separar_historico_um_elemento_por_linha(df_final):
+    principal, historico = separar_historico(df_final)
+    comprimentos = df_final["Dt Entrada"].list.len().to_numpy()
+    assert len(historico) == comprimentos.sum()
+    np.testing.assert_array_equal(historico.groupby(["Cliente", "Código Produto"], sort=False).size().to_numpy(),
+                                  comprimentos)
+    assert (historico.groupby(["Cliente", "Código Produto"], sort=False)["Ordem"].max().to_numpy()
+            == comprimentos).all()
+    assert not exportacao.colunas_lista(principal)
+
+
+def test_parquet_coluna_mista_como_texto():
+    df = pd.DataFrame({"Código Produto": pd.Series([101, "A10", None], dtype=object), "UF": ["SP", "MG", "RJ"]})
+    tabela = pq.read_table(io.BytesIO(exportar(df, "parquet")))
+    assert tabela.column("Código Produto").to_pylist() == ["101", "A10", None]
+    assert tabela.column("UF").to_pylist() == ["SP", "MG", "RJ"]
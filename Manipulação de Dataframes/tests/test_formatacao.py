@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from esquema_dados import aplicar_esquema
+from formatacao import formatar_data, formatar_moeda, formatar_percentual
+
+# Troca os separadores do formato americano ("1,234.50") pelos brasileiros ("1.234,50")
+_SEPARADORES_BR = str.maketrans(",.", ".,")
+
+VALORES = pd.Series([0.0, -0.0, 0.004, -0.004, 0.005, 1.0, -1.0, 999.995, 1000.0, -1234.5, 1234567.891,
+                     -987654321.12, 1e12, -1e12, 123456789012345.67, np.nan, None], dtype="float64")
+
+
+def _sem_zero_negativo(textos):
+    """Negativos que arredondam para zero saem sem sinal na formatação vetorizada ("R$ 0,00")."""
+    return textos.str.replace(r"^-(R\$ )?(0,00%?)$", r"\1\2", regex=True)
+
+
+def _moeda_por_linha(serie):
+    """Formatação de moeda com apply, como no notebook de análise."""
+    return _sem_zero_negativo(serie.apply(
+        lambda x: ("-" if x < 0 else "") + "R$ " + "{:,.2f}".format(abs(x)).translate(_SEPARADORES_BR)
+        if not pd.isnull(x) else ""))
+
+
+def _percentual_por_linha(serie):
+    return _sem_zero_negativo(serie.apply(
+        lambda x: "{:,.2f}%".format(x).translate(_SEPARADORES_BR) if not pd.isnull(x) else ""))
+
+
+def _valores_aleatorios():
+    rng = np.random.default_rng(3)
+    valores = rng.lognormal(8, 3, 5000).round(2) * rng.choice([-1, 1], 5000)
+    valores[::97] = np.nan
+    return pd.Series(valores)
+
+
+@pytest.mark.parametrize("serie", [VALORES, _valores_aleatorios()], ids=["casos", "aleatorios"])
+def test_moeda_igual_ao_apply(serie):
+    pd.testing.assert_series_equal(formatar_moeda(serie), _moeda_por_linha(serie), check_dtype=False)
+
+
+def test_moeda_de_coluna_tipada_igual_ao_apply():
+    df = aplicar_esquema(pd.DataFrame({"Valor Orçado": _valores_aleatorios()}), {"Valor Orçado": "moeda"})
+    esperado = _moeda_por_linha(_valores_aleatorios())
+    pd.testing.assert_series_equal(formatar_moeda(df["Valor Orçado"]), esperado, check_dtype=False,
+                                   check_names=False)
+
+
+@pytest.mark.parametrize("serie", [VALORES, _valores_aleatorios() / 1000], ids=["casos", "aleatorios"])
+def test_percentual_igual_ao_apply(serie):
+    pd.testing.assert_series_equal(formatar_percentual(serie), _percentual_por_linha(serie), check_dtype=False)
+
+
+def test_data_igual_ao_strftime():
+    serie = pd.Series([pd.Timestamp("2024-12-22"), pd.Timestamp("1999-01-01"), pd.NaT,
+                       pd.Timestamp("2030-06-15 13:45")])
+    pd.testing.assert_series_equal(formatar_data(serie), serie.dt.strftime("%d/%m/%Y").fillna(""), check_dtype=False)
+    assert formatar_data(pd.Series(["2024-02-29", "não é data", None])).tolist() == ["29/02/2024", "", ""]
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from historico_pendentes import _gravar_manifesto, _ler_manifesto, consultar_historico, registrar_semana
+
+
+def _snapshot(valor):
+    return pd.DataFrame({"Cliente": [valor], "Valor Proposta": [float(valor)]})
+
+
+def test_snapshot_mais_recente_no_mesmo_segundo(tmp_path):
+    diretorio = str(tmp_path)
+    # Vários registros da mesma semana dentro do mesmo segundo: vale o último registrado
+    for valor in range(5):
+        registrar_semana(f"arquivo {valor}".encode(), "2025-W09", _snapshot(valor), diretorio=diretorio)
+
+    df = consultar_historico(diretorio=diretorio)
+    assert df["Cliente"].tolist() == [4]
+
+
+def test_manifesto_sem_sequencia(tmp_path):
+    diretorio = str(tmp_path)
+    registrar_semana(b"antigo", "2025-W09", _snapshot(1), diretorio=diretorio)
+    # Manifesto gravado antes do número de sequência
+    manifesto = _ler_manifesto(diretorio)
+    for entrada in manifesto.values():
+        del entrada["sequencia"]
+        entrada["registrado_em"] = "2099-01-01T00:00:00"
+    _gravar_manifesto(diretorio, manifesto)
+
+    registrar_semana(b"novo", "2025-W09", _snapshot(2), diretorio=diretorio)
+    assert consultar_historico(diretorio=diretorio)["Cliente"].tolist() == [2]
@@ -0,0 +1,113 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_filtros import COLUNAS_FILTRO, LIMIAR_DENSO, TODOS, IndiceFiltros
+from pipeline_comercial import executar_pipeline
+
+
+def _gerar(semente, n=5000):
+    """
+    Colunas com valores frequentes (acima de 1/LIMIAR_DENSO das linhas, com bitmap) e raros
+    (só lista de posições), incluindo textos vazios, ausentes e uma coluna de tipos misturados.
+    """
+    rng = np.random.default_rng(semente)
+
+    def coluna(n_valores, extras):
+        pesos = 1.0 / np.arange(1, n_valores + len(extras) + 1) ** 1.3
+        valores = np.array([f"V{i}" for i in range(n_valores)] + extras, dtype=object)
+        return valores[rng.choice(len(valores), n, p=pesos / pesos.sum())]
+
+    df = pd.DataFrame({
+        "Negócio": coluna(4, ["", np.nan]),
+        "Grupo": coluna(40, ["", np.nan]),
+        "Subgrupo": coluna(200, [np.nan]),
+        "Nome Cliente": coluna(300, [""]),
+        "Último Consultor": coluna(6, [7, "7", np.nan]),
+    })
+    return df
+
+
+def _valores_teste(df, coluna, rng, quantidade=4):
+    """Valores para filtrar: frequentes e raros da coluna, vazio, ausente, inexistente e TODOS."""
+    contagens = df[coluna].value_counts()
+    raros = contagens[contagens * LIMIAR_DENSO <= len(df)].index
+    densos = contagens[contagens * LIMIAR_DENSO > len(df)].index
+    return ([TODOS, "", np.nan, "inexistente"] + list(rng.choice(densos, min(quantidade, len(densos)), replace=False))
+            + list(rng.choice(raros, min(quantidade, len(raros)), replace=False)))
+
+
+def _mascara(df, filtros, exceto=None):
+    """Máscara booleana como no filtrar_dataframe antigo: uma comparação de igualdade por filtro."""
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, valor in filtros.items():
+        if coluna != exceto and not (isinstance(valor, str) and valor == TODOS):
+            mascara &= (df[coluna] == valor).to_numpy()
+    return mascara
+
+
+def _combinacoes(df, semente, quantidade=400):
+    rng = np.random.default_rng(semente)
+    opcoes = {coluna: _valores_teste(df, coluna, rng) for coluna in COLUNAS_FILTRO}
+    for _ in range(quantidade):
+        # Cerca de metade das colunas sem filtro, para combinar de 0 a 5 filtros ativos
+        yield {coluna: (TODOS if rng.random() < 0.5 else valores[rng.integers(len(valores))])
+               for coluna, valores in opcoes.items()}
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_filtrar_igual_a_mascara(semente):
+    df = _gerar(semente)
+    indice = IndiceFiltros(df)
+    assert any(indice.colunas[coluna].bitmaps for coluna in COLUNAS_FILTRO)
+    for filtros in _combinacoes(df, semente):
+        posicoes = indice.filtrar(filtros)
+        np.testing.assert_array_equal(posicoes, np.flatnonzero(_mascara(df, filtros)), err_msg=str(filtros))
+
+
+def test_filtrar_todos_os_pares_de_valores_frequentes_e_raros():
+    df = _gerar(7)
+    indice = IndiceFiltros(df)
+    rng = np.random.default_rng(7)
+    negocios = _valores_teste(df, "Negócio", rng)
+    grupos = _valores_teste(df, "Grupo", rng)
+    for negocio, grupo in itertools.product(negocios, grupos):
+        filtros = {"Negócio": negocio, "Grupo": grupo}
+        np.testing.assert_array_equal(indice.filtrar(filtros), np.flatnonzero(_mascara(df, filtros)))
+
+
+def test_filtrar_resultado_do_pipeline(dados):
+    df_analise, df_categorias, tipar = dados
+    df_final, _ = executar_pipeline(tipar(df_analise), df_categorias)
+    indice = IndiceFiltros(df_final)
+    for filtros in _combinacoes(df_final, 0, quantidade=100):
+        np.testing.assert_array_equal(indice.filtrar(filtros), np.flatnonzero(_mascara(df_final, filtros)))
+
+
+def _facetas_esperadas(df, filtros):
+    """Contagens de cada coluna sobre as linhas que atendem a todos os outros filtros."""
+    return {coluna: df.loc[_mascara(df, filtros, exceto=coluna), coluna].value_counts(dropna=True)
+            for coluna in COLUNAS_FILTRO}
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_facetas_iguais_a_value_counts(semente):
+    df = _gerar(semente)
+    indice = IndiceFiltros(df)
+    for filtros in _combinacoes(df, semente, quantidade=150):
+        facetas = indice.facetas(filtros)
+        for coluna, esperado in _facetas_esperadas(df, filtros).items():
+            assert facetas[coluna].to_dict() == esperado.to_dict(), (coluna, filtros)
+            assert (facetas[coluna] > 0).all()
+
+
+def test_facetas_do_resultado_do_pipeline(dados):
+    df_analise, df_categorias, tipar = dados
+    df_final, _ = executar_pipeline(tipar(df_analise), df_categorias)
+    indice = IndiceFiltros(df_final)
+    for filtros in _combinacoes(df_final, 1, quantidade=50):
+        facetas = indice.facetas(filtros)
+        for coluna, esperado in _facetas_esperadas(df_final, filtros).items():
+            assert facetas[coluna].to_dict() == esperado.to_dict(), (coluna, filtros)
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from dados_sinteticos import gravar_xlsx
+from leitor_xlsx import COLUNAS_ANALISE, ler_xlsx_colunas
+
+
+@pytest.fixture
+def planilha(dados):
+    df_analise, _, _ = dados
+    return df_analise.iloc[:300], gravar_xlsx(df_analise.iloc[:300])
+
+
+@pytest.mark.parametrize("max_linhas", [0, 1, 50, 120, 300, 1000])
+def test_max_linhas_igual_as_primeiras_linhas(planilha, max_linhas):
+    _, conteudo = planilha
+    completo = ler_xlsx_colunas(conteudo, COLUNAS_ANALISE)
+    limitado = ler_xlsx_colunas(conteudo, COLUNAS_ANALISE, tamanho_bloco=50, max_linhas=max_linhas)
+    pd.testing.assert_frame_equal(limitado, completo.head(max_linhas), check_dtype=max_linhas > 0)
+
+
+def test_max_linhas_conta_as_linhas_do_filtro(planilha):
+    df, conteudo = planilha
+    uf = df["UF"].iloc[0]
+    filtrado = ler_xlsx_colunas(conteudo, ["Cliente", "UF"], filtro={"UF": uf}, max_linhas=10)
+    assert len(filtrado) == min(10, int((df["UF"] == uf).sum()))
+    assert (filtrado["UF"] == uf).all()
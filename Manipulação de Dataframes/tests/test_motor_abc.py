@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from motor_abc import GERAL, MEDIDAS, CurvasABC, abc_janela_movel, classes_abc, valores_em_centavos
+
+LIMITES = [(80, 95), (1, 2), (50, 99), (99, 99)]
+
+
+def _gerar(semente, n=300):
+    """Orçamentos com ~10% de valores negativos (créditos/devoluções), um segmento de total
+    zero ("Zero") e um de total negativo ("Negativo")."""
+    rng = np.random.default_rng(semente)
+    valores = rng.lognormal(6, 1.5, n).round(2)
+    negativos = rng.random(n) < 0.1
+    valores[negativos] *= -rng.uniform(0.5, 3, negativos.sum())
+    df = pd.DataFrame({
+        "Cliente": rng.integers(1, 40, n),
+        "Código Produto": rng.choice([f"P{i}" for i in range(15)], n),
+        "Valor Orçado": valores,
+        "UF": rng.choice(["SP", "MG", "RJ", "Zero", "Negativo"], n),
+    })
+    df.loc[df["UF"] == "Zero", "Valor Orçado"] = 0.0
+    df.loc[df["UF"] == "Negativo", "Valor Orçado"] = -df.loc[df["UF"] == "Negativo", "Valor Orçado"].abs()
+    return df
+
+
+def _curva_por_grupo(df, segmento, medida):
+    """Curva de referência: groupby por (segmento, cliente) e cumsum por segmento."""
+    df = df.assign(Segmento=GERAL if segmento is None else df[segmento],
+                   centavos=np.round(df["Valor Orçado"] * 100).astype("int64"))
+    por_cliente = df.groupby(["Segmento", "Cliente"]).agg(
+        valor=("centavos", "sum"), orcamentos=("centavos", "size"), produtos=("Código Produto", "nunique"),
+    ).reset_index()
+    partes = []
+    for _, grupo in por_cliente.groupby("Segmento", sort=True):
+        grupo = grupo.sort_values([medida, "Cliente"], ascending=[False, True], kind="stable")
+        total = grupo[medida].sum()
+        acumulado = (grupo[medida].cumsum() / total * 100).to_numpy() if total > 0 else np.full(len(grupo), 100.0)
+        partes.append(grupo.assign(acumulado=acumulado))
+    return pd.concat(partes, ignore_index=True)
+
+
+@pytest.mark.parametrize("semente", range(40))
+def test_igual_a_referencia_por_grupo(semente):
+    df = _gerar(semente)
+    curvas = CurvasABC(df, segmentos=["UF"])
+    for segmento in curvas.segmentos:
+        for medida in MEDIDAS:
+            curva = _curva_por_grupo(df, segmento, medida)
+            for limite_a, limite_b in LIMITES:
+                esperado = curva.assign(ABC=classes_abc(curva["acumulado"].to_numpy(), limite_a, limite_b))
+                obtido = curvas.classificar(segmento, medida, limite_a, limite_b)
+                assert obtido["Segmento"].tolist() == esperado["Segmento"].tolist()
+                assert obtido["Cliente"].tolist() == esperado["Cliente"].tolist()
+                np.testing.assert_allclose(obtido["Percentual Acumulado"], esperado["acumulado"])
+                assert obtido["ABC"].tolist() == esperado["ABC"].tolist(), (segmento, medida, limite_a, limite_b)
+
+                resumo = curvas.resumo(segmento, medida, limite_a, limite_b).set_index("Segmento")
+                contagens = esperado.groupby(["Segmento", "ABC"]).size().unstack(fill_value=0)
+                for classe in "ABC":
+                    quantidade = contagens[classe] if classe in contagens else 0
+                    assert (resumo[f"Clientes {classe}"] == quantidade).all(), (segmento, medida, classe)
+                assert (resumo["Clientes"] == esperado.groupby("Segmento").size()).all()
+
+
+def _abc_por_janela(df, meses_janela, limite_a=80, limite_b=95):
+    """Classes de referência: para cada mês, groupby por cliente das linhas da janela e cumsum."""
+    datas = pd.to_datetime(df["Dt Entrada"], errors="coerce")
+    df = df.assign(mes=datas.dt.to_period("M"), centavos=valores_em_centavos(df["Valor Orçado"]))
+    df = df[datas.notna() & df["Cliente"].notna()]
+    classes = {}
+    for mes in pd.period_range(df["mes"].min(), df["mes"].max(), freq="M"):
+        janela = df[(df["mes"] <= mes) & (df["mes"] > mes - meses_janela)]
+        por_cliente = janela.groupby("Cliente", observed=True)["centavos"].sum()
+        por_cliente = por_cliente.sort_values(ascending=False, kind="stable")
+        total = por_cliente.sum()
+        acumulado = (por_cliente.cumsum() / total * 100).to_numpy()
+        classes[mes] = pd.Series(classes_abc(acumulado, limite_a, limite_b) if total > 0 else "C",
+                                 index=por_cliente.index, dtype=object)
+    return classes
+
+
+def _com_negativos(df_analise):
+    """Cópia com créditos/devoluções (valores negativos) e algumas datas ausentes."""
+    df = df_analise.copy()
+    rng = np.random.default_rng(5)
+    negativos = rng.random(len(df)) < 0.1
+    df.loc[negativos, "Valor Orçado"] = -df.loc[negativos, "Valor Orçado"] * rng.uniform(0.5, 3, negativos.sum())
+    df.loc[rng.random(len(df)) < 0.02, "Dt Entrada"] = pd.NaT
+    return df
+
+
+@pytest.mark.parametrize("meses_janela", [1, 3, 12])
+@pytest.mark.parametrize("negativos", [False, True])
+def test_abc_janela_movel_igual_a_referencia_por_janela(dados, meses_janela, negativos):
+    df_analise, _, tipar = dados
+    df = tipar(_com_negativos(df_analise) if negativos else df_analise)
+    matriz = abc_janela_movel(df, meses_janela)
+    esperado = _abc_por_janela(df, meses_janela)
+
+    assert list(matriz.columns) == list(esperado)
+    for mes, classes in esperado.items():
+        obtido = matriz[mes].dropna()
+        classes = classes.sort_index()
+        assert obtido.index.tolist() == classes.index.tolist(), mes
+        assert obtido.tolist() == classes.tolist(), mes
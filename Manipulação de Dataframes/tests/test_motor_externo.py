@@ -0,0 +1,65 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import motor_externo
+from motor_externo import LimiteMemoriaInsuficiente, _partes_resultado, ler_resultado, processar_fora_da_memoria
+from pipeline_comercial import executar_pipeline
+
+# Limite (MB) pequeno o bastante para gravar várias sequências e processar vários lotes de
+# clientes com os dados de teste, mas em que o maior cliente ainda cabe
+LIMITE_MB = 2
+
+
+def _blocos(df_analise, linhas_bloco=500):
+    return [df_analise.iloc[inicio:inicio + linhas_bloco] for inicio in range(0, len(df_analise), linhas_bloco)]
+
+
+def _com_duplicadas(df_analise):
+    """Acrescenta cópias de algumas linhas, para que a limpeza tenha o que remover."""
+    return pd.concat([df_analise, df_analise.sample(200, random_state=1)], ignore_index=True)
+
+
+@pytest.mark.parametrize("limpar", [False, True])
+def test_igual_ao_processamento_em_memoria(dados, limpar):
+    df_analise, df_categorias, tipar = dados
+    df_analise = tipar(_com_duplicadas(df_analise))
+    df_esperado, _ = executar_pipeline(df_analise, df_categorias, limpar=limpar)
+
+    df_final, _, _ = processar_fora_da_memoria(_blocos(df_analise), df_categorias, limpar=limpar,
+                                               limite_memoria_mb=LIMITE_MB)
+    pd.testing.assert_frame_equal(df_final, df_esperado)
+
+
+def test_resultado_gravado_em_partes(dados, tmp_path):
+    df_analise, df_categorias, tipar = dados
+    df_analise = tipar(df_analise)
+    df_esperado, _ = executar_pipeline(df_analise, df_categorias)
+
+    df_final, _, _ = processar_fora_da_memoria(_blocos(df_analise), df_categorias, limite_memoria_mb=LIMITE_MB,
+                                               saida=str(tmp_path))
+    assert df_final is None
+    assert len(_partes_resultado(str(tmp_path))) > 1
+    pd.testing.assert_frame_equal(ler_resultado(str(tmp_path)), df_esperado)
+
+
+def test_limite_insuficiente(dados):
+    df_analise, df_categorias, tipar = dados
+    with pytest.raises(LimiteMemoriaInsuficiente, match="maior cliente"):
+        processar_fora_da_memoria(_blocos(tipar(df_analise)), df_categorias, limite_memoria_mb=0.01)
+
+
+def test_sequencias_fechadas_apos_intercalar(dados, monkeypatch):
+    """Os arquivos das sequências são fechados (no Windows, um arquivo aberto não pode ser removido)."""
+    df_analise, df_categorias, tipar = dados
+    abertos = []
+    abrir = pa.OSFile
+
+    def registrar(*args, **kwargs):
+        abertos.append(abrir(*args, **kwargs))
+        return abertos[-1]
+
+    monkeypatch.setattr(motor_externo.pa, "OSFile", registrar)
+    processar_fora_da_memoria(_blocos(tipar(df_analise)), df_categorias, limite_memoria_mb=LIMITE_MB)
+    assert abertos
+    assert all(arquivo.closed for arquivo in abertos)
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from motor_historico import COLUNAS_HISTORICO, agregar_historico
+
+CHAVES = ["Cliente", "Código Produto"]
+
+
+def _historico_por_grupo(df):
+    """Histórico montado grupo a grupo com groupby, como no laço antigo de processar_dados."""
+    linhas = []
+    for (cliente, codigo_produto), grupo in df.groupby(CHAVES, observed=True, sort=False):
+        ordenado = grupo.sort_values("Dt Entrada", kind="mergesort", na_position="last")
+        ultima_idx = grupo["Dt Entrada"].idxmax() if not grupo["Dt Entrada"].isna().all() else grupo.index[0]
+        linhas.append({
+            "Cliente": cliente,
+            "Nome Cliente": grupo["Nome Cliente"].iloc[0],
+            "Código Produto": codigo_produto,
+            "Descrição Produto": grupo["Descrição Produto"].iloc[0],
+            "Dt Entrada": ordenado["Dt Entrada"].dt.strftime("%Y-%m-%d").tolist(),
+            "Prob.Fech.": ordenado["Prob.Fech."].tolist(),
+            "Motivo Não Venda": ordenado["Motivo Não Venda"].tolist(),
+            "Última Data": grupo["Dt Entrada"].dt.strftime("%Y-%m-%d").loc[ultima_idx],
+            "Último Consultor": grupo.loc[ultima_idx, "Consultor Interno"],
+        })
+    return pd.DataFrame(linhas, columns=COLUNAS_HISTORICO)
+
+
+def _ausente_como_none(valor):
+    if isinstance(valor, list):
+        return [_ausente_como_none(v) for v in valor]
+    return None if pd.isna(valor) else valor
+
+
+def _como_objetos(df):
+    """Valores como objetos Python, com None para qualquer ausente (NaN, NaT ou pd.NA)."""
+    return df.astype(object).map(_ausente_como_none).reset_index(drop=True)
+
+
+def test_igual_ao_historico_por_grupo(dados):
+    df_analise, _, tipar = dados
+    df_analise = tipar(df_analise)
+    df_historico = agregar_historico(df_analise, compacto=False)
+
+    esperado = _historico_por_grupo(df_analise).set_index(CHAVES).loc[df_historico.set_index(CHAVES).index]
+    assert not df_historico.duplicated(CHAVES).any()
+    pd.testing.assert_frame_equal(_como_objetos(df_historico),
+                                  _como_objetos(esperado.reset_index()[COLUNAS_HISTORICO]))
+
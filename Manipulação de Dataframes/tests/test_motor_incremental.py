@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+from motor_incremental import ProcessamentoIncremental
+from pipeline_comercial import executar_pipeline
+
+
+def _por_mes(df_analise, n_meses):
+    """Divide a análise (ordenada por data) na base e nos últimos n_meses meses, um a um."""
+    df_analise = df_analise.sort_values("Dt Entrada", kind="mergesort").reset_index(drop=True)
+    mes = df_analise["Dt Entrada"].dt.to_period("M")
+    ultimos = sorted(mes.dropna().unique())[-n_meses:]
+    return df_analise[~mes.isin(ultimos)], [df_analise[mes == periodo] for periodo in ultimos]
+
+
+def _executar(df_analise, df_categorias, **kwargs):
+    """executar_pipeline, retornando também as mensagens informadas."""
+    mensagens = []
+    df_final, _ = executar_pipeline(df_analise, df_categorias,
+                                    ao_informar=lambda mensagem, nivel="info": mensagens.append(mensagem), **kwargs)
+    return df_final, mensagens
+
+
+def _comparar(df_analise, df_categorias, incremental, **kwargs):
+    """Processa com o estado incremental e por completo; verifica que o resultado é o mesmo."""
+    df_incremental, mensagens = _executar(df_analise, df_categorias, incremental=incremental, **kwargs)
+    df_completo, _ = _executar(df_analise, df_categorias, **kwargs)
+    pd.testing.assert_frame_equal(df_incremental, df_completo)
+    return df_completo, mensagens
+
+
+def _acrescentar(df_analise, linhas):
+    """Acrescenta linhas (cópias da última, com os valores informados) no fim de df_analise."""
+    novas = pd.DataFrame([{**df_analise.iloc[-1].to_dict(), **linha} for linha in linhas])
+    return pd.concat([df_analise, novas], ignore_index=True)
+
+
+@pytest.mark.parametrize("limpar", [False, True])
+def test_meses_acrescentados(dados, limpar):
+    df_analise, df_categorias, tipar = dados
+    df_acumulado, meses = _por_mes(df_analise, 3)
+    incremental = ProcessamentoIncremental()
+    _executar(tipar(df_acumulado), df_categorias, limpar=limpar, incremental=incremental)
+
+    for df_mes in meses:
+        df_acumulado = pd.concat([df_acumulado, df_mes], ignore_index=True)
+        _, mensagens = _comparar(tipar(df_acumulado), df_categorias, incremental, limpar=limpar)
+        assert f"Processamento incremental: {len(df_mes)} linhas novas incorporadas." in mensagens
+
+
+def test_novo_cliente_e_novo_produto(dados):
+    df_analise, df_categorias, tipar = dados
+    incremental = ProcessamentoIncremental()
+    _executar(tipar(df_analise), df_categorias, incremental=incremental)
+
+    cliente_novo = df_analise["Cliente"].max() + 1
+    df_novo = _acrescentar(df_analise, [
+        {"Cliente": cliente_novo, "Nome Cliente": "Cliente novo"},
+        {"Código Produto": "PRODUTO-NOVO"},
+    ])
+    df_final, mensagens = _comparar(tipar(df_novo), df_categorias, incremental)
+
+    assert "Processamento incremental: 2 linhas novas incorporadas." in mensagens
+    assert (df_final["Cliente"].astype(str) == str(cliente_novo)).any()
+    assert (df_final["Código Produto"].astype(str) == "PRODUTO-NOVO").any()
+
+
+def test_linha_que_muda_a_classe_abc(dados):
+    df_analise, df_categorias, tipar = dados
+    incremental = ProcessamentoIncremental()
+    df_antes, _ = _executar(tipar(df_analise), df_categorias, incremental=incremental)
+
+    # Um cliente C recebe uma proposta maior que o total de todos os outros
+    cliente = df_antes.loc[df_antes["ABC"] == "C", "Cliente"].astype(str).iloc[0]
+    linhas_cliente = df_analise["Cliente"].astype(str) == cliente
+    df_novo = _acrescentar(df_analise, [{"Cliente": df_analise.loc[linhas_cliente, "Cliente"].iloc[0],
+                                         "Valor Orçado": round(df_analise["Valor Orçado"].sum(), 2)}])
+    df_final, mensagens = _comparar(tipar(df_novo), df_categorias, incremental)
+
+    assert "Processamento incremental: 1 linhas novas incorporadas." in mensagens
+    assert (df_final.loc[df_final["Cliente"].astype(str) == cliente, "ABC"] == "A").all()
+
+
+def test_dados_alterados_processados_por_completo(dados):
+    df_analise, df_categorias, tipar = dados
+    incremental = ProcessamentoIncremental()
+    _executar(tipar(df_analise), df_categorias, incremental=incremental)
+
+    _, mensagens = _comparar(tipar(df_analise.iloc[1:].reset_index(drop=True)), df_categorias, incremental)
+    assert any(mensagem.startswith("Processamento completo") for mensagem in mensagens)
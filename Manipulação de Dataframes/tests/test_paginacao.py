@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paginacao import FRACAO_ORDENACAO_DIRETA, IndiceOrdenacao, paginar, preparar_pagina, total_paginas
+
+
+def _gerar(n=2000, semente=0):
+    """Colunas com nulos, valores repetidos (empates) e uma coluna de tipos misturados."""
+    rng = np.random.default_rng(semente)
+    valores = rng.integers(-50, 50, n).astype(float)
+    valores[rng.random(n) < 0.1] = np.nan
+    datas = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 60, n), unit="D"))
+    datas[rng.random(n) < 0.1] = pd.NaT
+    nomes = pd.Series(rng.choice(["Ana", "bruno", "Carla", "", "Érica"], n), dtype=object)
+    nomes[rng.random(n) < 0.1] = None
+    codigos = pd.Series(rng.choice([101, 7, "A10", "B2", "7"], n), dtype=object)
+    codigos[rng.random(n) < 0.05] = None
+    return pd.DataFrame({"Valor": valores, "Data": datas, "Nome": nomes, "Código": codigos,
+                         "Inteiro": rng.integers(0, 10, n)})
+
+
+def _ordem_esperada(df, posicoes, coluna, ascendente):
+    serie = df[coluna].iloc[posicoes]
+    if coluna == "Código":
+        # Tipos misturados são ordenados como texto
+        serie = serie.astype(str).where(serie.notna())
+    return serie.sort_values(ascending=ascendente, na_position="last", kind="stable").index.to_numpy()
+
+
+def _subconjuntos(n, rng):
+    poucas = int(n * FRACAO_ORDENACAO_DIRETA) // 2
+    return {
+        "todas": None,
+        "todas_explicitas": np.arange(n, dtype=np.int32),
+        "poucas": np.sort(rng.choice(n, poucas, replace=False)).astype(np.int32),
+        "muitas": np.sort(rng.choice(n, n // 2, replace=False)).astype(np.int32),
+        "uma": np.array([n // 3], dtype=np.int32),
+        "vazia": np.empty(0, dtype=np.int32),
+    }
+
+
+@pytest.mark.parametrize("coluna", ["Valor", "Data", "Nome", "Código", "Inteiro"])
+@pytest.mark.parametrize("ascendente", [True, False])
+def test_ordenar_igual_a_sort_values(coluna, ascendente):
+    df = _gerar()
+    indice = IndiceOrdenacao(df)
+    for nome, posicoes in _subconjuntos(len(df), np.random.default_rng(1)).items():
+        obtido = indice.ordenar(posicoes, coluna, ascendente)
+        esperado = _ordem_esperada(df, np.arange(len(df)) if posicoes is None else posicoes, coluna, ascendente)
+        np.testing.assert_array_equal(obtido, esperado, err_msg=nome)
+
+
+@pytest.mark.parametrize("ascendente", [True, False])
+def test_nulos_no_fim_nas_duas_direcoes(ascendente):
+    df = _gerar()
+    for coluna in ["Valor", "Data", "Nome", "Código"]:
+        ordenados = df[coluna].iloc[IndiceOrdenacao(df).ordenar(None, coluna, ascendente)]
+        nulos = ordenados.isna().to_numpy()
+        assert nulos.any() and not nulos[:nulos.argmax()].any() and nulos[nulos.argmax():].all(), coluna
+
+
+def test_sem_coluna_mantem_a_ordem():
+    df = _gerar()
+    indice = IndiceOrdenacao(df)
+    np.testing.assert_array_equal(indice.ordenar(None, None), np.arange(len(df)))
+    posicoes = np.array([5, 9, 40], dtype=np.int32)
+    np.testing.assert_array_equal(indice.ordenar(posicoes, None), posicoes)
+
+
+def test_paginas_nas_bordas():
+    ordem = np.arange(23, dtype=np.int32)[::-1]
+    assert total_paginas(23, 10) == 3
+    np.testing.assert_array_equal(paginar(ordem, 1, 10), ordem[:10])
+    # Última página parcial
+    np.testing.assert_array_equal(paginar(ordem, 3, 10), ordem[20:])
+    # Página além do fim
+    assert len(paginar(ordem, 4, 10)) == 0
+    # Número exato de páginas
+    assert total_paginas(20, 10) == 2
+    # Seleção vazia: uma página, sem linhas
+    vazia = np.empty(0, dtype=np.int32)
+    assert total_paginas(0, 10) == 1
+    assert len(paginar(vazia, 1, 10)) == 0
+
+
+def test_preparar_pagina_vazia_e_parcial():
+    df = _gerar(25)
+    indice = IndiceOrdenacao(df)
+    ordem = indice.ordenar(None, "Valor", False)
+    pagina = preparar_pagina(df, paginar(ordem, 3, 10), colunas=["Nome", "Valor"])
+    assert list(pagina.columns) == ["Nome", "Valor"]
+    assert pagina.index.tolist() == ordem[20:].tolist()
+    assert len(preparar_pagina(df, paginar(ordem, 4, 10))) == 0
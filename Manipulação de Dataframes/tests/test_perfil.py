@@ -0,0 +1,26 @@
+import json
+import threading
+import time
+
+from perfil import ESCOPO_MEDICOES, medicoes_para_json, medir_etapa
+
+
+def test_cpu_da_etapa_nao_inclui_outras_threads():
+    parar = threading.Event()
+
+    def ocupar():
+        while not parar.is_set():
+            pass
+
+    outra_tarefa = threading.Thread(target=ocupar)
+    outra_tarefa.start()
+    medicoes = []
+    try:
+        with medir_etapa("espera", medicoes):
+            time.sleep(0.5)
+    finally:
+        parar.set()
+        outra_tarefa.join()
+    assert medicoes[0]["segundos"] >= 0.5
+    assert medicoes[0]["cpu_segundos"] < 0.1
+    assert json.loads(medicoes_para_json(medicoes))["escopo"] == ESCOPO_MEDICOES